@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'eventapp.middleware.MetricsMiddleware',  # first, so it times everything below it
+    'eventapp.middleware.ReplicaRoutingMiddleware',  # before sessions, so their writes pin the client too
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -84,16 +87,39 @@ WSGI_APPLICATION = 'event_project.wsgi.application'
 #         'NAME': BASE_DIR / 'db.sqlite3',
 #     }
 # }
+# Connection settings come from the environment; the defaults are the local development database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'band',  
-        'USER': 'root', 
-        'PASSWORD': 'Arbaz@12345',  
-        'HOST': 'localhost',  
-        'PORT': '3306',  
+        'NAME': os.environ.get('DB_NAME', 'band'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Arbaz@12345'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
     }
 }
+# Read replicas: comma-separated hosts (host or host:port) sharing the primary's credentials
+DATABASE_REPLICA_HOSTS = [host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host]
+for i, host in enumerate(DATABASE_REPLICA_HOSTS, 1):
+    host, _, port = host.partition(':')
+    DATABASES[f'replica_{i}'] = {**DATABASES['default'], 'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+# Offline runs (benchmarks, local development) can use a SQLite file instead, and copies
+# of it (comma-separated paths) standing in for replicas
+if os.environ.get('EVENTAPP_SQLITE'):
+    DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.environ['EVENTAPP_SQLITE']}}
+    for i, path in enumerate(filter(None, os.environ.get('EVENTAPP_SQLITE_REPLICAS', '').split(',')), 1):
+        DATABASES[f'replica_{i}'] = {**DATABASES['default'], 'NAME': path}
+for alias, database in DATABASES.items():
+    # Persistent connections, checked before each request reuses them. Django pools
+    # connections itself only for PostgreSQL; put ProxySQL in front of MySQL for more.
+    database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    database['CONN_HEALTH_CHECKS'] = True
+    if alias != 'default':
+        database['TEST'] = {'MIRROR': 'default'}  # tests read replicas' queries from the test primary
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['eventapp.routers.ReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))  # primary reads after a write; above replica lag
+DATABASE_REPLICA_RETRY_SECONDS = 30  # an unreachable replica is skipped this long
 
 
 
@@ -148,3 +174,69 @@ CORS_ORIGIN_WHITELIST = [
     'http://localhost:8000',
     'http://127.0.0.1:8000'
 ]
+
+# Google Calendar
+GOOGLE_TOKEN_PATH = 'token.pickle'
+GOOGLE_CLIENT_SECRETS_PATH = 'eventapp/credentials.json'
+GOOGLE_TOKEN_REFRESH_MARGIN = 300  # seconds before expiry to refresh in the background
+GOOGLE_CALENDAR_ROOT_URL = os.environ.get('GOOGLE_CALENDAR_ROOT_URL')  # e.g. 'http://127.0.0.1:8089/' to use a local fake Calendar server
+GOOGLE_CALENDAR_BATCH_SIZE = 50
+GOOGLE_CALENDAR_MAX_RETRIES = 5
+CALENDAR_OUTBOX_MAX_ATTEMPTS = 10
+CALENDAR_OUTBOX_BACKOFF_BASE = 2  # seconds, doubled on every failed attempt
+CALENDAR_OUTBOX_BACKOFF_MAX = 3600
+CALENDAR_OUTBOX_LEASE_SECONDS = 120
+# Shared secret for POST /calendar/outbox/flush/ (X-Flush-Token header); unset disables the view
+CALENDAR_OUTBOX_FLUSH_TOKEN = os.environ.get('CALENDAR_OUTBOX_FLUSH_TOKEN')
+GOOGLE_CALENDAR_PULL_PAGE_SIZE = 250
+EVENT_CONFLICT_SCOPES = ('event_organiser_email', 'location')  # double-booking checks, rechecked under a lock on save
+BULK_IMPORT_CHUNK_SIZE = 500  # rows validated and written per transaction by /events/bulk/
+BULK_EXPORT_CHUNK_SIZE = 2000
+PASSWORD_HASHERS = [
+    'eventapp.login.PBKDF2PasswordHasher',  # first entry hashes new passwords
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+LOGIN_PBKDF2_ITERATIONS = 600000  # see manage.py bench_login; stored hashes follow changes on next login
+LOGIN_PROFILE_CACHE_TIMEOUT = 300  # seconds a login profile stays cached
+# A local-memory LRU per process, or a shared Redis when REDIS_URL is set
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+# Responses and login profiles are cached only in a cache all workers share (checks.py
+# refuses a local-memory one); None turns that caching off
+RESPONSE_CACHE_ALIAS = 'default' if os.environ.get('REDIS_URL') else None
+LOGIN_PROFILE_CACHE_ALIAS = RESPONSE_CACHE_ALIAS
+RESPONSE_CACHE_TIMEOUT = 300  # seconds; invalidation is by model version, this only bounds memory
+GOOGLE_CALENDAR_ASYNC_CONCURRENCY = 100  # Calendar calls in flight per async client (worker --async, outbox flush)
+GOOGLE_CALENDAR_RATE_LIMIT = 10  # calls/s per Calendar account across all workers (Google's default is 600/min per user); None disables
+GOOGLE_CALENDAR_MIN_RATE = 1
+GOOGLE_CALENDAR_BACKGROUND_SHARE = 0.8  # most of each second bulk work may take when interactive writes are idle
+GOOGLE_CALENDAR_RATE_LIMIT_CACHE = 'default'  # use a Redis cache so all workers share one bucket
+GOOGLE_CALENDAR_ID = 'primary'  # for events without a CalendarAccount of their own
+GOOGLE_CALENDAR_TIME_ZONE = 'Asia/Kolkata'  # for events without a time_zone
+CALENDAR_SERVICE_POOL_SIZE = 128  # accounts whose authorized Calendar services each process keeps warm
+# Fernet keys encrypting stored OAuth tokens, comma-separated and newest first; unset derives one from SECRET_KEY
+CALENDAR_TOKEN_KEYS = [key for key in os.environ.get('CALENDAR_TOKEN_KEYS', '').split(',') if key] or None
+RECURRENCE_HORIZON_DAYS = 180  # recurring events' occurrences kept in EventOccurrence this far ahead
+RECURRENCE_KEEP_DAYS = 30  # ... and this far back; manage.py materialize_occurrences rolls the window
+GOOGLE_CALENDAR_WEBHOOK_URL = os.environ.get('GOOGLE_CALENDAR_WEBHOOK_URL')  # public https URL of this site; enables push notifications
+GOOGLE_CALENDAR_CHANNEL_TTL = 7 * 24 * 3600  # seconds a notification channel is asked to live
+GOOGLE_CALENDAR_CHANNEL_RENEW_BEFORE = 24 * 3600  # replace channels this long before they expire
+GOOGLE_CALENDAR_WEBHOOK_COALESCE = 1.0  # seconds of notifications folded into one pull
+GOOGLE_CALENDAR_WATCH_FALLBACK = 6 * 3600  # pull watched calendars at least this often anyway; None never
+METRICS_PROFILE_TOKEN = os.environ.get('METRICS_PROFILE_TOKEN')  # send it as X-Profile to get a request's profile back instead of its body
+METRICS_PROFILE_SAMPLE_RATE = 0.0  # share of requests profiled and logged to eventapp.profile
+METRICS_PROFILER = 'cprofile'  # or 'pyinstrument', when installed
+METRICS_SERVER_TIMING = True  # add db/serialize/calendar timings to responses as a Server-Timing header
+FAST_SERIALIZATION = True  # list endpoints encode .values_list() rows and render with orjson (see mixins.FastListMixin)
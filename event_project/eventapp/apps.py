@@ -4,3 +4,5 @@ class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eventapp'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,146 @@
+# availability.py
+import datetime
+import math
+import re
+from collections import defaultdict
+
+from . import ratelimit, recurrence
+from .calendar_sync import MAX_RETRIES
+from .models import Event
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to a pure-Python sweep line
+    np = None
+
+SLOT_PATTERN = re.compile(r'^(?P<amount>\d+)(?P<unit>[mh])$')
+MIN_SLOT = datetime.timedelta(minutes=5)
+MAX_WINDOW = datetime.timedelta(days=366)
+# The free-time bitmap holds a row per person, so a request is capped at this many
+MAX_PEOPLE = 50
+# The freebusy API accepts at most 50 calendars per query
+FREEBUSY_CHUNK = 50
+
+
+def parse_slot(value):
+    match = SLOT_PATTERN.match(value or '')
+    if match is None:
+        raise ValueError("slot should look like '30m' or '1h'.")
+    amount = int(match['amount'])
+    slot = datetime.timedelta(minutes=amount) if match['unit'] == 'm' else datetime.timedelta(hours=amount)
+    if slot < MIN_SLOT:
+        raise ValueError('slot should be at least 5 minutes.')
+    return slot
+
+
+def local_busy(emails, start, end):
+    """Busy intervals per email from events they organise or are booked to play.
+
+    Recurring events count at every occurrence in the window, not just their first.
+    """
+    busy = {email: [] for email in emails}
+    organised = recurrence.occurrences_between(start, end, events=Event.objects.filter(event_organiser_email__in=emails))
+    for occurrence in organised:
+        busy.setdefault(occurrence.event.event_organiser_email, []).append((occurrence.start, occurrence.end))
+    bookings = Event.musicians.through.objects.filter(musician__email__in=emails)
+    played = recurrence.occurrences_between(start, end, events=Event.objects.filter(pk__in=bookings.values('event_id')))
+    players = defaultdict(list)
+    if played:
+        for event_id, email in (bookings.filter(event_id__in={occurrence.event.pk for occurrence in played})
+                                .values_list('event_id', 'musician__email')):
+            players[event_id].append(email)
+    for occurrence in played:
+        for email in players[occurrence.event.pk]:
+            busy.setdefault(email, []).append((occurrence.start, occurrence.end))
+    return busy
+
+
+def google_busy(service, emails, start, end):
+    # One freebusy call covers up to 50 calendars, instead of listing each calendar's events
+    busy = {email: [] for email in emails}
+    for offset in range(0, len(emails), FREEBUSY_CHUNK):
+        chunk = emails[offset:offset + FREEBUSY_CHUNK]
+        # Retried with backoff on the same errors the sync engine retries
+        response = ratelimit.execute(service.freebusy().query(body={
+            'timeMin': start.isoformat(), 'timeMax': end.isoformat(),
+            'items': [{'id': email} for email in chunk],
+        }), num_retries=MAX_RETRIES)
+        for email, calendar in response.get('calendars', {}).items():
+            for period in calendar.get('busy', []):
+                busy.setdefault(email, []).append((
+                    datetime.datetime.fromisoformat(period['start'].replace('Z', '+00:00')),
+                    datetime.datetime.fromisoformat(period['end'].replace('Z', '+00:00')),
+                ))
+    return busy
+
+
+def free_slots(busy, start, end, slot, vectorized=None):
+    """Free time per person and for everyone at once, aligned to `slot` boundaries.
+
+    `busy` maps a person to (start, end) datetimes. A slot is free when no busy
+    interval touches it. Returns ({person: [(start, end), ...]}, [(start, end), ...]).
+    The NumPy bitmap is used when available unless `vectorized` is False.
+    """
+    if vectorized is None:
+        vectorized = np is not None
+    count = math.ceil((end - start) / slot)
+    slot_seconds = slot.total_seconds()
+    offsets = {
+        person: [((s - start).total_seconds() / slot_seconds, (e - start).total_seconds() / slot_seconds)
+                 for s, e in intervals]
+        for person, intervals in busy.items()
+    }
+    if vectorized:
+        per_person, common = _free_slots_numpy(offsets, count, start, slot)
+    else:
+        per_person, common = _free_slots_sweep(offsets, count, start, slot)
+
+    def clamp(runs):
+        # The last slot may run past `end` when the window isn't a whole number of slots
+        return [(run_start, min(run_end, end)) for run_start, run_end in runs]
+
+    return {person: clamp(runs) for person, runs in per_person.items()}, clamp(common)
+
+
+def _free_slots_numpy(offsets, count, start, slot):
+    people = list(offsets)
+    # One row per person; +1/-1 at interval edges, then a cumulative sum gives occupancy
+    edges = np.zeros((len(people), count + 1), dtype=np.int32)
+    for row, person in enumerate(people):
+        if not offsets[person]:
+            continue
+        bounds = np.array(offsets[person], dtype=np.float64)
+        first = np.clip(np.floor(bounds[:, 0]), 0, count).astype(np.int64)
+        last = np.clip(np.ceil(bounds[:, 1]), 0, count).astype(np.int64)
+        keep = first < last
+        np.add.at(edges[row], first[keep], 1)
+        np.add.at(edges[row], last[keep], -1)
+    free = np.cumsum(edges, axis=1)[:, :count] == 0
+    per_person = {person: _runs(free[row], start, slot) for row, person in enumerate(people)}
+    common = _runs(free.all(axis=0) if people else np.ones(count, dtype=bool), start, slot)
+    return per_person, common
+
+
+def _runs(mask, start, slot):
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    changes = np.flatnonzero(np.diff(padded))
+    return [(start + slot * int(a), start + slot * int(b)) for a, b in zip(changes[::2], changes[1::2])]
+
+
+def _free_slots_sweep(offsets, count, start, slot):
+    def free_runs(intervals):
+        runs, cursor = [], 0
+        for first, last in sorted((math.floor(a), math.ceil(b)) for a, b in intervals):
+            first, last = max(first, 0), min(last, count)
+            if first >= last:
+                continue
+            if first > cursor:
+                runs.append((cursor, first))
+            cursor = max(cursor, last)
+        if cursor < count:
+            runs.append((cursor, count))
+        return [(start + slot * a, start + slot * b) for a, b in runs]
+
+    per_person = {person: free_runs(intervals) for person, intervals in offsets.items()}
+    common = free_runs([interval for intervals in offsets.values() for interval in intervals])
+    return per_person, common
@@ -0,0 +1,13 @@
+# Load tests and query-count checks for the eventapp API, all offline.
+#
+#   manage.py bench_seed --scale 100k      # generators.py: organisers, musicians, logins and events
+#   manage.py bench_queries                # queries.py: fails on N+1s and query budgets
+#   manage.py bench_api --duration 10      # loadgen.py: asyncio client, req/s and p50/p95/p99
+#   manage.py bench_search                 # 500k musicians, /musicians/search/ query timings
+#   manage.py bench_serializers            # rows/s: serializers vs FastListMixin's values_list + orjson
+#   locust -f eventapp/benchmarks/locustfile.py --host http://127.0.0.1:8000
+#
+# Set EVENTAPP_SQLITE=/path/to/bench.sqlite3 to run without MySQL. Requests never call
+# Google, and bench_api points the server it starts at a local fake Calendar anyway.
+# EVENTAPP_SQLITE_REPLICAS=/path/to/copy1.sqlite3,... adds copies of that file as read
+# replicas, to exercise routers.ReplicaRouter (copies don't follow later writes).
@@ -0,0 +1,178 @@
+# generators.py
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .. import caching, gazetteer, signals, stats
+from ..models import CalendarOutbox, Event, EventOrganizer, Musician, UserCredentials
+
+DOMAIN = 'api.bench.invalid'
+# Every seeded login shares one password and hash: hashing a million at the real work
+# factor would take days, and verifying is what the login scenario measures
+PASSWORD = 'bench-password'
+# Rows of Event; the other tables are sized from it
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+EVENTS_PER_ORGANISER = 50
+EVENTS_PER_MUSICIAN = 20
+CITIES = ['Mumbai', 'Pune', 'Delhi', 'Bengaluru', 'Chennai', 'Kolkata', 'Goa', 'Jaipur']
+CATEGORIES = ['guitarist', 'drummer', 'vocalist', 'pianist', 'dj', 'violinist']
+GENRES = ['jazz', 'blues', 'rock', 'classical', 'bollywood', 'sufi', 'indie', 'electronic', 'folk', 'metal']
+OCCASIONS = ['weddings', 'clubs', 'festivals', 'corporate events', 'private parties', 'sessions', 'cafes']
+# Musicians bench_search adds on top of (or without) bench_seed's
+SEARCH_PREFIX = 'search-'
+
+
+def organiser_email(i):
+    return f'organiser-{i}@{DOMAIN}'
+
+
+def musician_email(i):
+    return f'musician-{i}@{DOMAIN}'
+
+
+def profile_line(rnd, category):
+    return f'{rnd.choice(GENRES).title()} {category} for {rnd.choice(OCCASIONS)} and {rnd.choice(GENRES)} nights'
+
+
+def new_musician(rnd, i, email):
+    category = rnd.choice(CATEGORIES)
+    musician = Musician(name=f'Musician {i}', email=email, age=rnd.randint(18, 70), category=category,
+                        address=f'{i} Studio Lane', city=rnd.choice(CITIES), country='India',
+                        ratings=round(rnd.uniform(1, 5), 2), profileline=profile_line(rnd, category),
+                        imageAddress=f'https://{DOMAIN}/m/{i}.jpg')
+    # bulk_create skips the pre_save geocoding
+    gazetteer.locate(musician)
+    return musician
+
+
+def _located(instance):
+    gazetteer.locate(instance)
+    return instance
+
+
+def seed(events, chunk_size=5000, seed=0, progress=None):
+    """Create `events` events plus their organisers, musicians and logins; returns row counts.
+
+    Organisers get EVENTS_PER_ORGANISER events each and musicians play EVENTS_PER_MUSICIAN
+    on average, so list and filter queries see the same shape at every scale.
+    """
+    rnd = random.Random(seed)
+    organisers = max(events // EVENTS_PER_ORGANISER, 1)
+    musicians = max(events // EVENTS_PER_MUSICIAN, 1)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+
+    _in_chunks(organisers, chunk_size, lambda start, stop: EventOrganizer.objects.bulk_create([
+        _located(EventOrganizer(name=f'Organiser {i}', email=organiser_email(i), age=rnd.randint(21, 70),
+                                club_address=f'{i} Club Road', city=rnd.choice(CITIES), country='India',
+                                profileline='Live music most nights', imageaddress=f'https://{DOMAIN}/o/{i}.jpg'))
+        for i in range(start, stop)
+    ]), progress, 'organisers')
+    _in_chunks(musicians, chunk_size, lambda start, stop: Musician.objects.bulk_create([
+        new_musician(rnd, i, musician_email(i)) for i in range(start, stop)
+    ]), progress, 'musicians')
+    logins = [('event organizer', organiser_email(i)) for i in range(organisers)]
+    logins += [('musician', musician_email(i)) for i in range(musicians)]
+    _in_chunks(len(logins), chunk_size, lambda start, stop: UserCredentials.objects.bulk_create([
+        UserCredentials(category=category, email=email, password=password) for category, email in logins[start:stop]
+    ]), progress, 'logins')
+
+    organiser_ids = list(EventOrganizer.objects.filter(email__endswith='@' + DOMAIN)
+                         .order_by('pk').values_list('pk', 'email'))
+    musician_ids = list(Musician.objects.filter(email__startswith='musician-', email__endswith='@' + DOMAIN)
+                        .values_list('pk', flat=True))
+    through = Event.musicians.through
+
+    def events_chunk(start, stop):
+        rows = []
+        for i in range(start, stop):
+            organiser_id, email = organiser_ids[i % len(organiser_ids)]
+            begins = now + datetime.timedelta(days=rnd.uniform(-730, 730))
+            begins = begins.replace(minute=0, second=0, microsecond=0)
+            rows.append(_located(Event(
+                event_name=f'Gig {i}', location=f'{rnd.choice(CITIES)} Hall {i % 97}',
+                description='Seeded by manage.py bench_seed.', created_on=now,
+                event_start_date=begins, event_end_date=begins + datetime.timedelta(hours=rnd.choice((2, 3, 4))),
+                event_organiser_email=email, event_organiser_name=f'Organiser {i % len(organiser_ids)}',
+                event_organiser_id=organiser_id,
+            )))
+        created = Event.objects.bulk_create(rows)
+        if created and created[0].pk is None:
+            # Backends that don't return ids from bulk inserts
+            created = list(Event.objects.filter(event_organiser_email__endswith='@' + DOMAIN)
+                           .order_by('-pk')[:len(rows)])
+        through.objects.bulk_create([
+            through(event_id=event.pk, musician_id=musician_id)
+            for event in created for musician_id in rnd.sample(musician_ids, min(rnd.randint(0, 2), len(musician_ids)))
+        ])
+        signals.events_bulk_saved(created)
+
+    _in_chunks(events, chunk_size, events_chunk, progress, 'events')
+    for model in (Event, Musician, EventOrganizer):
+        caching.bump_version(model)
+    return {'organisers': organisers, 'musicians': musicians, 'logins': len(logins), 'events': events}
+
+
+def seed_search_musicians(count, chunk_size=5000, seed=0, progress=None):
+    """Add musicians until `count` of bench_search's own exist; returns how many were added."""
+    rnd = random.Random(seed)
+    existing = search_musicians().count()
+    _in_chunks(count - existing, chunk_size, lambda start, stop: Musician.objects.bulk_create([
+        new_musician(rnd, i, f'{SEARCH_PREFIX}{i}@{DOMAIN}') for i in range(existing + start, existing + stop)
+    ]), progress, 'musicians')
+    caching.bump_version(Musician)
+    return max(count - existing, 0)
+
+
+def search_musicians():
+    return Musician.objects.filter(email__startswith=SEARCH_PREFIX, email__endswith='@' + DOMAIN)
+
+
+def clear_created():
+    """Delete the events the create scenario made and the Calendar writes they queued."""
+    events = Event.objects.filter(event_organiser_email__startswith='creator-',
+                                  event_organiser_email__endswith='@' + DOMAIN)
+    with transaction.atomic(), stats.deferred():
+        CalendarOutbox.objects.filter(google_event_id__in=list(events.values_list('google_event_id', flat=True))).delete()
+        return events.delete()[0]
+
+
+def clear(chunk_size=5000, progress=None):
+    """Delete everything seed() created, in chunks; returns the number of rows deleted."""
+    deleted = clear_created()
+    for model, field in ((Event, 'event_organiser_email'), (UserCredentials, 'email'),
+                         (Musician, 'email'), (EventOrganizer, 'email')):
+        deleted += _delete_in_chunks(model.objects.filter(**{f'{field}__endswith': '@' + DOMAIN}),
+                                     chunk_size, progress)
+    for model in (Event, Musician, EventOrganizer):
+        caching.bump_version(model)
+    return deleted
+
+
+def clear_search_musicians(chunk_size=5000, progress=None):
+    deleted = _delete_in_chunks(search_musicians(), chunk_size, progress)
+    caching.bump_version(Musician)
+    return deleted
+
+
+def _delete_in_chunks(queryset, chunk_size, progress):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic(), stats.deferred():
+            deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress(f'{queryset.model.__name__}: {deleted} rows deleted')
+
+
+def _in_chunks(total, chunk_size, create, progress, label):
+    for start in range(0, total, chunk_size):
+        with transaction.atomic():
+            create(start, min(start + chunk_size, total))
+        if progress:
+            progress(f'{label}: {min(start + chunk_size, total)}/{total}')
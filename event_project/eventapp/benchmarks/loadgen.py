@@ -0,0 +1,113 @@
+# loadgen.py
+import asyncio
+import random
+import statistics
+import time
+import urllib.parse
+
+from .scenarios import encode
+
+
+class Stats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def add(self, latency, status, ok):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def percentiles(self):
+        # p50, p95, p99 in seconds
+        if len(self.latencies) < 2:
+            return tuple(self.latencies * 3) or (0.0, 0.0, 0.0)
+        cuts = statistics.quantiles(self.latencies, n=100, method='inclusive')
+        return cuts[49], cuts[94], cuts[98]
+
+    def summary(self, elapsed):
+        p50, p95, p99 = self.percentiles()
+        return (f'{self.name:<16} {len(self.latencies) / elapsed:8.1f} req/s  p50 {p50 * 1000:7.1f} ms  '
+                f'p95 {p95 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms  errors {self.errors}')
+
+
+async def run(base_url, scenarios, dataset, concurrency=32, duration=10.0, warmup=1.0, seed=0):
+    """Keep `concurrency` keep-alive connections busy with weighted scenarios for `duration` seconds.
+
+    Returns ({scenario name: Stats}, elapsed seconds). Requests in the first `warmup`
+    seconds are sent but not counted, so connection setup and cold caches don't skew
+    the percentiles.
+    """
+    url = urllib.parse.urlsplit(base_url)
+    stats = {scenario.name: Stats(scenario.name) for scenario in scenarios}
+    weights = [scenario.weight for scenario in scenarios]
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    counting_from = started + warmup
+    stop_at = counting_from + duration
+
+    async def worker(number):
+        rnd = random.Random(seed * 1000 + number)
+        connection = None
+        try:
+            while loop.time() < stop_at:
+                scenario = rnd.choices(scenarios, weights)[0]
+                request = scenario.request(dataset, rnd)
+                if connection is None:
+                    connection = await asyncio.open_connection(url.hostname, url.port or 80)
+                begin = time.perf_counter()
+                try:
+                    status, keep_alive = await _exchange(connection, url.netloc, request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server dropped an idle keep-alive connection; not the request's fault
+                    connection = None
+                    continue
+                latency = time.perf_counter() - begin
+                if loop.time() >= counting_from:
+                    stats[scenario.name].add(latency, status, status == scenario.status)
+                if not keep_alive:
+                    connection[1].close()
+                    connection = None
+        finally:
+            if connection is not None:
+                connection[1].close()
+
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    return stats, loop.time() - counting_from
+
+
+async def _exchange(connection, host, request):
+    reader, writer = connection
+    body = encode(request)
+    head = [f'{request.method} {request.path} HTTP/1.1', f'Host: {host}', 'Accept: application/json',
+            f'Content-Length: {len(body)}']
+    if body:
+        head.append('Content-Type: application/json')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+    status_line = await reader.readuntil(b'\r\n')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readuntil(b'\r\n')
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close' and not status_line.startswith(b'HTTP/1.0')
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif status not in (204, 304):
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
@@ -0,0 +1,34 @@
+# locustfile.py: the same scenarios for Locust, when it is installed.
+#   cd event_project && locust -f eventapp/benchmarks/locustfile.py --host http://127.0.0.1:8000
+import os
+import random
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_project.settings')
+django.setup()
+
+from locust import FastHttpUser, constant  # noqa: E402
+
+from eventapp.benchmarks.scenarios import SCENARIOS, encode, sample_dataset  # noqa: E402
+
+DATASET = sample_dataset()
+
+
+def _task(scenario):
+    def task(user):
+        request = scenario.request(DATASET, user.rnd)
+        with user.client.request(request.method, request.path, data=encode(request) or None, name=scenario.name,
+                                 headers={'Content-Type': 'application/json'}, catch_response=True) as response:
+            if response.status_code != scenario.status:
+                response.failure(f'answered {response.status_code}')
+    task.__name__ = scenario.name
+    return task
+
+
+class ApiUser(FastHttpUser):
+    wait_time = constant(0)
+    tasks = {_task(scenario): scenario.weight for scenario in SCENARIOS.values()}
+
+    def on_start(self):
+        self.rnd = random.Random()
@@ -0,0 +1,73 @@
+# queries.py
+import contextlib
+import random
+
+from django.core.cache import caches
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .scenarios import encode
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextlib.contextmanager
+def capture_queries():
+    # Yields a list that holds the SQL of every query, on any database, once the block exits
+    queries = []
+    with contextlib.ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        yield queries
+    queries.extend(query['sql'] for context in captured for query in context.captured_queries)
+
+
+@contextlib.contextmanager
+def assert_max_queries(limit, label='block'):
+    """Fail when the block runs more than `limit` queries.
+
+    Like TestCase.assertNumQueries, usable outside a test case; the message lists
+    the SQL so the extra queries can be found.
+    """
+    with capture_queries() as queries:
+        yield queries
+    if len(queries) > limit:
+        listing = '\n'.join(f'  {number}. {sql}' for number, sql in enumerate(queries, 1))
+        raise QueryBudgetExceeded(f'{label} ran {len(queries)} queries, budget {limit}:\n{listing}')
+
+
+def count_queries(client, request):
+    """(status, queries) for one request made with nothing cached."""
+    # The response and login-profile caches would otherwise answer without a query
+    for alias in caches:
+        caches[alias].clear()
+    with capture_queries() as queries:
+        response = client.generic(request.method, request.path, encode(request), content_type='application/json')
+    return response.status_code, len(queries)
+
+
+def check(scenarios, dataset, seed=0):
+    """Run every scenario with the caches cleared; returns ({name: {size: queries}}, problems).
+
+    A scenario with `sizes` is run at each size and must run the same number of
+    queries every time, which is what an N+1 breaks. Every scenario must also stay
+    within its max_queries.
+    """
+    client = Client()
+    rnd = random.Random(seed)
+    results, problems = {}, []
+    for scenario in scenarios:
+        counts = results[scenario.name] = {}
+        for size in scenario.sizes or (None,):
+            status, counts[size] = count_queries(client, scenario.request(dataset, rnd, size))
+            if status != scenario.status:
+                problems.append(f'{scenario.name}: answered {status}, expected {scenario.status}')
+        if len(set(counts.values())) > 1:
+            shown = ', '.join(f'{queries} at size {size}' for size, queries in counts.items())
+            problems.append(f'{scenario.name}: queries grow with the rows returned ({shown})')
+        worst = max(counts.values())
+        if scenario.max_queries is not None and worst > scenario.max_queries:
+            problems.append(f'{scenario.name}: {worst} queries, budget {scenario.max_queries}')
+    return results, problems
@@ -0,0 +1,125 @@
+# scenarios.py
+import collections
+import datetime
+import json
+import random
+import uuid
+
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ..models import Event, EventOrganizer, UserCredentials
+from .generators import CATEGORIES, CITIES, DOMAIN, GENRES, PASSWORD
+
+# What one scenario sends: path plus a JSON body for writes
+Request = collections.namedtuple('Request', 'method path body')
+# Rows the scenarios pick their ids and emails from
+Dataset = collections.namedtuple('Dataset', 'event_ids organiser_ids organiser_emails logins')
+
+
+class Scenario:
+    """One API call the load generator and the query harness both know how to make.
+
+    `build(dataset, rnd, size)` returns a Request. `size` is the number of rows the
+    request should return where that means something (page size); the query harness
+    calls it with a small and a large size, and the query count must not change.
+    """
+
+    def __init__(self, name, build, weight=1, status=200, max_queries=None, sizes=None):
+        self.name = name
+        self.build = build
+        self.weight = weight
+        self.status = status
+        # Queries one uncached request may run; None leaves it to the N+1 check
+        self.max_queries = max_queries
+        self.sizes = sizes
+
+    def request(self, dataset, rnd, size=None):
+        return self.build(dataset, rnd, size or (self.sizes[-1] if self.sizes else None))
+
+
+def _list(dataset, rnd, size):
+    return Request('GET', f'/events/api/?page_size={size}', None)
+
+
+def _detail(dataset, rnd, size):
+    return Request('GET', f'/events/api/{rnd.choice(dataset.event_ids)}/', None)
+
+
+def _create(dataset, rnd, size):
+    begins = timezone.now() + datetime.timedelta(days=rnd.uniform(1, 365))
+    # A fresh organiser and room every time, so the conflict check never rejects it
+    key = uuid.UUID(int=rnd.getrandbits(128)).hex[:12]
+    return Request('POST', '/events/api/', {
+        'event_name': f'Load test {key}', 'location': f'Bench room {key}', 'description': 'Created by bench_api.',
+        'event_start_date': begins.isoformat(), 'event_end_date': (begins + datetime.timedelta(hours=2)).isoformat(),
+        'event_organiser_email': f'creator-{key}@{DOMAIN}', 'event_organiser_name': 'Load test',
+    })
+
+
+def _login(dataset, rnd, size):
+    return Request('POST', '/login/', {'email': rnd.choice(dataset.logins), 'password': PASSWORD})
+
+
+def _filter_by_email(dataset, rnd, size):
+    return Request('GET', f'/events/filter-by-email/?email={rnd.choice(dataset.organiser_emails)}', None)
+
+
+def _organizer_stats(dataset, rnd, size):
+    return Request('GET', f'/organizers/{rnd.choice(dataset.organiser_ids)}/stats/', None)
+
+
+def _search(dataset, rnd, size):
+    return Request('GET', f'/musicians/search/?country=India&city={rnd.choice(CITIES)}'
+                          f'&q={rnd.choice(GENRES)}+{rnd.choice(CATEGORIES)}&page_size={size}', None)
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario('list', _list, weight=4, max_queries=2, sizes=(10, 100)),
+        Scenario('detail', _detail, weight=4, max_queries=2),
+        # The organiser, the detector's first load, locking the organiser and location (select, insert
+        # the new keys, select again), the recheck (one-offs, occurrences, series), the event, its
+        # outbox row, and the view's savepoint
+        Scenario('create', _create, weight=1, status=201, max_queries=12),
+        Scenario('login', _login, weight=1, max_queries=2),
+        Scenario('filter-by-email', _filter_by_email, weight=2, max_queries=1),
+        Scenario('search', _search, weight=2, max_queries=1, sizes=(10, 50)),
+        # One query; a row whose next event has started is recounted first, in a transaction
+        Scenario('organizer-stats', _organizer_stats, weight=1, max_queries=6),
+    ]
+}
+
+
+def select(names):
+    """Scenarios named in a comma separated string; ValueError for unknown names."""
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f'Unknown scenarios: {", ".join(unknown)}; choose from {", ".join(SCENARIOS)}.')
+    return [SCENARIOS[name] for name in names]
+
+
+def encode(request):
+    return json.dumps(request.body).encode('utf-8') if request.body is not None else b''
+
+
+def sample_dataset(size=2000, seed=0):
+    """Ids and emails of seeded rows for the scenarios to pick from; see bench_seed."""
+    suffix = '@' + DOMAIN
+    rnd = random.Random(seed)
+    # Random ids between the seeded bounds; ORDER BY RAND() would sort the whole table
+    bounds = Event.objects.filter(event_organiser_email__endswith=suffix).aggregate(low=Min('pk'), high=Max('pk'))
+    candidates = {rnd.randint(bounds['low'], bounds['high']) for _ in range(size)} if bounds['low'] else ()
+    logins = list(UserCredentials.objects.filter(email__endswith=suffix).values_list('email', flat=True))
+    organisers = list(EventOrganizer.objects.filter(email__endswith=suffix).values_list('pk', 'email')[:size])
+    dataset = Dataset(
+        event_ids=list(Event.objects.filter(pk__in=candidates, event_organiser_email__endswith=suffix)
+                       .values_list('pk', flat=True)),
+        organiser_ids=[pk for pk, _ in organisers],
+        organiser_emails=[email for _, email in organisers],
+        logins=rnd.sample(logins, min(size, len(logins))),
+    )
+    if not (dataset.event_ids and dataset.organiser_emails and dataset.logins):
+        raise LookupError('No benchmark data; run manage.py bench_seed first.')
+    return dataset
@@ -0,0 +1,433 @@
+# bulk.py
+import csv
+import datetime
+import io
+import json
+import re
+import uuid
+import zoneinfo
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import gazetteer, outbox, stats
+from .calendar_sync import INSERT, UPDATE
+from .conflicts import IntervalIndex, booked, clashes, detector, lock, spans
+from .models import Event, EventOrganizer
+from .ratelimit import BACKGROUND
+from .serializers import EventSerializer, overlap_error
+from .signals import events_bulk_saved
+
+CHUNK_SIZE = getattr(settings, 'BULK_IMPORT_CHUNK_SIZE', 500)
+EXPORT_CHUNK_SIZE = getattr(settings, 'BULK_EXPORT_CHUNK_SIZE', 2000)
+MAX_REPORTED_ERRORS = 100
+FIELDS = ['event_id', 'google_event_id', 'event_name', 'location', 'description', 'created_on',
+          'event_start_date', 'event_end_date', 'event_organiser_email', 'event_organiser_name',
+          'calendar_id', 'time_zone', 'recurrence']
+WRITABLE_FIELDS = ['event_name', 'location', 'description', 'event_start_date', 'event_end_date',
+                   'event_organiser_email', 'event_organiser_name', 'calendar_id', 'time_zone', 'recurrence']
+# Columns an upload can't repeat between rows: the second would fail its whole chunk's insert
+UNIQUE_FIELDS = [field.name for field in Event._meta.fields if field.unique and not field.primary_key]
+REPEATED = 'Repeats an earlier row of this upload.'
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'ics': 'text/calendar',
+}
+# Bytes that aren't UTF-8 decode (surrogateescape) to lone surrogates, which text never holds
+UNDECODABLE = re.compile('[\udc80-\udcff]')
+
+
+# Parsers: each takes an iterator of raw byte lines and yields one dict per event, or a
+# RowError in its place for one it can't read, so the rest of the upload still goes in
+
+class RowError:
+    def __init__(self, detail):
+        self.detail = detail
+
+
+def parse_ndjson(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield RowError(f'Invalid JSON: {e}')
+
+
+def parse_csv(lines):
+    reader = csv.DictReader(line.decode('utf-8-sig', 'surrogateescape') for line in lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield RowError(f'Invalid CSV: {e}')
+            continue
+        if any(isinstance(value, str) and UNDECODABLE.search(value) for value in row.values()):
+            yield RowError('Not UTF-8.')
+        else:
+            yield row
+
+
+def parse_ics(lines):
+    event = None
+    errors = {}
+    for line in _unfold(line.decode('utf-8', 'surrogateescape').rstrip('\r\n') for line in lines):
+        name, params, value = _content_line(line)
+        if name == 'BEGIN' and value == 'VEVENT':
+            event, errors = {}, {}
+        elif name == 'END' and value == 'VEVENT' and event is not None:
+            yield RowError(errors) if errors else event
+            event = None
+        elif event is not None:
+            try:
+                if UNDECODABLE.search(line):
+                    raise ValueError('Not UTF-8.')
+                _ics_property(event, name, params, value)
+            except ValueError as e:
+                errors.setdefault(name, [str(e)])
+
+
+def _ics_property(event, name, params, value):
+    if name == 'SUMMARY':
+        event['event_name'] = _ics_unescape(value)
+    elif name == 'LOCATION':
+        event['location'] = _ics_unescape(value)
+    elif name == 'DESCRIPTION':
+        event['description'] = _ics_unescape(value)
+    elif name in ('DTSTART', 'DTEND'):
+        key = 'event_start_date' if name == 'DTSTART' else 'event_end_date'
+        event[key] = _ics_datetime(value, params.get('TZID'))
+    elif name == 'ORGANIZER':
+        event['event_organiser_email'] = value.split(':', 1)[-1] if value.lower().startswith('mailto:') else value
+        event['event_organiser_name'] = _param_unescape(params.get('CN', '').strip('"'))
+    elif name == 'UID':
+        event['google_event_id'] = value.split('@', 1)[0]
+    elif name == 'RRULE':
+        event['recurrence'] = value
+
+
+PARSERS = {'ndjson': parse_ndjson, 'csv': parse_csv, 'ics': parse_ics}
+
+
+def detect_format(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    for name, expected in CONTENT_TYPES.items():
+        if content_type == expected:
+            return name
+    if content_type in ('application/json-seq', 'application/jsonl'):
+        return 'ndjson'
+    return None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, row, detail):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': detail})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated,
+                'error_count': self.error_count, 'errors': self.errors}
+
+
+def import_events(records, chunk_size=CHUNK_SIZE):
+    """Validate and write parsed records chunk by chunk.
+
+    Records carrying the google_event_id of an existing event update it; the rest are
+    created. Each chunk is one transaction that also queues the calendar sync. Rows that
+    fail to parse or validate are reported and skipped; they never stop the import.
+    """
+    report = ImportReport()
+    # Overlaps between rows of the same upload, which the shared detector can't see yet
+    accepted = {}
+    # (field, value) of the UNIQUE_FIELDS taken by earlier rows of the upload
+    seen = set()
+    chunk = []
+    for number, record in enumerate(records, start=1):
+        chunk.append((number, record))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, report, accepted, seen)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, report, accepted, seen)
+    return report
+
+
+def _import_chunk(chunk, report, accepted, seen):
+    keys = {_uuid(record.get('google_event_id')) for _, record in chunk if isinstance(record, dict)} - {None}
+    existing = Event.objects.in_bulk(list(keys), field_name='google_event_id') if keys else {}
+
+    emails = {record.get('event_organiser_email') for _, record in chunk if isinstance(record, dict)} - {None}
+    organisers = (EventOrganizer.objects.select_related('calendar_account')
+                  .in_bulk(list(emails), field_name='email') if emails else {})
+
+    # One serializer for the whole chunk; building DRF fields per row dominates otherwise
+    serializer = EventSerializer(context={'organisers': organisers})
+    creates, updates, numbers = [], [], {}
+    for number, record in chunk:
+        if isinstance(record, RowError):
+            report.error(number, record.detail)
+            continue
+        if not isinstance(record, dict):
+            report.error(number, 'Expected an object.')
+            continue
+        key = _uuid(record.get('google_event_id'))
+        if ('google_event_id', key) in seen:
+            report.error(number, {'google_event_id': [REPEATED]})
+            continue
+        instance = existing.get(key)
+        serializer.instance = instance
+        try:
+            values = serializer.run_validation({field: record[field] for field in WRITABLE_FIELDS if field in record})
+        except ValidationError as e:
+            report.error(number, e.detail)
+            continue
+        repeated = [field for field in UNIQUE_FIELDS if (field, values.get(field)) in seen]
+        if repeated:
+            report.error(number, {field: [REPEATED] for field in repeated})
+            continue
+        clash = _overlaps_upload(accepted, values, instance)
+        if clash:
+            report.error(number, clash)
+            continue
+        if instance is None:
+            event = Event(**values)
+            if key is not None:
+                event.google_event_id = key
+            creates.append(event)
+        else:
+            stats.remember(instance)
+            for field, value in values.items():
+                setattr(instance, field, value)
+            event = instance
+            updates.append(event)
+        numbers[id(event)] = number
+        seen.update(_unique_values(event))
+
+    for event in creates + updates:
+        gazetteer.locate(event)
+    with transaction.atomic():
+        # The detector only knows this process's writes; recheck against the database
+        # with the chunk's organisers and locations locked (see conflicts.lock)
+        clashing = _overlaps_saved(creates + updates)
+        for event in creates + updates:
+            if id(event) in clashing:
+                report.error(numbers[id(event)], overlap_error(clashing[id(event)]).detail)
+                seen.difference_update(_unique_values(event))
+        creates = [event for event in creates if id(event) not in clashing]
+        updates = [event for event in updates if id(event) not in clashing]
+        created = Event.objects.bulk_create(creates)
+        if created and created[0].pk is None:
+            # MySQL doesn't return primary keys from bulk inserts
+            ids = dict(Event.objects.filter(google_event_id__in=[e.google_event_id for e in created])
+                       .values_list('google_event_id', 'pk'))
+            for event in created:
+                event.pk = ids[event.google_event_id]
+        if updates:
+            Event.objects.bulk_update(updates, WRITABLE_FIELDS + ['event_organiser', 'recurrence_until']
+                                      + gazetteer.GEO_FIELDS)
+        outbox.enqueue_many(created, INSERT, priority=BACKGROUND)
+        outbox.enqueue_many(updates, UPDATE, priority=BACKGROUND)
+        events_bulk_saved(created, updates)
+    report.created += len(created)
+    report.updated += len(updates)
+
+
+def _overlaps_upload(accepted, values, instance):
+    start, end = values.get('event_start_date'), values.get('event_end_date')
+    if start is None or end is None:
+        return None
+    start, end = start.timestamp(), end.timestamp()
+    found = {}
+    for scope in detector.scopes:
+        value = values.get(scope, getattr(instance, scope, None))
+        index = accepted.setdefault((scope, value), IntervalIndex())
+        if index.overlapping(start, end):
+            found[scope] = ['Overlaps another event in this upload.']
+    if not found:
+        for scope in detector.scopes:
+            accepted[(scope, values.get(scope, getattr(instance, scope, None)))].add(start, end, None)
+    return found
+
+
+def _unique_values(event):
+    return {(field, getattr(event, field)) for field in UNIQUE_FIELDS}
+
+
+def _overlaps_saved(events):
+    # {id(event): {scope: [event_id, ...]}} for the events overlapping saved ones
+    if not events:
+        return {}
+    keys = {(scope, getattr(event, scope)) for event in events for scope in detector.scopes}
+    lock(keys)
+    occurrences = {id(event): spans(event.event_start_date, event.event_end_date, event.recurrence, event.time_zone)
+                   for event in events}
+    indexes = booked(keys, min(start for found in occurrences.values() for start, _ in found),
+                     max(end for found in occurrences.values() for _, end in found))
+    clashing = {}
+    for event in events:
+        found = clashes(indexes, occurrences[id(event)], exclude=event.pk,
+                        **{scope: getattr(event, scope) for scope in detector.scopes})
+        if found:
+            clashing[id(event)] = found
+    return clashing
+
+
+# Exporters: each yields encoded chunks for a StreamingHttpResponse
+
+def export_rows(queryset):
+    return queryset.order_by('pk').values(*FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_ndjson(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield (encoder.encode(row) + '\n').encode('utf-8')
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        # Flush every row so only one line is ever held in memory
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_ics(rows):
+    yield b'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//eventapp//events//EN\r\n'
+    for row in rows:
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{row['google_event_id']}",
+            f"DTSTAMP:{_ics_format(row['created_on'])}",
+            f"DTSTART:{_ics_format(row['event_start_date'])}",
+            f"DTEND:{_ics_format(row['event_end_date'])}",
+            f"SUMMARY:{_ics_escape(row['event_name'])}",
+            f"LOCATION:{_ics_escape(row['location'])}",
+            f"DESCRIPTION:{_ics_escape(row['description'])}",
+            f"ORGANIZER;CN=\"{_param_escape(row['event_organiser_name'])}\":mailto:{row['event_organiser_email']}",
+        ]
+        if row['recurrence']:
+            lines.append(f"RRULE:{row['recurrence']}")
+        lines.append('END:VEVENT')
+        yield ''.join(_fold(line) + '\r\n' for line in lines).encode('utf-8')
+    yield b'END:VCALENDAR\r\n'
+
+
+EXPORTERS = {'ndjson': export_ndjson, 'csv': export_csv, 'ics': export_ics}
+
+
+def _uuid(value):
+    try:
+        return uuid.UUID(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _unfold(lines):
+    # RFC 5545: a line starting with a space or tab continues the previous one
+    current = None
+    for line in lines:
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _content_line(line):
+    head, _, value = line.partition(':')
+    if '"' in head:
+        # Quoted parameter values may hold the ':' and ';' that otherwise end them
+        head, value = (_split_quoted(line, ':', 1) + [''])[:2]
+        name, *raw_params = _split_quoted(head, ';')
+    else:
+        name, *raw_params = head.split(';')
+    params = dict(param.partition('=')[::2] for param in raw_params)
+    return name.upper(), {key.upper(): value for key, value in params.items()}, value
+
+
+def _split_quoted(text, separator, maxsplit=-1):
+    # str.split() that leaves separators inside double quotes alone
+    parts, start, quoted = [], 0, False
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted and len(parts) != maxsplit:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _ics_datetime(value, tzid=None):
+    if len(value) == 8:
+        parsed = datetime.datetime.strptime(value, '%Y%m%d')
+    else:
+        parsed = datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        return parsed.replace(tzinfo=datetime.timezone.utc).isoformat()
+    if tzid:
+        tzid = tzid.strip('"')
+        try:
+            zone = zoneinfo.ZoneInfo(tzid)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"'{tzid}' is not an IANA time zone name.")
+        return parsed.replace(tzinfo=zone).isoformat()
+    return parsed.isoformat()
+
+
+def _ics_format(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_unescape(value):
+    # One pass, so the 'n' after an escaped backslash stays an 'n'
+    return re.sub(r'\\([\\;,nN])', lambda match: '\n' if match[1] in 'nN' else match[1], value)
+
+
+def _param_escape(value):
+    # RFC 6868: a parameter value can't hold '"' or a newline, even quoted
+    return (value or '').replace('^', '^^').replace('\n', '^n').replace('"', "^'")
+
+
+def _param_unescape(value):
+    return re.sub(r"\^([n'^])", lambda match: {'n': '\n', "'": '"', '^': '^'}[match[1]], value)
+
+
+def _fold(line, limit=75):
+    encoded = line.encode('utf-8')
+    if len(encoded) <= limit:
+        return line
+    parts, current = [], ''
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = ' '
+        current += char
+    parts.append(current)
+    return '\r\n'.join(parts)
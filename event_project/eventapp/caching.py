@@ -0,0 +1,113 @@
+# caching.py
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import routers
+
+# None turns response caching off. Otherwise it must be a cache every worker shares (see
+# checks.py): versions bumped in one worker's local memory never reach the others.
+CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', None)
+CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)  # seconds
+LOCAL_BACKENDS = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def is_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in LOCAL_BACKENDS
+
+
+def version_key(model):
+    return f'eventapp:version:{model._meta.label_lower}'
+
+
+def model_versions(models):
+    """Current cache version of each model, fetched in one round trip."""
+    cache = get_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock rather than 0 so an evicted version never comes back
+            # with a number that older cached responses were stored under
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def written_key(model):
+    return f'eventapp:written:{model._meta.label_lower}'
+
+
+def bump_version(model):
+    if CACHE_ALIAS is None:
+        return
+    cache = get_cache()
+    try:
+        cache.incr(version_key(model))
+    except ValueError:
+        cache.add(version_key(model), time.time_ns(), timeout=None)
+    if routers.REPLICAS:
+        # Replicas may not have the change yet; see recently_written()
+        cache.set(written_key(model), 1, routers.STICKY_SECONDS)
+
+
+def recently_written(models):
+    """Whether any of `models` changed within the last DATABASE_REPLICA_STICKY_SECONDS."""
+    return bool(get_cache().get_many([written_key(model) for model in models]))
+
+
+def invalidate(model):
+    # After commit, so a request can't cache rows the transaction might still roll back
+    transaction.on_commit(lambda: bump_version(model))
+
+
+class CachedResponseMixin:
+    """Serves GET responses from the cache, keyed by the versions of `cache_models`.
+
+    Any save or delete of those models (see signals.py) bumps their version, which
+    changes the ETag and orphans every cached response built from the old rows.
+    Because the ETag comes from the versions alone, If-None-Match is answered with a
+    304 before any query runs or anything is serialized. Shortly after a write the
+    response is built from the primary: a lagging replica would otherwise have the old
+    rows cached under the new version. With RESPONSE_CACHE_ALIAS unset, every GET is
+    built afresh and carries no ETag.
+    """
+    cache_models = ()
+    cache_timeout = CACHE_TIMEOUT
+
+    def get_etag(self, request):
+        parts = [request.get_host(), request.get_full_path(), request.headers.get('Accept', '')]
+        parts += map(str, model_versions(self.cache_models))
+        return quote_etag(hashlib.md5('|'.join(parts).encode('utf-8'), usedforsecurity=False).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        if CACHE_ALIAS is None:
+            return super().get(request, *args, **kwargs)
+        etag = self.get_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        cache = get_cache()
+        key = f'eventapp:response:{etag}'
+        data = cache.get(key)
+        if data is None:
+            if routers.REPLICAS and recently_written(self.cache_models):
+                routers.use_primary()
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, self.cache_timeout)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,145 @@
+# calendar_accounts.py
+import base64
+import collections
+import hashlib
+import json
+import threading
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+
+from .calendar_service import ROOT_URL, SCOPES, CalendarServiceRegistry, CredentialStore, get_registry
+from .calendar_sync import CALENDAR_ID
+from .models import CalendarAccount
+
+# Fernet keys for the stored tokens, newest first: the first encrypts, all of them decrypt,
+# so a key is rotated by prepending a new one. Defaults to one derived from SECRET_KEY.
+TOKEN_KEYS = getattr(settings, 'CALENDAR_TOKEN_KEYS', None)
+# Accounts whose authorized services are kept around at once
+POOL_SIZE = getattr(settings, 'CALENDAR_SERVICE_POOL_SIZE', 128)
+
+
+class AccountNotConnected(Exception):
+    pass
+
+
+def _cipher():
+    keys = TOKEN_KEYS or [base64.urlsafe_b64encode(hashlib.sha256(settings.SECRET_KEY.encode()).digest())]
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def encrypt_token(creds):
+    return _cipher().encrypt(creds.to_json().encode('utf-8')).decode('ascii')
+
+
+def decrypt_token(token):
+    try:
+        info = json.loads(_cipher().decrypt(token.encode('ascii')))
+    except InvalidToken:
+        raise AccountNotConnected('The stored token was encrypted with a key that is no longer configured.')
+    return Credentials.from_authorized_user_info(info, SCOPES)
+
+
+def connect(email, creds, organiser=None, calendar_id=None):
+    """Store (or replace) the token for a Google account; returns the CalendarAccount."""
+    defaults = {'token': encrypt_token(creds)}
+    if organiser is not None:
+        defaults['organiser'] = organiser
+    if calendar_id:
+        defaults['calendar_id'] = calendar_id
+    account, _ = CalendarAccount.objects.update_or_create(email=email, defaults=defaults)
+    get_pool().discard(account.pk)
+    return account
+
+
+def calendar_for(account, calendar_id=''):
+    # An event's or outbox row's own calendar, else the account's default, else the deployment's
+    if calendar_id:
+        return calendar_id
+    return account.calendar_id if account is not None else CALENDAR_ID
+
+
+class AccountCredentialStore(CredentialStore):
+    """A CredentialStore reading and writing one CalendarAccount's encrypted token.
+
+    There is no refresher thread per account, which wouldn't scale to thousands of them;
+    get() refreshes a token that is about to expire before handing it out instead.
+    """
+
+    def __init__(self, account, **kwargs):
+        super().__init__(**kwargs)
+        self.account = account
+
+    def _load(self):
+        if not self.account.token:
+            raise AccountNotConnected(f'{self.account.email} has no Calendar token; run calendar_connect.')
+        creds = decrypt_token(self.account.token)
+        if not creds.valid and creds.refresh_token:
+            self._refresh(creds)
+        return creds
+
+    def _save(self, creds):
+        self.account.token = encrypt_token(creds)
+        # Not save(): the pool would drop this very store on the post_save signal
+        CalendarAccount.objects.filter(pk=self.account.pk).update(token=self.account.token, updated_on=timezone.now())
+
+    def _start_refresher(self):
+        pass
+
+
+class CalendarServicePool:
+    """Per-account CalendarServiceRegistry objects, least recently used evicted first.
+
+    Building credentials and services is the slow part of talking to a new account, so
+    workers juggling many accounts keep the busiest ones warm. None stands for the
+    deployment's own account and is served by the process-wide registry.
+    """
+
+    def __init__(self, size=POOL_SIZE, root_url=ROOT_URL):
+        self.size = size
+        self.root_url = root_url
+        self._lock = threading.Lock()
+        self._registries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._registries)
+
+    def registry(self, account):
+        if account is None:
+            return get_registry()
+        with self._lock:
+            registry = self._registries.get(account.pk)
+            if registry is not None:
+                self._registries.move_to_end(account.pk)
+                return registry
+            registry = CalendarServiceRegistry(AccountCredentialStore(account), root_url=self.root_url)
+            self._registries[account.pk] = registry
+            while len(self._registries) > self.size:
+                _, evicted = self._registries.popitem(last=False)
+                evicted.credential_store.stop()
+            return registry
+
+    def get_service(self, account=None):
+        return self.registry(account).get_service()
+
+    def discard(self, account_id):
+        # After the stored token changed (reconnected, revoked) or the account was deleted
+        with self._lock:
+            registry = self._registries.pop(account_id, None)
+        if registry is not None:
+            registry.credential_store.stop()
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CalendarServicePool()
+    return _pool
@@ -0,0 +1,233 @@
+# calendar_async.py
+import asyncio
+import copy
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+from django.conf import settings
+from googleapiclient.errors import HttpError
+
+from . import metrics
+from .calendar_service import get_registry
+from .ratelimit import INTERACTIVE
+from .calendar_sync import (
+    CALENDAR_ID, DELETE, INSERT, MAX_RETRIES, UPDATE, SyncReport, event_body, field_hashes, google_id,
+    is_already_applied, is_conflict, is_retryable, plan_update, remember_push,
+)
+
+try:
+    import httpx
+except ImportError:  # httpx is optional; without it calls run on a pool of blocking clients
+    httpx = None
+
+# Calendar calls allowed in flight at once per client
+CONCURRENCY = getattr(settings, 'GOOGLE_CALENDAR_ASYNC_CONCURRENCY', 100)
+GOOGLE_ROOT_URL = 'https://www.googleapis.com/'
+# An update sending only the changed fields
+PATCH = 'patch'
+EVENTS_PATH = 'calendar/v3/calendars/{calendar}/events'
+
+
+class AsyncCalendarClient:
+    """Issues Calendar inserts, updates and deletes concurrently from one event loop.
+
+    With httpx installed every call is a non-blocking request over a shared connection
+    pool. Otherwise the googleapiclient calls run on a thread pool as large as the
+    concurrency limit. Either way a semaphore caps the calls in flight, and retryable
+    failures back off per call without holding a slot.
+    """
+
+    def __init__(self, registry=None, calendar_id=CALENDAR_ID, concurrency=CONCURRENCY,
+                 max_retries=MAX_RETRIES, backoff=0.5, use_httpx=None, limiter=None):
+        self.registry = registry or get_registry()
+        self.calendar_id = calendar_id
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Optional ratelimit.RateLimiter; tokens are taken before a call claims a slot
+        self.limiter = limiter
+        self.use_httpx = httpx is not None if use_httpx is None else use_httpx
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.conflicts = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._http = None
+        self._executor = None
+        self._local = threading.local()
+        # Owner of the connections, thread pool and in-flight counts (see for_account)
+        self._root = self
+
+    def for_account(self, registry, calendar_id, limiter=None):
+        """A client writing to another account's calendar through this one's connections.
+
+        It shares the concurrency limit, the HTTP pool and the thread pool; closing this
+        client closes both.
+        """
+        client = copy.copy(self)
+        client.registry, client.calendar_id, client.limiter = registry, calendar_id, limiter
+        client.conflicts = 0
+        client._local = threading.local()
+        return client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def insert(self, event, priority=INTERACTIVE):
+        key = google_id(event.google_event_id, event.external_google_id)
+        body = event_body(event)
+        response = await self._call(INSERT, key, dict(body, id=key), priority)
+        remember_push(event, field_hashes(body), response)
+        return response
+
+    async def update(self, event, priority=INTERACTIVE):
+        """PATCH what changed since the last push, with If-Match; no call at all if nothing did."""
+        key = google_id(event.google_event_id, event.external_google_id)
+        body, hashes, patch = plan_update(event)
+        if body is None:
+            return None
+        try:
+            response = await self._call(PATCH if patch else UPDATE, key, body, priority, etag=event.google_etag)
+        except HttpError as e:
+            if not is_conflict(e):
+                raise
+            # Changed in Google since our last push; this app's copy wins
+            self.conflicts += 1
+            response = await self._call(UPDATE, key, event_body(event), priority)
+        remember_push(event, hashes, response)
+        return response
+
+    async def delete(self, google_event_id, external_id='', priority=INTERACTIVE):
+        return await self._call(DELETE, google_id(google_event_id, external_id), None, priority)
+
+    async def run(self, operations, priority=INTERACTIVE):
+        """Run (action, google_event_id, event) operations concurrently; returns a SyncReport.
+
+        For a delete, `event` only needs the ids: an outbox row will do.
+        """
+        report = SyncReport()
+        start = time.perf_counter()
+        conflicts = self.conflicts
+
+        async def one(action, key, event):
+            request_id = google_id(key, event.external_google_id)
+            try:
+                if action == INSERT:
+                    report.succeeded[request_id] = await self.insert(event, priority)
+                elif action == DELETE:
+                    report.succeeded[request_id] = await self.delete(key, event.external_google_id, priority)
+                    return
+                elif plan_update(event)[0] is None:
+                    report.skipped.add(request_id)
+                    report.succeeded[request_id] = None
+                    return
+                else:
+                    report.succeeded[request_id] = await self.update(event, priority)
+                report.synced_events.append(event)
+            except Exception as e:
+                report.failed[request_id] = e
+
+        await asyncio.gather(*(one(*operation) for operation in operations))
+        report.requests = len(operations) - len(report.skipped)
+        report.conflicts = self.conflicts - conflicts
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    async def _call(self, action, key, body, priority=INTERACTIVE, etag=None):
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await self.limiter.acquire_async(1, priority)
+            try:
+                async with self._semaphore:
+                    root = self._root
+                    root.in_flight += 1
+                    root.peak_in_flight = max(root.peak_in_flight, root.in_flight)
+                    try:
+                        with metrics.calendar_call(f'calendar.events.{action}'):
+                            if self.use_httpx:
+                                result = await self._send_httpx(action, key, body, etag)
+                            else:
+                                result = await asyncio.get_running_loop().run_in_executor(
+                                    self._get_executor(), self._send_blocking, action, key, body, etag)
+                    finally:
+                        root.in_flight -= 1
+                if self.limiter is not None:
+                    self.limiter.record(None)
+                return result
+            except Exception as e:
+                if self.limiter is not None:
+                    self.limiter.record(e)
+                if is_already_applied(action, e):
+                    return None
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+
+    async def _send_httpx(self, action, key, body, etag=None):
+        root = self._root
+        if root._http is None:
+            root._http = httpx.AsyncClient(
+                base_url=root.registry.root_url or GOOGLE_ROOT_URL,
+                limits=httpx.Limits(max_connections=root.concurrency, max_keepalive_connections=root.concurrency),
+                timeout=30,
+            )
+        path = EVENTS_PATH.format(calendar=urllib.parse.quote(self.calendar_id, safe=''))
+        if action != INSERT:
+            path += '/' + key
+        method = {INSERT: 'POST', DELETE: 'DELETE', PATCH: 'PATCH'}.get(action, 'PUT')
+        headers = await self._auth_headers()
+        if etag:
+            headers['If-Match'] = etag
+        response = await root._http.request(method, path, json=body, headers=headers)
+        if response.status_code >= 400:
+            # Same exception type as googleapiclient so the retry rules in calendar_sync apply
+            resp = httplib2.Response(dict(response.headers, status=str(response.status_code)))
+            raise HttpError(resp, response.content, uri=str(response.url))
+        return response.json() if response.content else None
+
+    async def _auth_headers(self):
+        if self.registry.root_url:
+            # Emulators and the local fake server don't check OAuth tokens
+            return {}
+        # Usually a cached token; the first call may load it from disk, so keep it off the loop
+        creds = await asyncio.to_thread(self.registry.credential_store.get)
+        return {'Authorization': f'Bearer {creds.token}'}
+
+    def _get_executor(self):
+        root = self._root
+        if root._executor is None:
+            root._executor = ThreadPoolExecutor(root.concurrency, thread_name_prefix='calendar-async')
+        return root._executor
+
+    def _send_blocking(self, action, key, body, etag=None):
+        # service.events() is slow to build, so keep one per pool thread
+        events = getattr(self._local, 'events', None)
+        if events is None:
+            events = self._local.events = self.registry.build_service().events()
+        if action == INSERT:
+            return events.insert(calendarId=self.calendar_id, body=body).execute()
+        if action == DELETE:
+            return events.delete(calendarId=self.calendar_id, eventId=key).execute()
+        if action == PATCH:
+            request = events.patch(calendarId=self.calendar_id, eventId=key, body=body)
+        else:
+            request = events.update(calendarId=self.calendar_id, eventId=key, body=body)
+        if etag:
+            request.headers['If-Match'] = etag
+        return request.execute()
@@ -0,0 +1,247 @@
+# calendar_pull.py
+import datetime
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from googleapiclient.errors import HttpError
+
+from . import caching, gazetteer, ratelimit, recurrence, stats
+from .calendar_sync import CALENDAR_ID, SYNC_FIELDS, TIME_ZONE, event_body, field_hashes, remember_push
+from .models import CalendarOutbox, CalendarSyncState, Event, EventOrganizer
+
+PAGE_SIZE = getattr(settings, 'GOOGLE_CALENDAR_PULL_PAGE_SIZE', 250)
+PULLED_FIELDS = ['event_name', 'location', 'description', 'event_start_date', 'event_end_date', 'time_zone',
+                 'recurrence', 'recurrence_until', 'occurrences_from', 'occurrences_until'] + SYNC_FIELDS
+# google_event_id of an event created in Google: a UUID named by its account, calendar and Google's id
+GOOGLE_CREATED = uuid.UUID('5f0c7a3e-2b1d-4c8e-9a6f-3d2e1b0c9f87')
+
+
+class PullReport:
+    def __init__(self):
+        self.pages = 0
+        self.updated = 0
+        self.created = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.full_sync = False
+
+    def __str__(self):
+        kind = 'full' if self.full_sync else 'incremental'
+        return (f'{kind} pull: {self.pages} pages, {self.created} created, {self.updated} updated, '
+                f'{self.deleted} deleted, {self.skipped} skipped')
+
+
+def pull(service, calendar_id=CALENDAR_ID, page_size=PAGE_SIZE, full=False, account=None):
+    """Apply everything that changed in Google since the stored sync token.
+
+    Pages are applied as they arrive so memory stays bounded by page_size. A 410 Gone
+    (expired or invalidated token) falls back to a paged full listing, after which the
+    events Google no longer has are deleted here too. `account` is the CalendarAccount
+    `service` is authorized as; None is the deployment's own token.
+    """
+    state, _ = CalendarSyncState.objects.get_or_create(account=account, calendar_id=calendar_id)
+    events = service.events()
+    report = PullReport()
+    target = (account, calendar_id)
+    sync_token = None if full else state.next_sync_token or None
+    # Deletions that happened while the token was invalid are only noticed by what a full
+    # listing leaves out. The first listing ever can't tell a deletion from a local event
+    # that was never in Google, so it deletes nothing.
+    seen = set() if state.next_sync_token else None
+    started = timezone.now()
+    try:
+        next_sync_token = _pull_pages(events, target, sync_token, page_size, report, seen)
+    except HttpError as e:
+        if e.resp.status != 410 or sync_token is None:
+            raise
+        report = PullReport()
+        next_sync_token = _pull_pages(events, target, None, page_size, report, seen)
+    if report.full_sync and seen is not None:
+        report.deleted += _delete_missing(seen, started, page_size, target)
+    if report.full_sync:
+        state.full_syncs += 1
+    state.next_sync_token = next_sync_token or ''
+    state.last_synced_on = timezone.now()
+    # Not notified_on: a push notification may have marked the calendar again meanwhile
+    state.save(update_fields=['next_sync_token', 'last_synced_on', 'full_syncs'])
+    return report
+
+
+def _pull_pages(events, target, sync_token, page_size, report, seen=None):
+    account, calendar_id = target
+    report.full_sync = sync_token is None
+    page_token = None
+    while True:
+        params = {'calendarId': calendar_id, 'maxResults': page_size}
+        if page_token:
+            params['pageToken'] = page_token
+        elif sync_token:
+            params['syncToken'] = sync_token
+        page = ratelimit.execute(events.list(**params), priority=ratelimit.BACKGROUND,
+                                 limiter=ratelimit.get_limiter(account and account.pk))
+        items = page.get('items', [])
+        apply_changes(items, report, *target)
+        if report.full_sync and seen is not None:
+            seen.update(_local_id(item.get('id'), target)[0] for item in items)
+        report.pages += 1
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return page.get('nextSyncToken')
+
+
+def apply_changes(items, report, account=None, calendar_id=CALENDAR_ID):
+    # New events remember where they came from
+    origin = _origin(account, calendar_id)
+    changed, cancelled, external = {}, set(), {}
+    for item in items:
+        key, external_id = _local_id(item.get('id'), (account, calendar_id))
+        external[key] = external_id
+        if item.get('status') == 'cancelled':
+            cancelled.add(key)
+        else:
+            changed[key] = item
+
+    with transaction.atomic(), stats.deferred():
+        if cancelled:
+            report.deleted += _delete(Event.objects.filter(google_event_id__in=cancelled))
+        existing = Event.objects.in_bulk(list(changed), field_name='google_event_id')
+        # Local edits still waiting in the outbox are newer than anything Google can send back
+        pending = set(CalendarOutbox.objects.filter(google_event_id__in=list(existing), state='pending')
+                      .values_list('google_event_id', flat=True))
+        updates, creates = [], []
+        for key, item in changed.items():
+            event = existing.get(key)
+            fields = _fields(item)
+            if event is None:
+                event = Event(google_event_id=key, external_google_id=external[key], **origin, **_organiser(item))
+                creates.append(event)
+            elif key in pending or all(getattr(event, field) == value for field, value in fields.items()):
+                # Unchanged is usually Google echoing our own push back
+                report.skipped += 1
+                continue
+            else:
+                stats.remember(event)
+                updates.append(event)
+            for field, value in fields.items():
+                setattr(event, field, value)
+            # Google holds exactly this now, so pushing it back would be a wasted call
+            remember_push(event, field_hashes(event_body(event)), item)
+            gazetteer.locate(event)
+        if updates:
+            Event.objects.bulk_update(updates, PULLED_FIELDS + gazetteer.GEO_FIELDS)
+        if creates:
+            organisers = EventOrganizer.objects.in_bulk(
+                list({event.event_organiser_email for event in creates}), field_name='email')
+            for event in creates:
+                event.event_organiser = organisers.get(event.event_organiser_email)
+            Event.objects.bulk_create(creates, ignore_conflicts=True)
+        report.updated += len(updates)
+        report.created += len(creates)
+        # bulk_create may not have set primary keys, so reload the ones with occurrences to rebuild
+        keys = [event.google_event_id for event in updates + creates
+                if event.recurrence or event.occurrences_until is not None]
+        for event in Event.objects.filter(google_event_id__in=keys):
+            recurrence.on_event_saved(event)
+        # A create ignore_conflicts skipped is counted twice until reconcile_stats
+        stats.events_bulk_saved(creates, updates)
+        # bulk_update/bulk_create send no signals
+        caching.invalidate(Event)
+
+
+def _origin(account, calendar_id):
+    # The calendar is blank when it's the account's default one
+    default_calendar = account.calendar_id if account is not None else CALENDAR_ID
+    return {'calendar_account': account, 'calendar_id': '' if calendar_id == default_calendar else calendar_id}
+
+
+def _local_id(item_id, target):
+    """(google_event_id, external_google_id) of the event with Google id `item_id`.
+
+    Events this app pushed use google_event_id's hex as their id. Any other id was
+    made by Google, and maps onto the same UUID every time it's pulled from the same
+    (account, calendar) `target`.
+    """
+    try:
+        key = uuid.UUID(hex=item_id)
+    except ValueError:
+        key = None
+    if key is not None and key.hex == item_id:
+        return key, ''
+    account, calendar_id = target
+    return uuid.uuid5(GOOGLE_CREATED, f'{account and account.pk}/{calendar_id}/{item_id}'), item_id
+
+
+def _delete(events):
+    # Counting events only, not the rows deleting them cascades to
+    return events.delete()[1].get(Event._meta.label, 0)
+
+
+def _delete_missing(seen, started, chunk_size, target):
+    """Delete the events of `target` a full listing didn't return; returns how many.
+
+    Events whose writes are still queued (or dead-lettered), or were pushed after the
+    listing began, may just not have been in Google when it was read, so they're kept.
+    `seen` holds every listed id, so this needs memory in proportion to the calendar.
+    """
+    unsettled = CalendarOutbox.objects.filter(Q(state__in=['pending', 'dead']) | Q(processed_on__gte=started))
+    listed = Event.objects.filter(**_origin(*target)).exclude(google_event_id__in=unsettled.values('google_event_id'))
+    missing = [pk for pk, key in listed.values_list('pk', 'google_event_id').iterator(chunk_size=chunk_size)
+               if key not in seen]
+    deleted = 0
+    for offset in range(0, len(missing), chunk_size):
+        with transaction.atomic(), stats.deferred():
+            deleted += _delete(Event.objects.filter(pk__in=missing[offset:offset + chunk_size]))
+    return deleted
+
+
+def _fields(item):
+    return {
+        'event_name': item.get('summary', '')[:100],
+        'location': item.get('location', '')[:100],
+        'description': item.get('description', ''),
+        'event_start_date': _when(item.get('start', {})),
+        'event_end_date': _when(item.get('end', {})),
+        # Blank for the default, as events made here store it
+        'time_zone': _time_zone(item.get('start', {}).get('timeZone', '')),
+        **_recurrence(item),
+    }
+
+
+def _time_zone(value):
+    return '' if value == TIME_ZONE else value
+
+
+def _recurrence(item):
+    rule = next((line[len('RRULE:'):] for line in item.get('recurrence', []) if line.startswith('RRULE:')), '')
+    try:
+        rule = recurrence.parse(rule)
+    except ValueError:
+        # A rule this app can't expand; keep the first occurrence only
+        rule = ''
+    if not rule:
+        return {'recurrence': '', 'recurrence_until': None}
+    start, end = _when(item.get('start', {})), _when(item.get('end', {}))
+    until = recurrence.series_end(rule, start, end, item.get('start', {}).get('timeZone', ''))
+    return {'recurrence': rule, 'recurrence_until': until, **recurrence.unmaterialized(start)}
+
+
+def _organiser(item):
+    organiser = item.get('organizer') or item.get('creator') or {}
+    return {
+        'event_organiser_email': organiser.get('email', ''),
+        'event_organiser_name': organiser.get('displayName', '')[:100],
+    }
+
+
+def _when(value):
+    if 'dateTime' in value:
+        # In UTC, as the database hands them back, so unchanged events compare equal
+        when = parse_datetime(value['dateTime'])
+        return when.astimezone(datetime.timezone.utc) if when and when.tzinfo else when
+    # All-day events only carry a date
+    day = parse_date(value['date'])
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
@@ -0,0 +1,187 @@
+# calendar_service.py
+import copy
+import datetime
+import json
+import os.path
+import pickle
+import threading
+
+import google_auth_httplib2
+import httplib2
+from django.conf import settings
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+TOKEN_PATH = getattr(settings, 'GOOGLE_TOKEN_PATH', 'token.pickle')
+CLIENT_SECRETS_PATH = getattr(settings, 'GOOGLE_CLIENT_SECRETS_PATH', 'eventapp/credentials.json')
+# Refresh the access token this many seconds before Google expires it
+REFRESH_MARGIN = getattr(settings, 'GOOGLE_TOKEN_REFRESH_MARGIN', 300)
+# Point the client at an emulator / fake server instead of googleapis.com
+ROOT_URL = getattr(settings, 'GOOGLE_CALENDAR_ROOT_URL', None)
+
+_discovery_lock = threading.Lock()
+_discovery_doc = None
+
+
+def get_discovery_document():
+    # Parsed once per process from the copy shipped with googleapiclient,
+    # so building a service never touches the network.
+    global _discovery_doc
+    if _discovery_doc is None:
+        with _discovery_lock:
+            if _discovery_doc is None:
+                _discovery_doc = json.loads(discovery_cache.get_static_doc('calendar', 'v3'))
+    return _discovery_doc
+
+
+class CredentialStore:
+    """Loads the OAuth token once and keeps it fresh from a background thread."""
+
+    def __init__(self, token_path=TOKEN_PATH, client_secrets_path=CLIENT_SECRETS_PATH,
+                 refresh_margin=REFRESH_MARGIN):
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self.refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self._creds = None
+        self._refresher = None
+        self._stopped = threading.Event()
+
+    def get(self):
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load()
+                self._start_refresher()
+            elif self._expires_soon(self._creds):
+                # The refresher fell behind (or is not running); don't hand out a dead token
+                self._refresh(self._creds)
+            return self._creds
+
+    def stop(self):
+        self._stopped.set()
+
+    def _load(self):
+        creds = None
+        if os.path.exists(self.token_path):
+            try:
+                with open(self.token_path, 'rb') as token:
+                    creds = pickle.load(token)
+            except Exception as e:
+                print(f"Error loading credentials: {e}")
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                self._refresh(creds)
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_path, SCOPES)
+                creds = flow.run_local_server(port=0)
+                self._save(creds)
+        return creds
+
+    def _save(self, creds):
+        try:
+            with open(self.token_path, 'wb') as token:
+                pickle.dump(creds, token)
+        except Exception as e:
+            print(f"Error saving credentials: {e}")
+
+    def _refresh(self, creds):
+        try:
+            creds.refresh(Request())
+        except Exception as e:
+            print(f"Error refreshing token: {e}")
+        else:
+            self._save(creds)
+
+    def _expires_soon(self, creds):
+        expiry = getattr(creds, 'expiry', None)
+        if expiry is None:
+            return False
+        return expiry - datetime.timedelta(seconds=self.refresh_margin) <= _utcnow()
+
+    def _seconds_until_refresh(self, creds):
+        expiry = getattr(creds, 'expiry', None)
+        if expiry is None:
+            return None
+        margin = datetime.timedelta(seconds=self.refresh_margin)
+        return max((expiry - margin - _utcnow()).total_seconds(), 1)
+
+    def _start_refresher(self):
+        if self._refresher is not None or getattr(self._creds, 'refresh_token', None) is None:
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name='calendar-token-refresher',
+                                           daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                wait = self._seconds_until_refresh(self._creds)
+            if wait is None or self._stopped.wait(wait):
+                return
+            with self._lock:
+                if self._expires_soon(self._creds):
+                    self._refresh(self._creds)
+
+
+class CalendarServiceRegistry:
+    """Hands out one Calendar service per thread, built from the cached discovery document.
+
+    httplib2 connections are not thread-safe, so each worker thread gets its own
+    service object; the credentials and discovery document behind them are shared.
+    """
+
+    def __init__(self, credential_store=None, root_url=ROOT_URL):
+        self.credential_store = credential_store or CredentialStore()
+        self.root_url = root_url
+        self._local = threading.local()
+
+    def get_service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self.build_service()
+            self._local.service = service
+        return service
+
+    def build_service(self):
+        document = get_discovery_document()
+        if self.root_url:
+            document = copy.copy(document)
+            document['rootUrl'] = self.root_url
+            document['baseUrl'] = self.root_url + document['servicePath']
+            # Emulators and the local fake server don't check OAuth tokens
+            return build_from_document(document, http=httplib2.Http())
+        http = google_auth_httplib2.AuthorizedHttp(self.credential_store.get(), http=httplib2.Http())
+        return build_from_document(document, http=http)
+
+    def reset(self):
+        self._local = threading.local()
+
+
+def _utcnow():
+    # google.auth stores expiry as a naive UTC datetime
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+_registry_lock = threading.Lock()
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CalendarServiceRegistry()
+    return _registry
+
+
+def get_calendar_service():
+    return get_registry().get_service()
+
+
+def authenticate():
+    return get_registry().credential_store.get()
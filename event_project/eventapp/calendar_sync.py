@@ -0,0 +1,263 @@
+# calendar_sync.py
+import hashlib
+import json
+import random
+import time
+import uuid
+
+from django.conf import settings
+from googleapiclient.errors import HttpError
+
+from . import metrics
+from .ratelimit import INTERACTIVE
+
+# Used for events with no account or calendar of their own (see calendar_accounts.calendar_for)
+CALENDAR_ID = getattr(settings, 'GOOGLE_CALENDAR_ID', 'primary')
+TIME_ZONE = getattr(settings, 'GOOGLE_CALENDAR_TIME_ZONE', 'Asia/Kolkata')
+# Google recommends keeping Calendar batches at or below 50 calls
+BATCH_SIZE = getattr(settings, 'GOOGLE_CALENDAR_BATCH_SIZE', 50)
+MAX_RETRIES = getattr(settings, 'GOOGLE_CALENDAR_MAX_RETRIES', 5)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+# Event columns remembering what Google was last sent
+SYNC_FIELDS = ['google_sync_hash', 'google_sync_fields', 'google_etag']
+
+
+def google_id(google_event_id, external_id=''):
+    # Event.google_event_id doubles as the Google event id: a UUID's hex digits
+    # are valid base32hex, so inserts are idempotent across retries. Events created
+    # in Google keep the id Google gave them (Event.external_google_id).
+    return external_id or uuid.UUID(str(google_event_id)).hex
+
+
+def event_body(event):
+    time_zone = event.time_zone or TIME_ZONE
+    body = {
+        'summary': event.event_name,
+        'location': event.location,
+        'description': event.description,
+        'start': {'dateTime': event.event_start_date.isoformat(), 'timeZone': time_zone},
+        'end': {'dateTime': event.event_end_date.isoformat(), 'timeZone': time_zone},
+    }
+    if event.recurrence:
+        # One recurring event in Google; it expands the occurrences itself
+        body['recurrence'] = [f'RRULE:{event.recurrence}']
+    return body
+
+
+def field_hashes(body):
+    return {
+        key: hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        for key, value in body.items()
+    }
+
+
+def content_hash(hashes):
+    return hashlib.sha1(json.dumps(hashes, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def plan_update(event):
+    """Work out the cheapest update for `event`: (body, hashes, patch).
+
+    body is None when Google already holds the current state. Otherwise, when we know
+    what was pushed last, body holds only the changed top-level fields and patch is
+    True; for events never pushed through here it is the full body for a PUT.
+    """
+    body = event_body(event)
+    hashes = field_hashes(body)
+    if event.google_sync_hash == content_hash(hashes):
+        return None, hashes, False
+    previous = event.google_sync_fields or {}
+    if previous:
+        changed = {key: value for key, value in body.items() if previous.get(key) != hashes[key]}
+        # Fields no longer sent (a dropped recurrence) are cleared explicitly
+        changed.update(dict.fromkeys(previous.keys() - body.keys()))
+        return changed, hashes, True
+    return body, hashes, False
+
+
+def remember_push(event, hashes, response):
+    # Call after Google accepted `hashes`' body; save SYNC_FIELDS to keep it
+    event.google_sync_fields = hashes
+    event.google_sync_hash = content_hash(hashes)
+    event.google_etag = (response or {}).get('etag', '')
+
+
+def is_conflict(exception):
+    # If-Match didn't match: the event was changed in Google since we last pushed it
+    return isinstance(exception, HttpError) and exception.resp.status == 412
+
+
+def is_retryable(exception):
+    if not isinstance(exception, HttpError):
+        return True
+    if exception.resp.status in RETRYABLE_STATUSES:
+        return True
+    reasons = {detail.get('reason') for detail in (exception.error_details or []) if isinstance(detail, dict)}
+    return exception.resp.status == 403 and bool(reasons & RETRYABLE_REASONS)
+
+
+def is_already_applied(action, exception):
+    # A retried insert that already landed comes back 409; a delete of a missing event 404/410
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    return (action == INSERT and status == 409) or (action == DELETE and status in (404, 410))
+
+
+class SyncReport:
+    def __init__(self):
+        self.succeeded = {}
+        self.failed = {}
+        # Updates not sent because Google already had them (also counted as succeeded)
+        self.skipped = set()
+        self.conflicts = 0
+        # Events whose SYNC_FIELDS changed and should be saved
+        self.synced_events = []
+        self.requests = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    @property
+    def events_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return len(self.succeeded) / self.elapsed
+
+    def __str__(self):
+        return (f'{len(self.succeeded)} synced, {len(self.failed)} failed in {self.batches} batches, '
+                f'{len(self.skipped)} calls avoided ({self.elapsed:.3f}s, {self.events_per_second:.1f} events/s)')
+
+
+class BatchSyncEngine:
+    """Collects pending inserts/updates/deletes and sends them through the batch endpoint.
+
+    Operations are keyed by google_event_id. Only the sub-requests that failed with a
+    retryable error are resent, with exponential backoff between rounds. Updates go out
+    as If-Match PATCHes of the changed fields, or not at all (see plan_update); one
+    that hits a 412 is resent at once as a full PUT, since this app's copy wins.
+    """
+
+    def __init__(self, service, calendar_id=CALENDAR_ID, batch_size=BATCH_SIZE,
+                 max_retries=MAX_RETRIES, backoff=0.5, limiter=None, priority=INTERACTIVE):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Optional ratelimit.RateLimiter; every sub-request of a batch costs one token
+        self.limiter = limiter
+        self.priority = priority
+        self._pending = {}
+        self._plans = {}
+        self._skipped = set()
+        self._overwrite = set()
+        # service.events() rebuilds every method from the discovery document (~10ms), so do it once
+        self._events = service.events()
+
+    def insert(self, event):
+        key = google_id(event.google_event_id, event.external_google_id)
+        self._skipped.discard(key)
+        self._pending[key] = (INSERT, event)
+
+    def update(self, event):
+        key = google_id(event.google_event_id, event.external_google_id)
+        body, hashes, patch = plan_update(event)
+        if body is None:
+            self._pending.pop(key, None)
+            self._skipped.add(key)
+            return
+        self._skipped.discard(key)
+        self._plans[key] = (body, hashes, patch)
+        self._pending[key] = (UPDATE, event)
+
+    def delete(self, google_event_id, external_id=''):
+        key = google_id(google_event_id, external_id)
+        self._skipped.discard(key)
+        self._pending[key] = (DELETE, None)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        report = SyncReport()
+        pending, self._pending = self._pending, {}
+        report.skipped, self._skipped = self._skipped, set()
+        report.succeeded.update(dict.fromkeys(report.skipped))
+        start = time.perf_counter()
+        attempt = 0
+        while pending:
+            retry, overwrite = {}, {}
+            keys = list(pending)
+            for offset in range(0, len(keys), self.batch_size):
+                chunk = {key: pending[key] for key in keys[offset:offset + self.batch_size]}
+                self._execute_batch(chunk, report, retry, overwrite)
+            if retry:
+                attempt += 1
+                if attempt > self.max_retries:
+                    report.failed.update({key: error for key, (_, _, error) in retry.items()})
+                    retry = {}
+                else:
+                    time.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            pending = {key: (action, event) for key, (action, event, _) in retry.items()}
+            # Conflicts are resent right away as full PUTs; they don't use up a retry
+            pending.update(overwrite)
+        self._plans, self._overwrite = {}, set()
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def _execute_batch(self, chunk, report, retry, overwrite):
+        outcomes = []
+
+        def callback(request_id, response, exception):
+            action, event = chunk[request_id]
+            outcomes.append(exception)
+            metrics.record_calendar_outcome(f'calendar.events.{action}', exception)
+            if exception is None or is_already_applied(action, exception):
+                report.succeeded[request_id] = response
+                if action != DELETE:
+                    hashes = self._plans[request_id][1] if action == UPDATE else field_hashes(event_body(event))
+                    remember_push(event, hashes, response)
+                    report.synced_events.append(event)
+            elif is_conflict(exception) and request_id not in self._overwrite:
+                report.conflicts += 1
+                self._overwrite.add(request_id)
+                overwrite[request_id] = (action, event)
+            elif is_retryable(exception):
+                retry[request_id] = (action, event, exception)
+            else:
+                report.failed[request_id] = exception
+
+        if self.limiter is not None:
+            self.limiter.acquire(len(chunk), self.priority)
+        batch = self.service.new_batch_http_request(callback=callback)
+        for key, (action, event) in chunk.items():
+            batch.add(self._request(key, action, event), request_id=key)
+        with metrics.calendar_call('calendar.batch'):
+            batch.execute()
+        if self.limiter is not None:
+            self.limiter.record_many(outcomes)
+        report.batches += 1
+        report.requests += len(chunk)
+
+    def _request(self, key, action, event):
+        events = self._events
+        if action == INSERT:
+            return events.insert(calendarId=self.calendar_id, body=dict(event_body(event), id=key))
+        if action == UPDATE:
+            body, _, patch = self._plans[key]
+            if key in self._overwrite:
+                return events.update(calendarId=self.calendar_id, eventId=key, body=event_body(event))
+            if patch:
+                request = events.patch(calendarId=self.calendar_id, eventId=key, body=body)
+            else:
+                request = events.update(calendarId=self.calendar_id, eventId=key, body=body)
+            if event.google_etag:
+                request.headers['If-Match'] = event.google_etag
+            return request
+        return events.delete(calendarId=self.calendar_id, eventId=key)
@@ -0,0 +1,176 @@
+# calendar_watch.py
+import datetime
+import hmac
+import secrets
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from . import ratelimit
+from .calendar_accounts import get_pool
+from .calendar_pull import pull
+from .models import CalendarAccount, CalendarChannel, CalendarSyncState
+
+# Public https URL of the site Google posts notifications to, e.g. 'https://events.example.com';
+# /calendar/webhook/ is appended. None turns push notifications off.
+WEBHOOK_URL = getattr(settings, 'GOOGLE_CALENDAR_WEBHOOK_URL', None)
+# Channels are asked to live this long (Google caps it) and replaced this long before they expire
+CHANNEL_TTL = getattr(settings, 'GOOGLE_CALENDAR_CHANNEL_TTL', 7 * 24 * 3600)
+RENEW_BEFORE = getattr(settings, 'GOOGLE_CALENDAR_CHANNEL_RENEW_BEFORE', 24 * 3600)
+# A calendar is pulled this many seconds after its first notification, so a burst costs one pull
+COALESCE_SECONDS = getattr(settings, 'GOOGLE_CALENDAR_WEBHOOK_COALESCE', 1.0)
+# Calendars are pulled at least this often anyway, in case a notification was lost; None never
+FALLBACK_SECONDS = getattr(settings, 'GOOGLE_CALENDAR_WATCH_FALLBACK', 6 * 3600)
+RETRY_SECONDS = 60
+
+
+class InvalidNotification(Exception):
+    def __init__(self, message, status=403):
+        super().__init__(message)
+        self.status = status
+
+
+def webhook_address(base_url=None):
+    base_url = base_url or WEBHOOK_URL
+    if not base_url:
+        return None
+    return base_url.rstrip('/') + reverse('calendar_webhook')
+
+
+def watch(service, account, calendar_id, address=None, ttl=CHANNEL_TTL):
+    """Open a channel on which Google announces changes to the calendar's events."""
+    channel = CalendarChannel(account=account, calendar_id=calendar_id, token=secrets.token_hex(32))
+    body = {
+        'id': str(channel.channel_id), 'type': 'web_hook', 'token': channel.token,
+        'address': address or webhook_address(), 'params': {'ttl': str(int(ttl))},
+    }
+    response = ratelimit.execute(service.events().watch(calendarId=calendar_id, body=body),
+                                 priority=ratelimit.BACKGROUND, limiter=ratelimit.get_limiter(account and account.pk))
+    channel.resource_id = response.get('resourceId', '')
+    expiration = response.get('expiration')
+    if expiration:
+        # Milliseconds since the epoch, as a string
+        channel.expires_on = datetime.datetime.fromtimestamp(int(expiration) / 1000, tz=datetime.timezone.utc)
+    else:
+        channel.expires_on = timezone.now() + datetime.timedelta(seconds=ttl)
+    channel.save()
+    # Notifications mark this row, so it has to exist before the first one arrives
+    CalendarSyncState.objects.get_or_create(account=account, calendar_id=calendar_id)
+    return channel
+
+
+def stop(service, channel):
+    try:
+        ratelimit.execute(service.channels().stop(body={'id': str(channel.channel_id),
+                                                       'resourceId': channel.resource_id}),
+                          priority=ratelimit.BACKGROUND,
+                          limiter=ratelimit.get_limiter(channel.account_id))
+    except HttpError as e:
+        # Already expired or stopped on Google's side
+        if e.resp.status != 404:
+            raise
+    channel.delete()
+
+
+def targets():
+    """(account, calendar_id) pairs that should be watched.
+
+    Every connected account's default calendar, plus every calendar that has been
+    pulled before; the deployment's own calendar joins once calendar_pull has run.
+    """
+    found = {(state.account, state.calendar_id)
+             for state in CalendarSyncState.objects.select_related('account')}
+    found.update((account, account.calendar_id) for account in CalendarAccount.objects.exclude(token=''))
+    return found
+
+
+def renew(address=None, service_for=None, now=None):
+    """Open channels for unwatched targets and replace those about to expire.
+
+    The replacement is opened before the old channel is stopped, so there is no gap;
+    a notification arriving on both is coalesced like any other. Returns (opened, stopped).
+    """
+    service_for = service_for or get_pool().get_service
+    soon = (now or timezone.now()) + datetime.timedelta(seconds=RENEW_BEFORE)
+    channels = list(CalendarChannel.objects.select_related('account'))
+    live = {(channel.account_id, channel.calendar_id) for channel in channels if channel.expires_on > soon}
+    opened = 0
+    for account, calendar_id in targets():
+        if (account and account.pk, calendar_id) not in live:
+            watch(service_for(account), account, calendar_id, address=address)
+            opened += 1
+    stale = [channel for channel in channels if channel.expires_on <= soon]
+    for channel in stale:
+        stop(service_for(channel.account), channel)
+    return opened, len(stale)
+
+
+def stop_all(service_for=None):
+    service_for = service_for or get_pool().get_service
+    channels = list(CalendarChannel.objects.select_related('account'))
+    for channel in channels:
+        stop(service_for(channel.account), channel)
+    return len(channels)
+
+
+def notify(channel_id, token, state):
+    """Record a notification from the webhook; raises InvalidNotification for forged ones.
+
+    Nothing is fetched here: the calendar is only marked, and marking an already
+    marked calendar is a no-op, so a burst of notifications costs one pull.
+    """
+    try:
+        channel_id = uuid.UUID(channel_id or '')
+    except ValueError:
+        raise InvalidNotification('Unknown channel.', status=404)
+    channel = CalendarChannel.objects.filter(pk=channel_id).values('account_id', 'calendar_id', 'token').first()
+    if channel is None:
+        raise InvalidNotification('Unknown channel.', status=404)
+    if not hmac.compare_digest(channel['token'], token or ''):
+        raise InvalidNotification('Invalid channel token.')
+    if state == 'sync':
+        # Sent once when the channel opens; nothing has changed yet
+        return False
+    CalendarSyncState.objects.filter(
+        account_id=channel['account_id'], calendar_id=channel['calendar_id'], notified_on__isnull=True,
+    ).update(notified_on=timezone.now())
+    return True
+
+
+def claim_due(now=None, coalesce=COALESCE_SECONDS, fallback=FALLBACK_SECONDS):
+    """Sync states whose calendar should be pulled now, claimed so no other worker pulls them.
+
+    A claimed state has notified_on cleared before the pull starts, so a notification
+    arriving during the pull marks it again and is picked up by the next round.
+    """
+    now = now or timezone.now()
+    due = Q(notified_on__lte=now - datetime.timedelta(seconds=coalesce))
+    if fallback is not None:
+        # Including calendars never pulled at all, which get their first full sync
+        due |= Q(last_synced_on__lt=now - datetime.timedelta(seconds=fallback)) | Q(last_synced_on__isnull=True)
+    claimed = []
+    for state in CalendarSyncState.objects.filter(due).select_related('account'):
+        if CalendarSyncState.objects.filter(
+                pk=state.pk, notified_on=state.notified_on, last_synced_on=state.last_synced_on,
+        ).update(notified_on=None, last_synced_on=now):
+            claimed.append(state)
+    return claimed
+
+
+def pull_due(service_for=None, **kwargs):
+    """Pull every due calendar; yields (state, report or exception)."""
+    service_for = service_for or get_pool().get_service
+    for state in claim_due(**kwargs):
+        try:
+            report = pull(service_for(state.account), calendar_id=state.calendar_id, account=state.account)
+        except Exception as e:
+            # Mark it again, a little in the future, so a broken account isn't retried every round
+            CalendarSyncState.objects.filter(pk=state.pk, notified_on__isnull=True).update(
+                notified_on=timezone.now() + datetime.timedelta(seconds=RETRY_SECONDS))
+            yield state, e
+        else:
+            yield state, report
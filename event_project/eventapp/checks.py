@@ -0,0 +1,35 @@
+# checks.py
+from django.conf import settings
+from django.core import checks
+
+from . import caching, ratelimit
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    # Each worker would bump its own model versions, or keep its own copy of a profile,
+    # and the others would serve stale data until the entries time out
+    errors = []
+    for setting, error_id in [('RESPONSE_CACHE_ALIAS', 'eventapp.E001'), ('LOGIN_PROFILE_CACHE_ALIAS', 'eventapp.E002')]:
+        alias = getattr(settings, setting, None)
+        if alias is not None and caching.is_local(alias):
+            errors.append(checks.Error(
+                f"{setting} '{alias}' is a local-memory cache, which workers don't share.",
+                hint='Point it at a shared cache such as Redis (REDIS_URL), or set it to None to turn this caching off.',
+                id=error_id,
+            ))
+    return errors
+
+
+@checks.register(checks.Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    # Every process would refill its own bucket, so N workers together call Google N times
+    # as fast as GOOGLE_CALENDAR_RATE_LIMIT allows, and throttling cuts only the worker that saw it
+    if not ratelimit.RATE or not caching.is_local(ratelimit.CACHE_ALIAS):
+        return []
+    return [checks.Warning(
+        f"GOOGLE_CALENDAR_RATE_LIMIT_CACHE '{ratelimit.CACHE_ALIAS}' is a local-memory cache, "
+        "so each process enforces the Calendar rate limit on its own.",
+        hint='Point it at a shared cache such as Redis (REDIS_URL) when running more than one worker.',
+        id='eventapp.W001',
+    )]
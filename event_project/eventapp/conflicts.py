@@ -0,0 +1,304 @@
+# conflicts.py
+import bisect
+import datetime
+import heapq
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from . import recurrence
+from .models import ConflictLock, Event
+
+# Which event attributes may not be double-booked
+SCOPES = getattr(settings, 'EVENT_CONFLICT_SCOPES', ('event_organiser_email', 'location'))
+VERSION_CACHE_KEY = 'eventapp:conflicts-version'
+# Change n's event id is kept under CHANGE_CACHE_KEY % n, for other processes to catch up with
+CHANGE_CACHE_KEY = 'eventapp:conflicts-change:%d'
+CHANGE_TIMEOUT = 24 * 3600
+# A process further behind than this reloads the table rather than re-reading each change
+MAX_CATCH_UP = 1000
+# How far ahead a recurring booking's occurrences are checked for conflicts when it's saved
+RECURRING_HORIZON = datetime.timedelta(days=366)
+
+
+class IntervalIndex:
+    """Intervals kept sorted by start so overlaps are found with two bisects.
+
+    Only intervals starting within [start - longest duration, end) can overlap
+    [start, end), so a lookup costs O(log n + candidates) instead of a scan.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._items = []
+        self._max_duration = 0.0
+
+    @classmethod
+    def from_items(cls, items):
+        index = cls()
+        index._items = sorted(items)
+        index._starts = [start for start, _, _ in index._items]
+        index._max_duration = max((end - start for start, end, _ in index._items), default=0.0)
+        return index
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, event_id):
+        i = bisect.bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._items.insert(i, (start, end, event_id))
+        self._max_duration = max(self._max_duration, end - start)
+
+    def remove(self, start, event_id):
+        i = bisect.bisect_left(self._starts, start)
+        while i < len(self._items) and self._starts[i] == start:
+            if self._items[i][2] == event_id:
+                del self._starts[i]
+                del self._items[i]
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, start, end):
+        # Back-to-back events (one ends as the next starts) don't conflict
+        lo = bisect.bisect_left(self._starts, start - self._max_duration)
+        hi = bisect.bisect_left(self._starts, end)
+        return [event_id for item_start, item_end, event_id in self._items[lo:hi] if item_end > start]
+
+    def conflicting_pairs(self):
+        # Sweep line: intervals still running when the next one starts overlap it
+        active = []
+        for start, end, event_id in self._items:
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for _, other_id in active:
+                yield other_id, event_id
+            heapq.heappush(active, (end, event_id))
+
+
+class ConflictDetector:
+    """Per-organiser and per-location interval indexes over the Event table.
+
+    Loaded lazily on first use and kept current from model signals. Each change bumps
+    a shared version in the cache and records the changed event under it; a process
+    that sees versions it didn't produce re-reads just those events before answering.
+    That makes it a fast first check only: it learns of other writes after they
+    commit, and not at all without a shared cache. Writes recheck with lock() and
+    booked() before saving.
+    """
+
+    def __init__(self, scopes=SCOPES):
+        self.scopes = scopes
+        self._lock = threading.RLock()
+        self._indexes = None
+        self._entries = {}
+        self._version = None
+
+    def conflicts(self, start, end, exclude=None, **attributes):
+        """Return {scope: [event_id, ...]} for existing events overlapping [start, end)."""
+        with self._lock:
+            self._ensure_loaded()
+            found = {}
+            for scope in self.scopes:
+                index = self._indexes.get((scope, attributes.get(scope)))
+                if index is None:
+                    continue
+                ids = [event_id for event_id in index.overlapping(start.timestamp(), end.timestamp())
+                       if event_id != exclude]
+                if ids:
+                    found[scope] = ids
+            return found
+
+    def find_all_conflicts(self):
+        with self._lock:
+            self._ensure_loaded()
+            for (scope, value), index in self._indexes.items():
+                for first, second in index.conflicting_pairs():
+                    yield scope, value, first, second
+
+    def event_saved(self, event):
+        with self._lock:
+            if self._indexes is not None:
+                self._discard(event.pk)
+                self._add(event.pk, event.event_start_date.timestamp(), event.event_end_date.timestamp(),
+                          {scope: getattr(event, scope) for scope in self.scopes})
+            self._record_change(event.pk)
+
+    def event_deleted(self, event_id):
+        with self._lock:
+            if self._indexes is not None:
+                self._discard(event_id)
+            self._record_change(event_id)
+
+    def reset(self):
+        # Forget the indexes; the next check reloads them from the table
+        with self._lock:
+            self._indexes = None
+
+    def _ensure_loaded(self):
+        if self._indexes is not None:
+            version = cache.get(VERSION_CACHE_KEY)
+            if version is None:
+                # Evicted (LocMemCache culls past MAX_ENTRIES), not changed: put ours back
+                cache.add(VERSION_CACHE_KEY, self._version, timeout=None)
+                version = cache.get(VERSION_CACHE_KEY)
+            if version == self._version or self._catch_up(version):
+                return
+        cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+        self._version = cache.get(VERSION_CACHE_KEY)
+        items, entries = {}, {}
+        rows = Event.objects.values_list('pk', 'event_start_date', 'event_end_date', *self.scopes)
+        for pk, start, end, *values in rows.iterator(chunk_size=10000):
+            start, end = start.timestamp(), end.timestamp()
+            keys = list(zip(self.scopes, values))
+            for key in keys:
+                items.setdefault(key, []).append((start, end, pk))
+            entries[pk] = (start, keys)
+        # Sort each index once rather than inserting row by row
+        self._indexes = {key: IntervalIndex.from_items(intervals) for key, intervals in items.items()}
+        self._entries = entries
+
+    def _catch_up(self, version):
+        # Re-read only the events changed since our version; False if the log can't say which
+        if not 0 < version - self._version <= MAX_CATCH_UP:
+            return False
+        keys = [CHANGE_CACHE_KEY % change for change in range(self._version + 1, version + 1)]
+        changed = cache.get_many(keys)
+        if len(changed) < len(keys):
+            # Expired, evicted, or not written yet
+            return False
+        event_ids = set(changed.values())
+        for event_id in event_ids:
+            self._discard(event_id)
+        rows = Event.objects.filter(pk__in=event_ids).values_list(
+            'pk', 'event_start_date', 'event_end_date', *self.scopes)
+        for pk, start, end, *values in rows:
+            self._add(pk, start.timestamp(), end.timestamp(), dict(zip(self.scopes, values)))
+        self._version = version
+        return True
+
+    def _add(self, event_id, start, end, attributes):
+        keys = list(attributes.items())
+        for key in keys:
+            self._indexes.setdefault(key, IntervalIndex()).add(start, end, event_id)
+        self._entries[event_id] = (start, keys)
+
+    def _discard(self, event_id):
+        entry = self._entries.pop(event_id, None)
+        if entry is None:
+            return
+        start, keys = entry
+        for key in keys:
+            index = self._indexes.get(key)
+            if index is not None:
+                index.remove(start, event_id)
+                if not index:
+                    del self._indexes[key]
+
+    def _record_change(self, event_id):
+        cache.add(VERSION_CACHE_KEY, self._version or 0, timeout=None)
+        version = cache.incr(VERSION_CACHE_KEY)
+        cache.set(CHANGE_CACHE_KEY % version, event_id, timeout=CHANGE_TIMEOUT)
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+        # Otherwise others changed events in between; the next check catches up with them
+
+
+detector = ConflictDetector()
+
+
+def on_event_saved(event):
+    # Wait for commit so a rolled-back save never reaches the index
+    transaction.on_commit(lambda: detector.event_saved(event))
+
+
+def on_event_deleted(event_id):
+    transaction.on_commit(lambda: detector.event_deleted(event_id))
+
+
+def lock(keys):
+    """Lock the (scope, value) pairs in `keys` until the transaction ends.
+
+    Call inside the transaction that saves the events, then recheck them with booked():
+    writers booking the same organiser or location wait here for each other's commit.
+    """
+    keys = sorted({(scope, str(value)) for scope, value in keys if value})
+    if not keys:
+        return
+    # Lock the rows that exist before inserting any: an insert that hits an existing
+    # key takes a shared lock on it, and two writers upgrading those deadlock on MySQL
+    missing = set(keys) - _lock_rows(keys)
+    if missing:
+        # First booking of these keys; a writer racing us to insert one waits for our commit
+        ConflictLock.objects.bulk_create([ConflictLock(scope=scope, value=value) for scope, value in sorted(missing)],
+                                         ignore_conflicts=True)
+        _lock_rows(missing)
+
+
+def _lock_rows(keys):
+    by_scope = defaultdict(list)
+    for scope, value in keys:
+        by_scope[scope].append(value)
+    # Always in the same order, so two writers can't each hold a lock the other wants
+    rows = ConflictLock.objects.select_for_update().filter(
+        Q(*[Q(scope=scope, value__in=values) for scope, values in by_scope.items()], _connector=Q.OR))
+    return set(rows.order_by('scope', 'value').values_list('scope', 'value'))
+
+
+def booked(keys, start, end):
+    """{(scope, value): IntervalIndex} of the saved occurrences booking `keys` that overlap [start, end].
+
+    Read from the database, so it sees every committed write; lock() the keys first.
+    Recurring events count at each of their occurrences.
+    """
+    indexes = {key: IntervalIndex() for key in keys}
+    by_scope = defaultdict(set)
+    for scope, value in indexes:
+        by_scope[scope].add(value)
+    if not indexes:
+        return indexes
+    events = Event.objects.filter(
+        Q(*[Q(**{f'{scope}__in': values}) for scope, values in by_scope.items()], _connector=Q.OR))
+    for occurrence in recurrence.occurrences_between(start, end, events=events):
+        for scope in by_scope:
+            index = indexes.get((scope, getattr(occurrence.event, scope)))
+            if index is not None:
+                index.add(occurrence.start.timestamp(), occurrence.end.timestamp(), occurrence.event.pk)
+    return indexes
+
+
+def spans(start, end, rule='', time_zone=''):
+    """The occurrences a booking is checked over: all of them within RECURRING_HORIZON of the first."""
+    if not rule:
+        return [(start, end)]
+    return list(recurrence.expand(rule, start, end, time_zone, start, start + RECURRING_HORIZON)) or [(start, end)]
+
+
+def clashes(indexes, occurrences, exclude=None, **attributes):
+    """{scope: [event_id, ...]} for the booked events overlapping any of `occurrences`."""
+    found = {}
+    for scope in SCOPES:
+        index = indexes.get((scope, attributes.get(scope)))
+        if index is None:
+            continue
+        ids = {event_id for start, end in occurrences
+               for event_id in index.overlapping(start.timestamp(), end.timestamp()) if event_id != exclude}
+        if ids:
+            found[scope] = sorted(ids)
+    return found
+
+
+def locked_conflicts(occurrences, exclude=None, **attributes):
+    """ConflictDetector.conflicts() over all of `occurrences` (see spans()), from the database.
+
+    The organiser and location stay lock()ed until the transaction ends.
+    """
+    keys = [(scope, attributes.get(scope)) for scope in SCOPES]
+    lock(keys)
+    indexes = booked(keys, min(start for start, _ in occurrences), max(end for _, end in occurrences))
+    return clashes(indexes, occurrences, exclude, **attributes)
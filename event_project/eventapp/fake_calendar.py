@@ -0,0 +1,320 @@
+# fake_calendar.py
+# A small in-memory stand-in for the Google Calendar v3 REST API, used by the
+# benchmark commands and for local development against GOOGLE_CALENDAR_ROOT_URL.
+import email.parser
+import email.utils
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/(?P<calendar>[^/]+)/events(?:/(?P<event>[^/]+))?$')
+WATCH_PATH = re.compile(r'^/calendar/v3/calendars/(?P<calendar>[^/]+)/events/watch$')
+STOP_PATH = '/calendar/v3/channels/stop'
+BATCH_PATH = '/batch/calendar/v3'
+BASE32HEX = '0123456789abcdefghijklmnopqrstuv'
+
+
+class FakeCalendar:
+    """Thread-safe event store that answers Calendar API requests."""
+
+    def __init__(self, quota=None, throttle_status=403):
+        self._lock = threading.Lock()
+        self._calendars = {}
+        self._versions = {}
+        self._etags = itertools.count(1)
+        # Sync tokens from an earlier epoch answer 410 Gone
+        self._token_epoch = 1
+        self._failures = []
+        self.request_count = 0
+        # Calls per second before answering rateLimitExceeded, like Google's per-user quota;
+        # batched sub-requests count one each. The bucket holds one second's worth.
+        self.quota = quota
+        self.throttle_status = throttle_status
+        self.throttled_count = 0
+        self._tokens = quota or 0
+        self._refilled = time.monotonic()
+        # Push-notification channels; notifications are POSTed from a background thread
+        self._channels = {}
+        self._deliveries = queue.Queue()
+        self._deliverer = None
+        self.notifications_sent = 0
+
+    def fail_next(self, count, status=503, reason='backendError'):
+        # Queue `count` error responses ahead of the real ones
+        with self._lock:
+            self._failures.extend([(status, reason)] * count)
+
+    def expire_sync_tokens(self):
+        with self._lock:
+            self._token_epoch += 1
+
+    def events(self, calendar_id='primary'):
+        with self._lock:
+            return dict(self._calendars.get(calendar_id, {}))
+
+    def change(self, calendar_id, resource):
+        # An edit made in Google itself (the web UI, another client): stored and announced
+        with self._lock:
+            return self._store(calendar_id, dict(resource))[1]
+
+    def handle(self, method, path, query, headers, body):
+        watched = WATCH_PATH.match(path)
+        parsed = EVENTS_PATH.match(path)
+        if watched is None and parsed is None and path != STOP_PATH:
+            return _error(404, 'notFound')
+        with self._lock:
+            self.request_count += 1
+            if self._failures:
+                status, reason = self._failures.pop(0)
+                return _error(status, reason)
+            if self.quota is not None and not self._take_token():
+                self.throttled_count += 1
+                return _error(self.throttle_status, 'rateLimitExceeded')
+            payload = json.loads(body) if body else {}
+            if path == STOP_PATH:
+                return self._stop(payload)
+            if watched is not None:
+                return self._watch(urllib.parse.unquote(watched['calendar']), payload)
+            calendar_id = urllib.parse.unquote(parsed['calendar'])
+            calendar = self._calendars.setdefault(calendar_id, {})
+            event_id = parsed['event'] and urllib.parse.unquote(parsed['event'])
+            if event_id is None and method == 'POST':
+                return self._insert(calendar_id, payload)
+            if event_id is None and method == 'GET':
+                return self._list(calendar, query)
+            existing = calendar.get(event_id)
+            if existing is None or existing.get('status') == 'cancelled':
+                return _error(404, 'notFound')
+            if_match = headers.get('if-match')
+            if if_match and if_match != existing['etag']:
+                return _error(412, 'conditionNotMet')
+            if method == 'GET':
+                return 200, existing
+            if method == 'PUT':
+                return self._store(calendar_id, dict(payload, id=event_id))
+            if method == 'PATCH':
+                return self._store(calendar_id, dict(existing, **payload))
+            if method == 'DELETE':
+                self._store(calendar_id, dict(existing, status='cancelled'))
+                return 204, None
+            return _error(405, 'methodNotAllowed')
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self.quota, self._tokens + (now - self._refilled) * self.quota)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _insert(self, calendar_id, payload):
+        # Google's own ids are 26 base32hex characters
+        event_id = payload.get('id') or ''.join(random.choice(BASE32HEX) for _ in range(26))
+        if event_id in self._calendars.get(calendar_id, {}):
+            return _error(409, 'duplicate')
+        return self._store(calendar_id, dict(payload, id=event_id))
+
+    def _store(self, calendar_id, resource):
+        resource.setdefault('status', 'confirmed')
+        change = next(self._etags)
+        resource['etag'] = '"%d"' % change
+        self._calendars.setdefault(calendar_id, {})[resource['id']] = resource
+        self._versions[resource['id']] = change
+        self._announce(calendar_id, 'exists')
+        return 200, resource
+
+    def _watch(self, calendar_id, payload):
+        if payload.get('id') in self._channels:
+            return _error(400, 'channelIdNotUnique')
+        ttl = min(int(payload.get('params', {}).get('ttl', 604800)), 604800)
+        channel = {
+            'kind': 'api#channel', 'id': payload['id'], 'resourceId': uuid.uuid4().hex,
+            'resourceUri': 'https://www.googleapis.com/calendar/v3/calendars/%s/events' % calendar_id,
+            'token': payload.get('token', ''), 'expiration': str(int((time.time() + ttl) * 1000)),
+        }
+        self._channels[channel['id']] = dict(channel, calendar=calendar_id, address=payload['address'], number=0)
+        self._queue_notification(self._channels[channel['id']], 'sync')
+        if self._deliverer is None:
+            self._deliverer = threading.Thread(target=self._deliver, name='fake-calendar-notify', daemon=True)
+            self._deliverer.start()
+        return 200, channel
+
+    def _stop(self, payload):
+        channel = self._channels.get(payload.get('id'))
+        if channel is None or channel['resourceId'] != payload.get('resourceId'):
+            return _error(404, 'notFound')
+        del self._channels[payload['id']]
+        return 204, None
+
+    def _announce(self, calendar_id, state):
+        now = time.time() * 1000
+        for channel in list(self._channels.values()):
+            if int(channel['expiration']) <= now:
+                del self._channels[channel['id']]
+            elif channel['calendar'] == calendar_id:
+                self._queue_notification(channel, state)
+
+    def _queue_notification(self, channel, state):
+        channel['number'] += 1
+        headers = {
+            'X-Goog-Channel-ID': channel['id'], 'X-Goog-Resource-ID': channel['resourceId'],
+            'X-Goog-Resource-URI': channel['resourceUri'], 'X-Goog-Resource-State': state,
+            'X-Goog-Message-Number': str(channel['number']),
+            'X-Goog-Channel-Expiration': email.utils.formatdate(int(channel['expiration']) / 1000, usegmt=True),
+        }
+        if channel['token']:
+            headers['X-Goog-Channel-Token'] = channel['token']
+        self._deliveries.put((channel['address'], headers))
+
+    def _deliver(self):
+        while True:
+            address, headers = self._deliveries.get()
+            request = urllib.request.Request(address, data=b'', headers=headers, method='POST')
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except OSError:
+                # Google gives up on an unreachable address too (after a few retries)
+                pass
+            self.notifications_sent += 1
+
+    def _last_change(self):
+        return max(self._versions.values(), default=0)
+
+    def _list(self, calendar, query):
+        # Tokens are change numbers: syncToken=<epoch>-<since>, pageToken=<since>:<upto>:<offset>;
+        # a full listing pages with since=-1
+        if query.get('pageToken'):
+            since, upto, offset = (int(part) for part in query['pageToken'].split(':'))
+        elif query.get('syncToken'):
+            epoch, since = (int(part) for part in query['syncToken'].split('-'))
+            if epoch != self._token_epoch:
+                return _error(410, 'fullSyncRequired')
+            upto, offset = self._last_change(), 0
+        else:
+            since, upto, offset = -1, self._last_change(), 0
+        incremental = since >= 0
+        changed = sorted(
+            (resource for resource in calendar.values()
+             if since < self._versions[resource['id']] <= upto
+             and (incremental or query.get('showDeleted') == 'true' or resource['status'] != 'cancelled')),
+            key=lambda resource: self._versions[resource['id']],
+        )
+        limit = int(query.get('maxResults', 250))
+        page = {'kind': 'calendar#events', 'items': changed[offset:offset + limit]}
+        if offset + limit < len(changed):
+            page['nextPageToken'] = '%d:%d:%d' % (since, upto, offset + limit)
+        else:
+            page['nextSyncToken'] = '%d-%d' % (self._token_epoch, upto)
+        return 200, page
+
+    def handle_batch(self, content_type, body):
+        message = email.parser.Parser().parsestr('Content-Type: %s\r\n\r\n%s' % (content_type, body))
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            method, path, query, headers, sub_body = _parse_http_request(part.get_payload())
+            status, resource = self.handle(method, path, query, headers, sub_body)
+            # Long Content-IDs come back folded over two lines
+            content_id = ' '.join(part['Content-ID'].split()).strip('<>')
+            parts.append(
+                '--%s\r\nContent-Type: application/http\r\nContent-ID: <response-%s>\r\n\r\n'
+                'HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n%s\r\n'
+                % (boundary, content_id, status, _reason(status), json.dumps(resource) if resource else '')
+            )
+        parts.append('--%s--\r\n' % boundary)
+        return 'multipart/mixed; boundary=%s' % boundary, ''.join(parts)
+
+
+class FakeCalendarServer:
+    """Serves a FakeCalendar over HTTP on 127.0.0.1 from a background thread."""
+
+    def __init__(self, calendar=None, port=0, latency=0.0):
+        self.calendar = calendar or FakeCalendar()
+        # `latency` seconds are added to every HTTP round trip to mimic the distance to Google
+        handler = type('Handler', (_Handler,), {'calendar': self.calendar, 'latency': latency})
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self._thread = None
+
+    @property
+    def root_url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    calendar = None
+    latency = 0.0
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        url = urllib.parse.urlsplit(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if url.path == BATCH_PATH:
+            content_type, content = self.calendar.handle_batch(self.headers['Content-Type'], body)
+            return self._respond(200, content.encode('utf-8'), content_type)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        headers = {key.lower(): value for key, value in self.headers.items()}
+        status, resource = self.calendar.handle(self.command, url.path, query, headers, body)
+        content = json.dumps(resource).encode('utf-8') if resource is not None else b''
+        self._respond(status, content, 'application/json; charset=UTF-8')
+
+    def _respond(self, status, content, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+
+def _parse_http_request(raw):
+    head, _, body = raw.replace('\r\n', '\n').partition('\n\n')
+    lines = head.split('\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(':')
+        headers[key.strip().lower()] = value.strip()
+    url = urllib.parse.urlsplit(target)
+    return method, url.path, dict(urllib.parse.parse_qsl(url.query)), headers, body.strip()
+
+
+def _error(status, reason):
+    return status, {'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}
+
+
+def _reason(status):
+    return {200: 'OK', 204: 'No Content', 403: 'Forbidden', 404: 'Not Found', 409: 'Conflict',
+            410: 'Gone', 412: 'Precondition Failed', 429: 'Too Many Requests'}.get(status, 'Error')
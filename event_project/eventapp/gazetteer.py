@@ -0,0 +1,105 @@
+# gazetteer.py
+import csv
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from . import geo
+
+# A CSV of name,country,latitude,longitude,aliases (aliases separated by |). The bundled
+# one has city centres; point GEO_GAZETTEER at a larger extract (e.g. from GeoNames).
+GAZETTEER_PATH = getattr(settings, 'GEO_GAZETTEER', Path(__file__).with_name('data') / 'gazetteer.csv')
+COUNTRY_ALIASES = {
+    'usa': 'united states', 'us': 'united states', 'united states of america': 'united states',
+    'uk': 'united kingdom', 'england': 'united kingdom', 'great britain': 'united kingdom',
+    'uae': 'united arab emirates', 'bharat': 'india',
+}
+# What locate() sets, for bulk_update() callers
+GEO_FIELDS = ['latitude', 'longitude', 'geohash']
+# Which text each model is geocoded from, most specific first
+PLACE_FIELDS = {
+    'eventapp.event': ('location',),
+    'eventapp.musician': ('city', 'address'),
+    'eventapp.eventorganizer': ('city', 'club_address'),
+}
+
+
+class Gazetteer:
+    """Place names to coordinates, looked up in memory.
+
+    Free text is matched on whole words: the longest run of words that names a place
+    wins, and of equally long ones the last, since addresses end with the city.
+    """
+
+    def __init__(self, rows):
+        self._places = {}
+        self._longest = 1
+        for name, country, latitude, longitude, aliases in rows:
+            place = (country.lower(), float(latitude), float(longitude))
+            for alias in [name, *filter(None, aliases.split('|'))]:
+                words = tuple(_words(alias))
+                # The first row for a name is the default when the country doesn't decide
+                self._places.setdefault(words, []).append(place)
+                self._longest = max(self._longest, len(words))
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader)  # header
+            return cls([row + [''] * (5 - len(row)) for row in reader if row])
+
+    def __len__(self):
+        return len(self._places)
+
+    def geocode(self, text, country=None):
+        """(latitude, longitude) of the place named in `text`, or None."""
+        words = _words(text)
+        country = _country(country)
+        for size in range(min(self._longest, len(words)), 0, -1):
+            for start in range(len(words) - size, -1, -1):
+                places = self._places.get(tuple(words[start:start + size]))
+                if places:
+                    place = next((place for place in places if place[0] == country), places[0])
+                    return place[1], place[2]
+        return None
+
+    def locate(self, instance):
+        """Set latitude, longitude and geohash on a model instance from its place fields."""
+        country = getattr(instance, 'country', None)
+        found = None
+        for field in PLACE_FIELDS[instance._meta.label_lower]:
+            found = self.geocode(getattr(instance, field), country)
+            if found:
+                break
+        instance.latitude, instance.longitude = found or (None, None)
+        instance.geohash = geo.encode(*found) if found else ''
+        return found is not None
+
+
+def _words(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def _country(name):
+    name = ' '.join(_words(name))
+    return COUNTRY_ALIASES.get(name, name)
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+def locate(instance):
+    return get_gazetteer().locate(instance)
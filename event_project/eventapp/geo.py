@@ -0,0 +1,185 @@
+# geo.py
+import math
+from itertools import groupby, islice
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; distances are then computed one point at a time
+    np = None
+
+EARTH_RADIUS_KM = 6371.0088
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored geohashes have 9 characters: cells of about 5 x 5 metres
+PRECISION = 9
+# Most cells one proximity query covers; coarser cells are used until the circle fits
+MAX_CELLS = 16
+DEFAULT_RADIUS_KM = 50
+MAX_RADIUS_KM = getattr(settings, 'GEO_MAX_RADIUS_KM', 500)
+DEFAULT_RESULTS = 50
+MAX_RESULTS = 500
+# nearby() searches circles this many times wider in turn, from about a kilometre out
+RADIUS_GROWTH = 4
+MIN_RADIUS_KM = 1
+# Index entries read per query while looking for candidates
+BATCH = 1000
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a point: longitude and latitude bisected in turn, 5 bits per character."""
+    ranges = ([-180.0, 180.0], [-90.0, 90.0])
+    coordinates = (longitude, latitude)
+    chars, value = [], 0
+    for bit in range(5 * precision):
+        interval, coordinate = ranges[bit % 2], coordinates[bit % 2]
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        if bit % 5 == 4:
+            chars.append(BASE32[value])
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) degrees one cell of `precision` characters spans."""
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << ((bits + 1) // 2))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, north, west, east) around a circle; west > east across the antimeridian."""
+    angular = radius_km / EARTH_RADIUS_KM
+    south, north = latitude - math.degrees(angular), latitude + math.degrees(angular)
+    if south <= -90 or north >= 90:
+        return max(south, -90.0), min(north, 90.0), -180.0, 180.0
+    # The circle is widest poleward of its centre, not at the centre's latitude
+    spread = math.sin(angular) / math.cos(math.radians(latitude))
+    if spread >= 1:
+        return south, north, -180.0, 180.0
+    delta = math.degrees(math.asin(spread))
+    west, east = longitude - delta, longitude + delta
+    return south, north, west + 360 if west < -180 else west, east - 360 if east > 180 else east
+
+
+def covering(south, north, west, east, max_cells=MAX_CELLS):
+    """Sorted [low, high) geohash ranges whose cells cover the box; high is None past the last cell.
+
+    Uses the finest cells that need at most `max_cells`, and merges neighbours that are
+    adjacent in geohash order so the query has fewer ranges to scan.
+    """
+    for precision in range(PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        lat_cells, lon_cells = round(180 / lat_step), round(360 / lon_step)
+        rows = range(_cell(south + 90, lat_step, lat_cells), _cell(north + 90, lat_step, lat_cells) + 1)
+        first, last = _cell(west + 180, lon_step, lon_cells), _cell(east + 180, lon_step, lon_cells)
+        columns = list(range(first, last + 1)) if west <= east else [*range(first, lon_cells), *range(last + 1)]
+        if len(rows) * len(columns) <= max_cells:
+            break
+    cells = sorted({encode(-90 + (row + 0.5) * lat_step, -180 + (column + 0.5) * lon_step, precision)
+                    for row in rows for column in columns})
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = _successor(cell)
+        else:
+            ranges.append([cell, _successor(cell)])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def _cell(offset, step, count):
+    return min(int(offset // step), count - 1)
+
+
+def _successor(prefix):
+    # The first geohash after every one that starts with `prefix`
+    prefix = prefix.rstrip(BASE32[-1])
+    return prefix[:-1] + BASE32[BASE32.index(prefix[-1]) + 1] if prefix else None
+
+
+def distances_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances from one point to many (a numpy array when numpy is installed)."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    if np is None:
+        return [_haversine(lat1, lon1, math.radians(lat2), math.radians(lon2))
+                for lat2, lon2 in zip(latitudes, longitudes)]
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+
+def _nearest_first(distances, radius_km):
+    if np is None:
+        return [i for _, i in sorted((d, i) for i, d in enumerate(distances) if d <= radius_km)]
+    inside = np.flatnonzero(distances <= radius_km)
+    return inside[np.argsort(distances[inside], kind='stable')].tolist()
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit):
+    """Up to `limit` rows of `queryset` within `radius_km` of a point, as (row, km), nearest first.
+
+    Candidates come off the (geohash, latitude, longitude) index alone, for the geohash
+    cells covering a small circle first and wider ones only while fewer than `limit`
+    rows are inside, so the work follows how crowded the area is rather than the radius.
+    Geocoded rows pile up on place centres, so no more than `limit` are read from any
+    one cell; rows within a cell (about 5 metres) count as equally near. Full rows are
+    fetched for the winners only.
+    """
+    for radius in _radii(radius_km):
+        pks, latitudes, longitudes = [], [], []
+        for pk, _, row_latitude, row_longitude in _candidates(
+                queryset, covering(*bounding_box(latitude, longitude, radius)), limit):
+            pks.append(pk)
+            latitudes.append(row_latitude)
+            longitudes.append(row_longitude)
+        if not pks:
+            continue
+        distances = distances_km(latitude, longitude, latitudes, longitudes)
+        inside = _nearest_first(distances, radius)
+        if len(inside) >= limit:
+            break
+    if not pks:
+        return []
+    nearest = {pks[i]: float(distances[i]) for i in inside[:limit]}
+    rows = queryset.in_bulk(nearest)
+    return sorted(((rows[pk], km) for pk, km in nearest.items() if pk in rows),
+                  key=lambda item: (item[1], item[0].pk))
+
+
+def _radii(radius_km):
+    radii = [radius_km]
+    while radii[-1] / RADIUS_GROWTH >= MIN_RADIUS_KM:
+        radii.append(radii[-1] / RADIUS_GROWTH)
+    return reversed(radii)
+
+
+def _candidates(queryset, ranges, per_cell):
+    # (pk, geohash, latitude, longitude) in index order, at most `per_cell` rows per cell
+    values = (queryset.order_by('geohash', 'latitude', 'longitude', 'pk')
+              .values_list('pk', 'geohash', 'latitude', 'longitude'))
+    for low, high in ranges:
+        in_range = values.filter(geohash__lt=high) if high else values
+        cursor = low
+        while cursor is not None and (high is None or cursor < high):
+            batch = list(in_range.filter(geohash__gte=cursor)[:BATCH])
+            cursor = None
+            if len(batch) == BATCH:
+                # The last cell may go on past the batch; take it whole (capped) and move on
+                last = batch[-1][1]
+                cut = next(i for i, row in enumerate(batch) if row[1] == last)
+                if len(batch) - cut < per_cell:
+                    batch[cut:] = values.filter(geohash=last)[:per_cell]
+                cursor = _successor(last)
+            for _, rows in groupby(batch, key=lambda row: row[1]):
+                yield from islice(rows, per_cell)
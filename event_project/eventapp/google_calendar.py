@@ -50,8 +50,8 @@ def create_event(service):
     return event_id
 
 def update_event(service, event_id, summary=None, location=None, description=None, start_time=None, end_time=None, invitee_email=None):
-    event = service.events().get(calendarId='primary', eventId=event_id).execute()
-
+    # Only send what changed: one PATCH instead of a GET followed by a full PUT
+    event = {}
     if summary:
         event['summary'] = summary
     if location:
@@ -59,14 +59,16 @@ def update_event(service, event_id, summary=None, location=None, description=Non
     if description:
         event['description'] = description
     if start_time:
-        event['start']['dateTime'] = start_time
+        event['start'] = {'dateTime': start_time, 'timeZone': 'Asia/Kolkata'}
     if end_time:
-        event['end']['dateTime'] = end_time
+        event['end'] = {'dateTime': end_time, 'timeZone': 'Asia/Kolkata'}
     if invitee_email:
-        event['attendees']['email'] = invitee_email
+        event['attendees'] = [{'email': invitee_email}]
+    if not event:
+        return
 
     try:
-        updated_event = service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
+        updated_event = service.events().patch(calendarId='primary', eventId=event_id, body=event).execute()
         print('Event updated: %s' % (updated_event.get('htmlLink')))
     except Exception as e:
         print('Error updating event:', e)
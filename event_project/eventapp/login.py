@@ -0,0 +1,88 @@
+# login.py
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+from .models import EventOrganizer, Musician
+from .serializers import EventOrganizerSerializer, MusicianSerializer
+
+# Profiles are cached only in a cache all workers share: a worker's own cache would keep
+# serving a profile another worker edited. None reads the profile on every login.
+PROFILE_CACHE_ALIAS = getattr(settings, 'LOGIN_PROFILE_CACHE_ALIAS', None)
+PROFILE_CACHE_TIMEOUT = getattr(settings, 'LOGIN_PROFILE_CACHE_TIMEOUT', 300)  # seconds
+
+# category -> (profile model, serializer)
+PROFILES = {
+    'musician': (Musician, MusicianSerializer),
+    'event organizer': (EventOrganizer, EventOrganizerSerializer),
+}
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2 hasher with the work factor taken from LOGIN_PBKDF2_ITERATIONS.
+
+    Hashes made with another iteration count still verify and are rehashed with the
+    current one on the next successful login.
+    """
+    iterations = getattr(settings, 'LOGIN_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+def is_hashed(encoded):
+    try:
+        hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return True
+
+
+def verify_password(credentials, password):
+    """Check `password` against stored credentials, upgrading the stored value if needed.
+
+    Rows written before passwords were hashed hold plain text; those are compared in
+    constant time and replaced by a hash on the first successful login.
+    """
+    def upgrade(raw_password):
+        credentials.password = hashers.make_password(raw_password)
+        credentials.save(update_fields=['password'])
+
+    if password is None:
+        return False
+    if is_hashed(credentials.password):
+        return hashers.check_password(password, credentials.password, setter=upgrade)
+    if constant_time_compare(credentials.password, password):
+        upgrade(password)
+        return True
+    return False
+
+
+def burn_hash(password):
+    # Unknown emails still pay for one hash, as Django's ModelBackend does, so the
+    # response time doesn't reveal which emails are registered
+    hashers.make_password(password or '')
+
+
+def profile_cache_key(category, email):
+    return f"eventapp:profile:{category.replace(' ', '-')}:{email}"
+
+
+def get_profile(category, email):
+    """Serialized profile for a login, from the cache or one query."""
+    if category not in PROFILES:
+        return None
+    key = profile_cache_key(category, email)
+    data = caches[PROFILE_CACHE_ALIAS].get(key) if PROFILE_CACHE_ALIAS else None
+    if data is None:
+        model, serializer_class = PROFILES[category]
+        profile = model.objects.filter(email=email).first()
+        if profile is None:
+            return None
+        data = dict(serializer_class(profile).data)
+        if PROFILE_CACHE_ALIAS:
+            caches[PROFILE_CACHE_ALIAS].set(key, data, PROFILE_CACHE_TIMEOUT)
+    return data
+
+
+def forget_profile(category, email):
+    if PROFILE_CACHE_ALIAS:
+        caches[PROFILE_CACHE_ALIAS].delete(profile_cache_key(category, email))
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from eventapp.benchmarks import loadgen
+from eventapp.benchmarks.generators import clear_created
+from eventapp.benchmarks.scenarios import SCENARIOS, sample_dataset, select
+from eventapp.fake_calendar import FakeCalendarServer
+
+
+class Command(BaseCommand):
+    help = ('Load the API with the benchmark scenarios from an asyncio client and report req/s and '
+            'p50/p95/p99 per scenario. Without --url, starts runserver against a fake Google Calendar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='A running server to test, e.g. gunicorn behind http://127.0.0.1:8000.')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated scenario names.')
+        parser.add_argument('--mix', action='store_true',
+                            help='Run the scenarios together, by weight, instead of one after another.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Connections kept busy at once.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds measured per run.')
+        parser.add_argument('--warmup', type=float, default=1.0, help='Seconds run before measuring.')
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = select(options['scenarios'])
+            dataset = sample_dataset()
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        runs = [scenarios] if options['mix'] else [[scenario] for scenario in scenarios]
+        server = calendar = None
+        url = options['url']
+        try:
+            if url is None:
+                calendar = FakeCalendarServer().start()
+                server, url = _runserver(calendar.root_url)
+            self.stdout.write(f'{url}, {options["concurrency"]} connections, {options["duration"]:.0f}s per run')
+            for run in runs:
+                stats, elapsed = asyncio.run(loadgen.run(
+                    url, run, dataset, concurrency=options['concurrency'],
+                    duration=options['duration'], warmup=options['warmup'],
+                ))
+                for scenario in run:
+                    self.stdout.write(stats[scenario.name].summary(elapsed))
+                if len(run) > 1:
+                    total = sum(len(stat.latencies) for stat in stats.values())
+                    self.stdout.write(f'{"all":<16} {total / elapsed:8.1f} req/s')
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if calendar is not None:
+                calendar.stop()
+            clear_created()
+
+
+def _runserver(calendar_url):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, GOOGLE_CALENDAR_ROOT_URL=calendar_url)
+    server = subprocess.Popen(
+        [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', f'127.0.0.1:{port}', '--noreload'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, f'http://127.0.0.1:{port}'
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise CommandError('runserver did not start; run it yourself and pass --url.')
+            time.sleep(0.1)
@@ -0,0 +1,45 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventapp import availability
+
+
+class Command(BaseCommand):
+    help = 'Time free/busy computation for many people over a long window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--people', type=int, default=48)
+        parser.add_argument('--days', type=int, default=92)
+        parser.add_argument('--events-per-person', type=int, default=120)
+        parser.add_argument('--slot', default='30m')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        end = start + datetime.timedelta(days=options['days'])
+        slot = availability.parse_slot(options['slot'])
+        busy = {}
+        for person in range(options['people']):
+            intervals = []
+            for _ in range(options['events_per_person']):
+                begin = start + datetime.timedelta(minutes=random.randrange(options['days'] * 24 * 60))
+                intervals.append((begin, begin + datetime.timedelta(minutes=random.randint(30, 300))))
+            busy[f'musician{person}@example.com'] = intervals
+
+        engines = [('sweep line', False)]
+        if availability.np is not None:
+            engines.insert(0, ('numpy bitmap', True))
+        for name, vectorized in engines:
+            timings = []
+            for _ in range(options['repeat']):
+                begin = time.perf_counter()
+                availability.free_slots(busy, start, end, slot, vectorized=vectorized)
+                timings.append(time.perf_counter() - begin)
+            timings.sort()
+            self.stdout.write(f'{name}: {options["people"]} people, {options["days"]} days, '
+                              f'{options["slot"]} slots: median {timings[len(timings) // 2] * 1000:.1f} ms, '
+                              f'max {timings[-1] * 1000:.1f} ms')
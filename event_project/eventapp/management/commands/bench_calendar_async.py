@@ -0,0 +1,74 @@
+import asyncio
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventapp.calendar_async import AsyncCalendarClient, httpx
+from eventapp.calendar_service import CalendarServiceRegistry
+from eventapp.calendar_sync import BatchSyncEngine, CALENDAR_ID, INSERT, event_body, google_id
+from eventapp.fake_calendar import FakeCalendarServer
+from eventapp.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Load-test the async Calendar client against a local fake Calendar server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--concurrency', default='10,50,200',
+                            help='Comma separated in-flight limits to try.')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Simulated network round trip in seconds.')
+        parser.add_argument('--failures', type=int, default=0,
+                            help='Number of calls the fake server should fail with 503 on each async run.')
+        parser.add_argument('--skip-sequential', action='store_true')
+
+    def handle(self, *args, **options):
+        def fresh_events():
+            # New google ids every run so no insert is answered with a cheap 409
+            return [_event(i) for i in range(options['events'])]
+
+        self.stdout.write(f"transport: {'httpx' if httpx else 'googleapiclient on a thread pool'}")
+
+        with FakeCalendarServer(latency=options['latency']) as server:
+            registry = CalendarServiceRegistry(root_url=server.root_url)
+
+            if not options['skip_sequential']:
+                resource = registry.build_service().events()
+                events = fresh_events()
+                start = time.perf_counter()
+                for event in events:
+                    resource.insert(
+                        calendarId=CALENDAR_ID, body=dict(event_body(event), id=google_id(event.google_event_id)),
+                    ).execute()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'sequential:        {len(events) / elapsed:8.1f} events/s')
+
+            engine = BatchSyncEngine(registry.build_service(), backoff=0.01)
+            for event in fresh_events():
+                engine.insert(event)
+            self.stdout.write(f'batched:           {engine.flush()}')
+
+            for concurrency in [int(value) for value in options['concurrency'].split(',')]:
+                server.calendar.fail_next(options['failures'])
+                report, peak = asyncio.run(self._run_async(registry, fresh_events(), concurrency))
+                self.stdout.write(f'async x{concurrency:<4}:       {len(report.succeeded)} synced, {len(report.failed)} failed '
+                                  f'({report.elapsed:.3f}s, {report.events_per_second:.1f} events/s), '
+                                  f'peak {peak} in flight')
+
+    async def _run_async(self, registry, events, concurrency):
+        async with AsyncCalendarClient(registry, concurrency=concurrency, backoff=0.01) as client:
+            operations = [(INSERT, event.google_event_id, event) for event in events]
+            report = await client.run(operations)
+            return report, client.peak_in_flight
+
+
+def _event(i):
+    start = timezone.now() + datetime.timedelta(days=i)
+    return Event(
+        event_name=f'Gig {i}', location='Mumbai', description='Benchmark event',
+        event_start_date=start, event_end_date=start + datetime.timedelta(hours=3),
+        event_organiser_email=f'organiser{i}@example.com', event_organiser_name='Organiser',
+    )
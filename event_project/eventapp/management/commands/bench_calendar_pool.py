@@ -0,0 +1,51 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from google.oauth2.credentials import Credentials
+
+from eventapp.calendar_accounts import CalendarServicePool, encrypt_token
+from eventapp.calendar_service import _utcnow
+from eventapp.models import CalendarAccount
+
+
+class Command(BaseCommand):
+    help = 'Measure service acquisition across many Calendar accounts through the LRU service pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=500)
+        parser.add_argument('--pool-size', type=int, default=128)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--skew', type=float, default=1.2,
+                            help='Zipf exponent of how often each account is used; busy tenants dominate.')
+
+    def handle(self, *args, **options):
+        # Offline tokens: nothing is sent, but decrypting and authorizing is the real work
+        token = encrypt_token(Credentials(token='bench', refresh_token='bench', client_id='bench', client_secret='bench',
+                                          token_uri='https://oauth2.googleapis.com/token',
+                                          expiry=_utcnow() + datetime.timedelta(days=1)))
+        accounts = CalendarAccount.objects.bulk_create([
+            CalendarAccount(email=f'bench-pool-{i}@example.invalid', token=token) for i in range(options['accounts'])
+        ])
+        accounts = list(CalendarAccount.objects.filter(email__startswith='bench-pool-').order_by('pk'))
+        try:
+            weights = [1 / (rank + 1) ** options['skew'] for rank in range(len(accounts))]
+            picks = random.Random(0).choices(accounts, weights, k=options['requests'])
+            pool = CalendarServicePool(size=options['pool_size'], root_url=None)
+            cold, warm = [], []
+            for account in picks:
+                hit = account.pk in pool._registries
+                start = time.perf_counter()
+                # The first call on this thread builds the service; later ones reuse it
+                pool.get_service(account)
+                (warm if hit else cold).append(time.perf_counter() - start)
+            self.stdout.write(f'{len(accounts)} accounts, pool of {options["pool_size"]}: '
+                              f'{len(warm) / len(picks):.1%} hits')
+            for name, samples in (('miss', cold), ('hit', warm)):
+                if samples:
+                    self.stdout.write(f'{name:>5}: median {statistics.median(samples) * 1000:.3f} ms '
+                                      f'over {len(samples)} requests')
+        finally:
+            CalendarAccount.objects.filter(email__startswith='bench-pool-').delete()
@@ -0,0 +1,56 @@
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+
+from eventapp.calendar_service import CalendarServiceRegistry, CredentialStore
+
+
+class Command(BaseCommand):
+    help = 'Compare cold and warm Google Calendar service acquisition latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        # Anonymous credentials keep the benchmark offline; the token is still
+        # unpickled from disk exactly like a real token.pickle would be.
+        fd, token_path = tempfile.mkstemp(suffix='.pickle')
+        with os.fdopen(fd, 'wb') as token:
+            pickle.dump(AnonymousCredentials(), token)
+
+        try:
+            legacy = []
+            for _ in range(min(iterations, 50)):
+                start = time.perf_counter()
+                with open(token_path, 'rb') as token:
+                    creds = pickle.load(token)
+                build('calendar', 'v3', credentials=creds, static_discovery=True)
+                legacy.append(time.perf_counter() - start)
+
+            registry = CalendarServiceRegistry(CredentialStore(token_path=token_path), root_url=None)
+            start = time.perf_counter()
+            registry.get_service()
+            cold = time.perf_counter() - start
+
+            warm = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                registry.get_service()
+                warm.append(time.perf_counter() - start)
+        finally:
+            os.remove(token_path)
+
+        self.stdout.write(f'per-call authenticate()+build(): median {_us(statistics.median(legacy))}')
+        self.stdout.write(f'registry cold acquisition:       {_us(cold)}')
+        self.stdout.write(f'registry warm acquisition:       median {_us(statistics.median(warm))}')
+
+
+def _us(seconds):
+    return f'{seconds * 1e6:.1f} us'
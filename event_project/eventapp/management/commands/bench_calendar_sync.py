@@ -0,0 +1,74 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventapp.calendar_service import CalendarServiceRegistry
+from eventapp.calendar_sync import BatchSyncEngine, CALENDAR_ID, event_body, google_id
+from eventapp.fake_calendar import FakeCalendarServer
+from eventapp.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Compare per-event execute() calls with the batched sync engine against a local fake Calendar server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=0.02,
+                            help='Simulated network round trip in seconds.')
+        parser.add_argument('--failures', type=int, default=0,
+                            help='Number of sub-requests the fake server should fail with 503.')
+        parser.add_argument('--changed', type=float, default=0.1,
+                            help='Share of events edited locally before the second sync.')
+        parser.add_argument('--remote-edits', type=int, default=5,
+                            help='Events also edited in Google in between, so their If-Match fails.')
+
+    def handle(self, *args, **options):
+        events = [_event(i) for i in range(options['events'])]
+
+        with FakeCalendarServer(latency=options['latency']) as server:
+            service = CalendarServiceRegistry(root_url=server.root_url).build_service()
+
+            start = time.perf_counter()
+            resource = service.events()
+            for event in events:
+                resource.insert(
+                    calendarId=CALENDAR_ID, body=dict(event_body(event), id=google_id(event.google_event_id)),
+                ).execute()
+            sequential = time.perf_counter() - start
+            self.stdout.write(f'sequential: {len(events) / sequential:.1f} events/s')
+
+            server.calendar.fail_next(options['failures'])
+            engine = BatchSyncEngine(service, batch_size=options['batch_size'], backoff=0.01)
+            for event in events:
+                engine.update(event)
+            report = engine.flush()
+            self.stdout.write(f'batched:    {report}')
+
+            # Second pass: unchanged events are skipped, edited ones go out as small PATCHes
+            changed = events[:int(len(events) * options['changed'])]
+            for event in changed:
+                event.location = 'Pune'
+            for event in changed[:options['remote_edits']]:
+                path = f'/calendar/v3/calendars/{CALENDAR_ID}/events/{google_id(event.google_event_id)}'
+                server.calendar.handle('PATCH', path, {}, {}, json.dumps({'summary': 'Edited in Google'}))
+            before = server.calendar.request_count
+            engine = BatchSyncEngine(service, batch_size=options['batch_size'], backoff=0.01)
+            for event in events:
+                engine.update(event)
+            report = engine.flush()
+            self.stdout.write(f'resync:     {report}')
+            self.stdout.write(f'            {len(changed)} changed, {report.conflicts} If-Match conflicts, '
+                              f'{server.calendar.request_count - before} calls for {len(events)} events')
+
+
+def _event(i):
+    start = timezone.now() + datetime.timedelta(days=i)
+    return Event(
+        event_name=f'Gig {i}', location='Mumbai', description='Benchmark event',
+        event_start_date=start, event_end_date=start + datetime.timedelta(hours=3),
+        event_organiser_email=f'organiser{i}@example.com', event_organiser_name='Organiser',
+    )
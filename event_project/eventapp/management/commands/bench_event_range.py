@@ -0,0 +1,66 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from eventapp.models import Event
+from eventapp.ranges import overlapping_events
+
+BENCH_DOMAIN = 'bench.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic events and time index-backed /events/range/ queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Number of events to insert before timing.')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--window-hours', type=int, default=24)
+        parser.add_argument('--cleanup', action='store_true', help='Delete previously seeded events and exit.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = Event.objects.filter(event_organiser_email__endswith='@' + BENCH_DOMAIN).delete()
+            self.stdout.write(f'deleted {deleted} seeded events')
+            return
+
+        origin = timezone.now().replace(minute=0, second=0, microsecond=0)
+        span_days = 3 * 365
+        if options['seed']:
+            self._seed(options['seed'], origin, span_days)
+
+        window = datetime.timedelta(hours=options['window_hours'])
+        timings, matches = [], 0
+        for _ in range(options['queries']):
+            start = origin + datetime.timedelta(hours=random.randrange(span_days * 24))
+            begin = time.perf_counter()
+            matches += len(list(overlapping_events(start, start + window).order_by('event_start_date')[:50]))
+            timings.append(time.perf_counter() - begin)
+
+        timings.sort()
+        self.stdout.write(f'{Event.objects.count()} events, {options["queries"]} queries, '
+                          f'{matches / options["queries"]:.1f} rows/query')
+        self.stdout.write(f'p50 {timings[len(timings) // 2] * 1000:.2f} ms, '
+                          f'p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, '
+                          f'mean {statistics.mean(timings) * 1000:.2f} ms')
+        self.stdout.write(overlapping_events(origin, origin + window).explain())
+
+    def _seed(self, count, origin, span_days, chunk=10000):
+        run = int(time.time())
+        begin = time.perf_counter()
+        for offset in range(0, count, chunk):
+            rows = []
+            for i in range(offset, min(offset + chunk, count)):
+                start = origin + datetime.timedelta(minutes=random.randrange(span_days * 24 * 60))
+                rows.append(Event(
+                    event_name=f'Bench gig {i}', location=f'Venue {i % 500}', description='',
+                    event_start_date=start, event_end_date=start + datetime.timedelta(hours=random.randint(1, 6)),
+                    event_organiser_email=f'{run}-{i}@{BENCH_DOMAIN}', event_organiser_name='Bench',
+                ))
+            with transaction.atomic():
+                Event.objects.bulk_create(rows)
+        self.stdout.write(f'seeded {count} events in {time.perf_counter() - begin:.1f}s')
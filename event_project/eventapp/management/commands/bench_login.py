@@ -0,0 +1,96 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from eventapp.login import PBKDF2PasswordHasher
+from eventapp.models import Musician, UserCredentials
+from eventapp.views import UserLoginAPIView
+
+BENCH_DOMAIN = 'login.bench.invalid'
+PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    help = 'Time concurrent logins at several PBKDF2 work factors and report the largest within a p99 budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', default='100000,300000,600000,1000000',
+                            help='Comma separated PBKDF2 iteration counts to try.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--budget-ms', type=float, default=250, help='p99 latency a work factor must stay under.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete previously seeded users and exit.')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        if options['cleanup']:
+            return
+        emails = [f'{i}@{BENCH_DOMAIN}' for i in range(options['users'])]
+        self._seed(emails)
+        view = UserLoginAPIView.as_view()
+        factory = APIRequestFactory()
+
+        def login(email):
+            begin = time.perf_counter()
+            response = view(factory.post('/login/', {'email': email, 'password': PASSWORD}, format='json'))
+            elapsed = time.perf_counter() - begin
+            connection.close()
+            if response.status_code != 200:
+                raise RuntimeError(f'login failed with {response.status_code}: {response.data}')
+            return elapsed
+
+        default_iterations = PBKDF2PasswordHasher.iterations
+        chosen = None
+        try:
+            for iterations in [int(value) for value in options['iterations'].split(',')]:
+                PBKDF2PasswordHasher.iterations = iterations
+                # Every user starts with a hash at this work factor so no login pays for an upgrade
+                UserCredentials.objects.filter(email__in=emails).update(password=make_password(PASSWORD))
+                for email in emails[:options['concurrency']]:
+                    login(email)  # warm the profile cache and connections
+                targets = [emails[i % len(emails)] for i in range(options['requests'])]
+                with ThreadPoolExecutor(options['concurrency']) as pool:
+                    begin = time.perf_counter()
+                    timings = sorted(pool.map(login, targets))
+                    wall = time.perf_counter() - begin
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+                if p99 <= options['budget_ms']:
+                    chosen = iterations
+                self.stdout.write(f'{iterations:>9} iterations: p50 {timings[len(timings) // 2] * 1000:.1f} ms, '
+                                  f'p99 {p99:.1f} ms, mean {statistics.mean(timings) * 1000:.1f} ms, '
+                                  f'{len(timings) / wall:.0f} logins/s at concurrency {options["concurrency"]}')
+
+            # First login of a row from before hashing: plain-text compare plus the upgrade write
+            UserCredentials.objects.filter(email=emails[0]).update(password=PASSWORD)
+            begin = time.perf_counter()
+            login(emails[0])
+            self.stdout.write(f'plain-text login with upgrade: {(time.perf_counter() - begin) * 1000:.1f} ms, '
+                              f'hashed now: {UserCredentials.objects.get(email=emails[0]).password != PASSWORD}')
+        finally:
+            PBKDF2PasswordHasher.iterations = default_iterations
+            self._cleanup()
+        if chosen is None:
+            self.stdout.write(f'no work factor kept p99 under {options["budget_ms"]} ms')
+        else:
+            self.stdout.write(f'largest work factor within p99 {options["budget_ms"]} ms: '
+                              f'LOGIN_PBKDF2_ITERATIONS = {chosen}')
+
+    def _seed(self, emails):
+        with transaction.atomic():
+            UserCredentials.objects.bulk_create(
+                [UserCredentials(category='musician', email=email, password=PASSWORD) for email in emails])
+            Musician.objects.bulk_create([
+                Musician(name=f'Bench musician {i}', email=email, age=30, category='Bench', address='', city='',
+                         country='', ratings=0, profileline='', imageAddress='https://example.invalid/')
+                for i, email in enumerate(emails)
+            ])
+
+    def _cleanup(self):
+        UserCredentials.objects.filter(email__endswith='@' + BENCH_DOMAIN).delete()
+        Musician.objects.filter(email__endswith='@' + BENCH_DOMAIN).delete()
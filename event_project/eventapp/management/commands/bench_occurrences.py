@@ -0,0 +1,82 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from eventapp import recurrence
+from eventapp.models import Event, EventOccurrence
+
+# Only the bench's series are held there, so one-off events don't blur the comparison
+VENUE = 'bench-venue'
+RULES = ['FREQ=WEEKLY;BYDAY=FR', 'FREQ=WEEKLY;BYDAY=TU,TH', 'FREQ=DAILY', 'FREQ=MONTHLY;BYDAY=-1SA',
+         'FREQ=WEEKLY;INTERVAL=2;BYDAY=SA', 'FREQ=MONTHLY;BYMONTHDAY=1,15']
+
+
+class Command(BaseCommand):
+    help = 'Time occurrence queries: materialized window, lazy skip-ahead expansion and naive expansion.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--series', type=int, default=200, help='Recurring events to create.')
+        parser.add_argument('--years', type=int, default=5, help='How long ago the series started.')
+        parser.add_argument('--window-days', type=int, default=7)
+        parser.add_argument('--queries', type=int, default=30)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        rnd = random.Random(0)
+        with transaction.atomic():
+            events = []
+            for i in range(options['series']):
+                start = now - datetime.timedelta(days=365 * options['years'] - rnd.randint(0, 300), hours=rnd.randint(0, 23))
+                events.append(Event(
+                    event_name=f'bench-series-{i}', location=VENUE, description='',
+                    event_start_date=start, event_end_date=start + datetime.timedelta(hours=3),
+                    event_organiser_email='bench@example.invalid', event_organiser_name='Bench',
+                    recurrence=RULES[i % len(RULES)], **recurrence.unmaterialized(start),
+                ))
+            Event.objects.bulk_create(events)
+        series = list(Event.objects.filter(event_name__startswith='bench-series-'))
+        try:
+            start = time.perf_counter()
+            rows = sum(recurrence.materialize(event) for event in series)
+            self.stdout.write(f'materialized {rows} occurrences of {len(series)} series '
+                              f'in {time.perf_counter() - start:.2f}s')
+
+            window = datetime.timedelta(days=options['window_days'])
+            hot_from, hot_until = recurrence.hot_window(now)
+            hot = [hot_from + (hot_until - hot_from - window) * rnd.random() for _ in range(options['queries'])]
+            cold = [hot_until + datetime.timedelta(days=rnd.randint(30, 700)) for _ in range(options['queries'])]
+
+            def timed(label, run, starts):
+                samples, found = [], 0
+                for window_start in starts:
+                    begin = time.perf_counter()
+                    found += len(run(window_start, window_start + window))
+                    samples.append(time.perf_counter() - begin)
+                self.stdout.write(f'{label:<28} median {statistics.median(samples) * 1000:8.2f} ms, '
+                                  f'{found / len(starts):.0f} occurrences per window')
+
+            def between(a, b):
+                return recurrence.occurrences_between(a, b, location=VENUE)
+
+            timed('hot window (table)', between, hot)
+            timed('cold window (skip-ahead)', between, cold)
+            timed('cold window (from dtstart)', lambda a, b: _naive(series, a, b), cold)
+        finally:
+            EventOccurrence.objects.filter(event__in=series).delete()
+            Event.objects.filter(event_name__startswith='bench-series-').delete()
+
+
+def _naive(series, start, end):
+    # What expansion costs without skipping ahead: every series walked from its first occurrence
+    found = []
+    for event in series:
+        for occurrence_start, occurrence_end in recurrence.expand(
+                event.recurrence, event.event_start_date, event.event_end_date, event.time_zone, None, end):
+            if occurrence_end >= start:
+                found.append((event, occurrence_start, occurrence_end))
+    return found
@@ -0,0 +1,90 @@
+import datetime
+import importlib
+import random
+import statistics
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from eventapp.models import Event, EventOrganizer
+
+BENCH_DOMAIN = 'organisers.bench.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Seed organisers with many events each, link them in batches and time the filter-by-email lookup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizers', type=int, default=2000)
+        parser.add_argument('--events-per-organizer', type=int, default=25)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--cleanup', action='store_true', help='Delete previously seeded organisers and events and exit.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            events, _ = Event.objects.filter(event_organiser_email__endswith='@' + BENCH_DOMAIN).delete()
+            organisers, _ = EventOrganizer.objects.filter(email__endswith='@' + BENCH_DOMAIN).delete()
+            self.stdout.write(f'deleted {events} events and {organisers} organisers')
+            return
+
+        emails = self._seed(options['organizers'], options['events_per_organizer'])
+
+        # The same batched backfill the 0010 migration runs on deploy
+        migration = importlib.import_module('eventapp.migrations.0010_backfill_event_organiser')
+        begin = time.perf_counter()
+        migration.link_organisers(apps, connection.schema_editor())
+        self.stdout.write(f'linked events to organisers in {time.perf_counter() - begin:.1f}s')
+
+        def by_email_string(email):
+            return Event.objects.filter(event_organiser_email=email).only('event_name')
+
+        def by_foreign_key(email):
+            return Event.objects.filter(event_organiser__email=email).order_by('event_start_date').only('event_name')
+
+        for label, lookup in (('email string', by_email_string), ('foreign key', by_foreign_key)):
+            timings, rows = [], 0
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(options['queries']):
+                    email = random.choice(emails)
+                    begin = time.perf_counter()
+                    rows += len([event.event_name for event in lookup(email)])
+                    timings.append(time.perf_counter() - begin)
+            timings.sort()
+            self.stdout.write(f'{label}: {rows / options["queries"]:.1f} rows/lookup, '
+                              f'{len(queries) / options["queries"]:.1f} queries/lookup, '
+                              f'p50 {timings[len(timings) // 2] * 1000:.2f} ms, '
+                              f'p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, '
+                              f'mean {statistics.mean(timings) * 1000:.2f} ms')
+        self.stdout.write(by_foreign_key(emails[0]).explain())
+
+    def _seed(self, organizers, per_organizer, chunk=10000):
+        run = int(time.time())
+        origin = timezone.now().replace(minute=0, second=0, microsecond=0)
+        emails = [f'{run}-{i}@{BENCH_DOMAIN}' for i in range(organizers)]
+        begin = time.perf_counter()
+        with transaction.atomic():
+            EventOrganizer.objects.bulk_create([
+                EventOrganizer(name=f'Bench organiser {i}', email=email, age=30, club_address='', city='',
+                               country='', profileline='', imageaddress='https://example.invalid/')
+                for i, email in enumerate(emails)
+            ], batch_size=1000)
+        # Events start unlinked, as rows written before the foreign key existed
+        rows = []
+        for i in range(organizers * per_organizer):
+            start = origin + datetime.timedelta(hours=random.randrange(3 * 365 * 24))
+            rows.append(Event(
+                event_name=f'Bench gig {i}', location=f'Bench venue {i}', description='',
+                event_start_date=start, event_end_date=start + datetime.timedelta(hours=2),
+                event_organiser_email=emails[i % organizers], event_organiser_name='Bench',
+            ))
+            if len(rows) >= chunk:
+                Event.objects.bulk_create(rows)
+                rows = []
+        Event.objects.bulk_create(rows)
+        self.stdout.write(f'seeded {organizers} organisers with {organizers * per_organizer} events '
+                          f'in {time.perf_counter() - begin:.1f}s')
+        return emails
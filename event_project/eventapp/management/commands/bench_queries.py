@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from eventapp.benchmarks.generators import clear_created
+from eventapp.benchmarks.queries import check
+from eventapp.benchmarks.scenarios import SCENARIOS, sample_dataset, select
+
+
+class Command(BaseCommand):
+    help = ('Run each benchmark scenario once with the caches cleared and fail if it runs more queries '
+            'than its budget, or more queries for more rows (an N+1).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated scenario names.')
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = select(options['scenarios'])
+            dataset = sample_dataset(size=50)
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        try:
+            results, problems = check(scenarios, dataset)
+        finally:
+            clear_created()
+        for scenario in scenarios:
+            counts = results[scenario.name]
+            shown = ', '.join(f'{queries} (size {size})' if size else str(queries) for size, queries in counts.items())
+            self.stdout.write(f'{scenario.name:<16} {shown} queries, budget {scenario.max_queries}')
+        if problems:
+            raise CommandError('\n'.join(problems))
+
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventapp import geo, search
+from eventapp.benchmarks import generators
+from eventapp.gazetteer import get_gazetteer
+from eventapp.models import Musician
+
+# What organisers ask /musicians/search/ for, as search.musicians() keyword arguments
+QUERIES = [
+    ('top rated', {}),
+    ('city', {'country': 'India', 'city': 'Pune'}),
+    ('city, rating >= 4.5', {'country': 'India', 'city': 'Pune', 'min_rating': 4.5}),
+    ('country, rating >= 4', {'country': 'India', 'min_rating': 4}),
+    ('word', {'text': 'jazz'}),
+    ('prefix', {'text': 'gui'}),
+    ('words, city', {'text': 'blues drummer', 'country': 'India', 'city': 'Goa'}),
+    ('rare words', {'text': 'metal violinist weddings'}),
+]
+# What /musicians/nearby/ is asked for, as (place, radius in km)
+NEARBY = [
+    ('Pune', 50),
+    ('Mumbai', 200),
+    ('Goa', 500),
+]
+
+
+class Command(BaseCommand):
+    help = ('Seed musicians and time the /musicians/search/ queries: p50/p95 for one page of results, '
+            'failing when a query is slower than --budget-ms.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--musicians', type=int, default=500_000, help='Musicians to have before timing.')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per query.')
+        parser.add_argument('--budget-ms', type=float, default=20.0, help='Largest acceptable p95.')
+        parser.add_argument('--explain', action='store_true', help="Print each query's plan.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per INSERT transaction.')
+        parser.add_argument('--cleanup', action='store_true', help="Delete bench_search's musicians and exit.")
+
+    def handle(self, *args, **options):
+        progress = self.stdout.write if options['verbosity'] > 1 else None
+        if options['cleanup']:
+            deleted = generators.clear_search_musicians(options['chunk_size'], progress)
+            self.stdout.write(f'deleted {deleted} rows')
+            return
+        begin = time.perf_counter()
+        added = generators.seed_search_musicians(options['musicians'], options['chunk_size'], progress=progress)
+        if added:
+            self.stdout.write(f'added {added} musicians in {time.perf_counter() - begin:.1f}s')
+
+        slow = []
+        for name, kwargs in QUERIES:
+            queryset = search.musicians(**kwargs, limit=options['page_size'])
+            if options['explain']:
+                self.stdout.write(f'{name}:\n{queryset.explain()}')
+            self._time(name, lambda: list(queryset.all()), options, slow)
+        for place, radius_km in NEARBY:
+            latitude, longitude = get_gazetteer().geocode(place)
+            self._time(f'within {radius_km} km of {place}', lambda: geo.nearby(
+                Musician.objects.all(), latitude, longitude, radius_km, options['page_size']), options, slow)
+        if slow:
+            raise CommandError('\n'.join(slow))
+
+    def _time(self, name, query, options, slow):
+        rows = len(query())  # warm the page cache
+        timings = []
+        for _ in range(options['repeat']):
+            begin = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - begin) * 1000)
+        p50, p95 = _percentile(timings, 50), _percentile(timings, 95)
+        self.stdout.write(f'{name:<24} {rows:4d} rows  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms')
+        if p95 > options['budget_ms']:
+            slow.append(f'{name}: p95 {p95:.1f} ms is over {options["budget_ms"]:.0f} ms')
+
+
+def _percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventapp.benchmarks import generators
+
+
+class Command(BaseCommand):
+    help = 'Seed organisers, musicians, logins and events for bench_api and bench_queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='10k', help=f'Events to create: {", ".join(generators.SCALES)}.')
+        parser.add_argument('--events', type=int, help='An exact number of events instead of --scale.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per INSERT transaction.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete previously seeded rows and exit.')
+
+    def handle(self, *args, **options):
+        progress = self.stdout.write if options['verbosity'] > 1 else None
+        begin = time.perf_counter()
+        deleted = generators.clear(options['chunk_size'], progress)
+        if deleted:
+            self.stdout.write(f'deleted {deleted} previously seeded rows in {time.perf_counter() - begin:.1f}s')
+        if options['cleanup']:
+            return
+        events = options['events']
+        if events is None:
+            if options['scale'] not in generators.SCALES:
+                raise CommandError(f'--scale should be one of {", ".join(generators.SCALES)}.')
+            events = generators.SCALES[options['scale']]
+        begin = time.perf_counter()
+        counts = generators.seed(events, options['chunk_size'], progress=progress)
+        elapsed = time.perf_counter() - begin
+        self.stdout.write(', '.join(f'{count} {table}' for table, count in counts.items())
+                          + f' in {elapsed:.1f}s ({counts["events"] / elapsed:.0f} events/s)')
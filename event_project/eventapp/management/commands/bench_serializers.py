@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from eventapp import rendering
+from eventapp.models import Event, EventOrganizer, Musician
+from eventapp.serializers import EventOrganizerSerializer, EventSerializer, MusicianSerializer
+
+# name: (queryset the list views use, serializer)
+MODELS = {
+    'events': (Event.objects.prefetch_related('musicians'), EventSerializer),
+    'musicians': (Musician.objects.all(), MusicianSerializer),
+    'organisers': (EventOrganizer.objects.all(), EventOrganizerSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare rows/s of the serializers against the FastListMixin path (values_list rows, RowEncoder, '
+            'ORJSONRenderer) on existing rows, and fail if the two render different bytes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', default=','.join(MODELS), help=f'Comma separated: {", ".join(MODELS)}.')
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per timed run, newest first.')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per path.')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['models'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in MODELS]
+        if unknown:
+            raise CommandError(f'Unknown models: {", ".join(unknown)}; choose from {", ".join(MODELS)}.')
+        if rendering.orjson is None:
+            self.stdout.write('orjson is not installed; the fast path renders with JSONRenderer')
+        for name in names:
+            queryset, serializer_class = MODELS[name]
+            queryset = queryset.order_by('-pk')[:options['rows']]
+            encoder = rendering.encoder_for(serializer_class())
+
+            def serializer_path():
+                instances = list(queryset.all())
+                begin = time.perf_counter()
+                rendered = JSONRenderer().render(serializer_class(instances, many=True).data)
+                return rendered, len(instances), time.perf_counter() - begin
+
+            def fast_path():
+                rows = list(encoder.values(queryset.all()))
+                begin = time.perf_counter()
+                rendered = rendering.ORJSONRenderer().render(encoder.encode(rows))
+                return rendered, len(rows), time.perf_counter() - begin
+
+            expected, rows, _ = serializer_path()
+            if not rows:
+                raise CommandError(f'No {name}; run manage.py bench_seed first.')
+            if fast_path()[0] != expected:
+                raise CommandError(f'{name}: the fast path renders different bytes from {serializer_class.__name__}')
+            self.stdout.write(f'{name} ({rows} rows per run):')
+            baseline = None
+            for label, path in (('serializer', serializer_path), ('fast path', fast_path)):
+                totals, encoding = [], []
+                for _ in range(options['repeat']):
+                    begin = time.perf_counter()
+                    _, _, seconds = path()
+                    totals.append(time.perf_counter() - begin)
+                    encoding.append(seconds)
+                encode_rate = rows / statistics.median(encoding)
+                total_rate = rows / statistics.median(totals)
+                speedup = f'  {encode_rate / baseline:5.1f}x' if baseline else ''
+                baseline = baseline or encode_rate
+                self.stdout.write(f'  {label:<11} {encode_rate:>10,.0f} rows/s serialized and rendered, '
+                                  f'{total_rate:>9,.0f} rows/s with the query{speedup}')
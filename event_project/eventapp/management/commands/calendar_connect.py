@@ -0,0 +1,33 @@
+import pickle
+
+from django.core.management.base import BaseCommand, CommandError
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+from eventapp.calendar_accounts import connect
+from eventapp.calendar_service import CLIENT_SECRETS_PATH, SCOPES
+from eventapp.models import EventOrganizer
+
+
+class Command(BaseCommand):
+    help = 'Authorize a Google account and store its token, encrypted, as a CalendarAccount.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='The Google account being connected.')
+        parser.add_argument('--organiser', help="Email of the EventOrganizer whose events go to this account.")
+        parser.add_argument('--calendar', help="Calendar to write to; default 'primary'.")
+        parser.add_argument('--from-pickle', metavar='PATH',
+                            help='Import an existing token.pickle instead of running the consent flow.')
+
+    def handle(self, *args, **options):
+        organiser = None
+        if options['organiser']:
+            organiser = EventOrganizer.objects.filter(email=options['organiser']).first()
+            if organiser is None:
+                raise CommandError(f"No event organiser with email {options['organiser']}.")
+        if options['from_pickle']:
+            with open(options['from_pickle'], 'rb') as token:
+                creds = pickle.load(token)
+        else:
+            creds = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_PATH, SCOPES).run_local_server(port=0)
+        account = connect(options['email'], creds, organiser=organiser, calendar_id=options['calendar'])
+        self.stdout.write(f'Connected {account.email} (account {account.pk}, calendar {account.calendar_id}).')
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventapp.calendar_accounts import calendar_for, get_pool
+from eventapp.calendar_pull import pull
+from eventapp.models import CalendarAccount
+
+
+class Command(BaseCommand):
+    help = 'Pull changed events from Google Calendar using the stored sync token.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', help="Email of the CalendarAccount to pull; default: the deployment's token.")
+        parser.add_argument('--calendar', help="Default: the account's calendar.")
+        parser.add_argument('--full', action='store_true', help='Ignore the sync token and re-list everything.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep polling every N seconds instead of pulling once.')
+
+    def handle(self, *args, **options):
+        account = CalendarAccount.objects.get(email=options['account']) if options['account'] else None
+        service = get_pool().get_service(account)
+        calendar_id = calendar_for(account, options['calendar'])
+        full = options['full']
+        while True:
+            report = pull(service, calendar_id=calendar_id, full=full, account=account)
+            self.stdout.write(str(report))
+            if not options['interval']:
+                return
+            full = False
+            time.sleep(options['interval'])
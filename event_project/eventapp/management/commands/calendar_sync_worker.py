@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from eventapp import outbox
+from eventapp.calendar_async import CONCURRENCY, AsyncCalendarClient
+from eventapp.calendar_service import get_calendar_service
+from eventapp.ratelimit import get_limiter
+
+
+class Command(BaseCommand):
+    help = 'Drain the CalendarOutbox table and push queued event writes to Google Calendar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of worker threads.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Outbox rows claimed per round.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--async', dest='use_async', action='store_true',
+                            help='Run the workers as coroutines sending concurrent calls instead of batches.')
+        parser.add_argument('--in-flight', type=int, default=CONCURRENCY,
+                            help='With --async, the most Calendar calls in flight at once.')
+
+    def handle(self, *args, **options):
+        self._stopping = threading.Event()
+        if options['use_async']:
+            try:
+                asyncio.run(self._work_async(options))
+            except KeyboardInterrupt:
+                pass
+            self._report()
+            return
+        threads = [
+            threading.Thread(target=self._work, args=(options,), name=f'calendar-sync-{i}', daemon=True)
+            for i in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self._stopping.set()
+        self._report()
+
+    def _report(self):
+        stats = outbox.metrics()
+        self.stdout.write(f"queue depth {stats['queue_depth']}, dead letters {stats['dead_letters']}, "
+                          f"drain rate {stats['drain_rate_per_second']:.1f}/s")
+
+    def _work(self, options):
+        service = get_calendar_service()
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    rows = outbox.claim(options['batch_size'])
+                    if rows:
+                        start = time.perf_counter()
+                        done, failed = outbox.process(rows, service)
+                        elapsed = time.perf_counter() - start
+                except Exception as e:
+                    # Claimed rows are released when their lease expires
+                    self.stderr.write(f'{threading.current_thread().name}: {e}')
+                    self._stopping.wait(options['poll_interval'])
+                    continue
+                if not rows:
+                    if options['once']:
+                        return
+                    self._stopping.wait(options['poll_interval'])
+                    continue
+                self.stdout.write(f'{threading.current_thread().name}: {done} synced, {failed} failed '
+                                  f'({done / elapsed:.1f} events/s)')
+        finally:
+            connection.close()
+
+    async def _work_async(self, options):
+        # Outbox rows carry their own retry schedule, so the client doesn't retry
+        async with AsyncCalendarClient(concurrency=options['in_flight'], max_retries=0,
+                                       limiter=get_limiter()) as client:
+            await asyncio.gather(*(self._drain_async(client, f'calendar-sync-{i}', options)
+                                   for i in range(options['concurrency'])))
+
+    async def _drain_async(self, client, name, options):
+        while True:
+            try:
+                rows = await sync_to_async(outbox.claim)(options['batch_size'])
+                if rows:
+                    start = time.perf_counter()
+                    done, failed = await outbox.process_async(rows, client)
+                    elapsed = time.perf_counter() - start
+            except Exception as e:
+                self.stderr.write(f'{name}: {e}')
+                await asyncio.sleep(options['poll_interval'])
+                continue
+            if not rows:
+                if options['once']:
+                    return
+                await asyncio.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'{name}: {done} synced, {failed} failed ({done / elapsed:.1f} events/s, '
+                              f'peak {client.peak_in_flight} calls in flight)')
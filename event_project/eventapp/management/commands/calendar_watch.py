@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from eventapp import calendar_watch
+
+
+class Command(BaseCommand):
+    help = ('Keep Google push-notification channels open on the synced calendars and pull a '
+            'calendar as soon as its channel says it changed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds between checks for notified calendars; these are database queries only.')
+        parser.add_argument('--renew-interval', type=float, default=300,
+                            help='Seconds between checks for channels to open or renew.')
+        parser.add_argument('--stop', action='store_true', help='Stop every open channel and exit.')
+
+    def handle(self, *args, **options):
+        if options['stop']:
+            self.stdout.write(f'Stopped {calendar_watch.stop_all()} channels.')
+            return
+        if not calendar_watch.webhook_address():
+            raise CommandError('Set GOOGLE_CALENDAR_WEBHOOK_URL to the public URL Google should notify.')
+        renewed = None
+        try:
+            while True:
+                close_old_connections()
+                if renewed is None or time.monotonic() - renewed >= options['renew_interval']:
+                    opened, stopped = calendar_watch.renew()
+                    renewed = time.monotonic()
+                    if opened or stopped:
+                        self.stdout.write(f'{opened} channels opened, {stopped} stopped')
+                for state, outcome in calendar_watch.pull_due():
+                    target = f'{state.account or "default account"} / {state.calendar_id}'
+                    if isinstance(outcome, Exception):
+                        self.stderr.write(f'{target}: {outcome}')
+                    else:
+                        self.stdout.write(f'{target}: {outcome}')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventapp.conflicts import ConflictDetector
+
+
+class Command(BaseCommand):
+    help = 'List every pair of double-booked events per organiser and per location.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Maximum number of pairs to print.')
+
+    def handle(self, *args, **options):
+        detector = ConflictDetector()
+        start = time.perf_counter()
+        pairs = list(detector.find_all_conflicts())
+        elapsed = time.perf_counter() - start
+        for scope, value, first, second in pairs[:options['limit']]:
+            self.stdout.write(f'{scope}={value}: events {first} and {second} overlap')
+        self.stdout.write(f'{len(pairs)} conflicting pairs found in {elapsed:.2f}s')
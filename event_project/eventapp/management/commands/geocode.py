@@ -0,0 +1,65 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from eventapp import caching
+from eventapp.gazetteer import GEO_FIELDS, PLACE_FIELDS, get_gazetteer
+from eventapp.models import Event, EventOrganizer, Musician
+
+MODELS = {'events': Event, 'musicians': Musician, 'organisers': EventOrganizer}
+
+
+class Command(BaseCommand):
+    help = ('Geocode events, musicians and organisers against the offline gazetteer. Saves do this '
+            'themselves; run it once after migrating, after bulk loads, or with --all after changing GEO_GAZETTEER.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', default=','.join(MODELS), help=f'Comma separated: {", ".join(MODELS)}.')
+        parser.add_argument('--all', action='store_true', help='Redo rows that already have coordinates.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per UPDATE transaction.')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['models'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in MODELS]
+        if unknown:
+            raise CommandError(f'Unknown models: {", ".join(unknown)}; choose from {", ".join(MODELS)}.')
+        gazetteer = get_gazetteer()
+        for name in names:
+            model = MODELS[name]
+            # Only the columns geocoding reads; events' descriptions can be long
+            fields = [*PLACE_FIELDS[model._meta.label_lower], *GEO_FIELDS]
+            if any(field.name == 'country' for field in model._meta.fields):
+                fields.append('country')
+            queryset = model.objects.only(*fields).order_by('pk')
+            if not options['all']:
+                queryset = queryset.filter(geohash='')
+            begin = time.perf_counter()
+            located = missing = changed = 0
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk)[:options['chunk_size']])
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+                # Rows share a few hundred places at most, so one UPDATE per place is far
+                # cheaper than bulk_update()'s CASE WHEN per row
+                by_point = defaultdict(list)
+                for row in rows:
+                    before = tuple(getattr(row, field) for field in GEO_FIELDS)
+                    if gazetteer.locate(row):
+                        located += 1
+                    else:
+                        missing += 1
+                    after = tuple(getattr(row, field) for field in GEO_FIELDS)
+                    if after != before:
+                        by_point[after].append(row.pk)
+                with transaction.atomic():
+                    for point, pks in by_point.items():
+                        changed += model.objects.filter(pk__in=pks).update(**dict(zip(GEO_FIELDS, point)))
+            if changed:
+                # bulk_update sends no signals
+                caching.bump_version(model)
+            self.stdout.write(f'{name}: {located} located, {missing} not in the gazetteer '
+                              f'({time.perf_counter() - begin:.1f}s)')
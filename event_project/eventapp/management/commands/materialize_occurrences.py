@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventapp.recurrence import hot_window, roll_forward
+
+
+class Command(BaseCommand):
+    help = 'Move the materialized occurrence window of recurring events forward; run it daily.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep rolling every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            window = hot_window()
+            added, dropped = roll_forward(window)
+            self.stdout.write(f'{window[0]:%Y-%m-%d} to {window[1]:%Y-%m-%d}: {added} occurrences added, '
+                              f'{dropped} dropped ({time.perf_counter() - start:.2f}s)')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
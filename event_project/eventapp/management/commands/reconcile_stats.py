@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventapp import stats
+
+SUMMARIES = {'organisers': stats.ORGANISERS, 'musicians': stats.MUSICIANS}
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the organiser and musician event summaries from the events, in chunks, and report the '
+            'rows that had drifted. Event writes keep them current; run it nightly to catch up on writes '
+            'that bypass signals (queryset.update(), raw SQL) and once after migrating.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', default=','.join(SUMMARIES), help=f'Comma separated: {", ".join(SUMMARIES)}.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Organisers or musicians per transaction.')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep reconciling every N seconds instead of once.')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['models'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in SUMMARIES]
+        if unknown:
+            raise CommandError(f'Unknown models: {", ".join(unknown)}; choose from {", ".join(SUMMARIES)}.')
+        while True:
+            for name in names:
+                summary = SUMMARIES[name]
+                begin = time.perf_counter()
+                rebuilt = drifted = 0
+                last_pk = 0
+                while True:
+                    keys = list(summary.owners.filter(pk__gt=last_pk).order_by('pk')
+                                .values_list('pk', flat=True)[:options['chunk_size']])
+                    if not keys:
+                        break
+                    last_pk = keys[-1]
+                    drifted += stats.reconcile(summary, keys)
+                    rebuilt += len(keys)
+                self.stdout.write(f'{name}: {rebuilt} rebuilt, {drifted} had drifted '
+                                  f'({time.perf_counter() - begin:.1f}s)')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,132 @@
+import datetime
+import queue
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventapp.calendar_service import CalendarServiceRegistry
+from eventapp.calendar_sync import BatchSyncEngine
+from eventapp.fake_calendar import FakeCalendar, FakeCalendarServer
+from eventapp.models import Event
+from eventapp.ratelimit import BACKGROUND, INTERACTIVE, RateLimiter
+
+
+class RecordingCalendar(FakeCalendar):
+    # Timestamps every call the quota let through, for a per-second throughput timeline
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accepted = []
+
+    def handle(self, method, path, query, headers, body):
+        status, resource = super().handle(method, path, query, headers, body)
+        if status < 400:
+            self.accepted.append(time.monotonic())
+        return status, resource
+
+
+class Command(BaseCommand):
+    help = ('Replay a background resync plus a trickle of interactive writes against a fake Calendar '
+            'server that enforces a quota, with and without the adaptive rate limiter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quota', type=float, default=40, help='Calls per second the fake server allows.')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Limiter ceiling in calls/s; defaults to 1.5x the quota, as when the quota is unknown.')
+        parser.add_argument('--backlog', type=int, default=600, help='Events in the background resync.')
+        parser.add_argument('--interactive-rate', type=float, default=2, help='Interactive writes per second.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of interactive traffic.')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--latency', type=float, default=0.02)
+        parser.add_argument('--modes', default='none,fixed,aimd', help='Comma separated: none, fixed, aimd.')
+
+    def handle(self, *args, **options):
+        for mode in options['modes'].split(','):
+            self._simulate(mode.strip(), options)
+
+    def _simulate(self, mode, options):
+        quota = options['quota']
+        calendar = RecordingCalendar(quota=quota)
+        ceiling = options['rate'] or quota * 1.5
+        limiter = None
+        if mode == 'fixed':
+            limiter = RateLimiter(name='simulation-fixed', rate=ceiling, increase=0, decrease=1)
+        elif mode == 'aimd':
+            limiter = RateLimiter(name='simulation-aimd', rate=ceiling)
+        if limiter is not None:
+            limiter.reset()
+
+        with FakeCalendarServer(calendar, latency=options['latency']) as server:
+            registry = CalendarServiceRegistry(root_url=server.root_url)
+            backlog = queue.Queue()
+            for i in range(options['backlog']):
+                backlog.put(_event(i))
+            interactive_latency = []
+            failed = []
+
+            def sync(events, priority):
+                engine = BatchSyncEngine(registry.get_service(), batch_size=options['batch_size'],
+                                         max_retries=12, backoff=0.1, limiter=limiter, priority=priority)
+                for event in events:
+                    engine.insert(event)
+                report = engine.flush()
+                failed.extend(report.failed)
+
+            def background_worker():
+                while True:
+                    chunk = []
+                    while len(chunk) < options['batch_size'] and not backlog.empty():
+                        try:
+                            chunk.append(backlog.get_nowait())
+                        except queue.Empty:
+                            break
+                    if not chunk:
+                        return
+                    sync(chunk, BACKGROUND)
+
+            def interactive_write(i):
+                begin = time.perf_counter()
+                sync([_event(options['backlog'] + i)], INTERACTIVE)
+                interactive_latency.append(time.perf_counter() - begin)
+
+            start = time.monotonic()
+            workers = [threading.Thread(target=background_worker) for _ in range(options['workers'])]
+            for worker in workers:
+                worker.start()
+            with ThreadPoolExecutor(8) as pool:
+                count = int(options['duration'] * options['interactive_rate'])
+                for i in range(count):
+                    pool.submit(interactive_write, i)
+                    time.sleep(1 / options['interactive_rate'])
+            for worker in workers:
+                worker.join()
+            elapsed = time.monotonic() - start
+
+        per_second = [0] * (int(elapsed) + 1)
+        for at in calendar.accepted:
+            per_second[int(at - start)] += 1
+        steady = per_second[1:-1] or per_second
+        interactive_latency.sort()
+        self.stdout.write(f'{mode}:')
+        self.stdout.write(f'  {len(calendar.accepted)} calls accepted, {calendar.throttled_count} throttled, '
+                          f'{len(failed)} gave up, {elapsed:.1f}s total')
+        self.stdout.write(f'  throughput {statistics.mean(steady):.1f}/s of a {quota:.0f}/s quota '
+                          f'(stdev {statistics.pstdev(steady):.1f}), per second: {per_second}')
+        if interactive_latency:
+            self.stdout.write(f'  interactive p50 {interactive_latency[len(interactive_latency) // 2] * 1000:.0f} ms, '
+                              f'p95 {interactive_latency[int(len(interactive_latency) * 0.95)] * 1000:.0f} ms')
+        if limiter is not None:
+            self.stdout.write(f'  limiter settled at {limiter.rate:.1f} calls/s')
+
+
+def _event(i):
+    start = timezone.now() + datetime.timedelta(days=i)
+    return Event(
+        event_name=f'Gig {i}', location='Mumbai', description='Simulated event',
+        event_start_date=start, event_end_date=start + datetime.timedelta(hours=3),
+        event_organiser_email=f'organiser{i}@example.com', event_organiser_name='Organiser',
+    )
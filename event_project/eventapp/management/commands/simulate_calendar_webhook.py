@@ -0,0 +1,132 @@
+import datetime
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.utils import timezone
+
+from eventapp import calendar_watch
+from eventapp.calendar_pull import pull
+from eventapp.calendar_service import CalendarServiceRegistry
+from eventapp.fake_calendar import FakeCalendar, FakeCalendarServer
+from eventapp.models import CalendarSyncState, Event
+
+CALENDAR = 'webhook-simulation'
+
+
+class Command(BaseCommand):
+    help = ('Edit events directly in a fake Calendar server that posts push notifications to this '
+            'app\'s /calendar/webhook/, and measure how fast and how cheaply the changes arrive.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bursts', type=int, default=10)
+        parser.add_argument('--burst-size', type=int, default=20, help='Edits made in Google per burst.')
+        parser.add_argument('--pause', type=float, default=1.0, help='Seconds between bursts.')
+        parser.add_argument('--idle', type=float, default=10.0, help='Seconds of no edits at the end.')
+        parser.add_argument('--interval', type=float, default=0.2, help="The watcher's check interval.")
+        parser.add_argument('--coalesce', type=float, default=calendar_watch.COALESCE_SECONDS)
+        parser.add_argument('--latency', type=float, default=0.02)
+
+    def handle(self, *args, **options):
+        calendar = FakeCalendar()
+        app = make_server('127.0.0.1', 0, get_wsgi_application(), server_class=_ThreadingWSGIServer,
+                          handler_class=_QuietHandler)
+        threading.Thread(target=app.serve_forever, daemon=True).start()
+        address = calendar_watch.webhook_address('http://127.0.0.1:%d' % app.server_port)
+        created = []
+        with FakeCalendarServer(calendar, latency=options['latency']) as server:
+            registry = CalendarServiceRegistry(root_url=server.root_url)
+            # The first pull takes the sync token every later pull starts from
+            pull(registry.get_service(), calendar_id=CALENDAR)
+            channel = calendar_watch.watch(registry.get_service(), None, CALENDAR, address=address)
+            stopping = threading.Event()
+            pulls = []
+            watcher = threading.Thread(target=self._watch, args=(registry, options, stopping, pulls))
+            watcher.start()
+            try:
+                self._check_forged(address, channel)
+                delays = []
+                for burst in range(options['bursts']):
+                    keys = [uuid.uuid4() for _ in range(options['burst_size'])]
+                    for i, key in enumerate(keys):
+                        calendar.change(CALENDAR, _resource(key, burst, i))
+                    changed = time.monotonic()
+                    created.extend(keys)
+                    while Event.objects.filter(google_event_id__in=keys).count() < len(keys):
+                        if time.monotonic() - changed > 30:
+                            self.stderr.write(f'burst {burst} did not arrive within 30s')
+                            break
+                        time.sleep(0.01)
+                    delays.append(time.monotonic() - changed)
+                    time.sleep(options['pause'])
+                idle_from = calendar.request_count
+                time.sleep(options['idle'])
+                idle_calls = calendar.request_count - idle_from
+            finally:
+                stopping.set()
+                watcher.join()
+                calendar_watch.stop(registry.get_service(), channel)
+                Event.objects.filter(google_event_id__in=created).delete()
+                CalendarSyncState.objects.filter(account=None, calendar_id=CALENDAR).delete()
+                app.shutdown()
+                app.server_close()
+
+        edits = options['bursts'] * options['burst_size']
+        self.stdout.write(f'{edits} edits in {options["bursts"]} bursts: {calendar.notifications_sent} notifications, '
+                          f'{len(pulls)} pulls ({sum(report.pages for report in pulls)} list calls)')
+        self.stdout.write(f'visible locally after: median {statistics.median(delays) * 1000:.0f} ms, '
+                          f'max {max(delays) * 1000:.0f} ms')
+        self.stdout.write(f'{idle_calls} Calendar calls in {options["idle"]:.0f}s idle '
+                          f'(polling every {options["interval"]}s would make {options["idle"] / options["interval"]:.0f})')
+
+    def _watch(self, registry, options, stopping, pulls):
+        # What manage.py calendar_watch does, against the fake server; fallback polling off
+        try:
+            while not stopping.is_set():
+                for state, outcome in calendar_watch.pull_due(lambda account: registry.get_service(),
+                                                              coalesce=options['coalesce'], fallback=None):
+                    if isinstance(outcome, Exception):
+                        self.stderr.write(f'{state.calendar_id}: {outcome}')
+                    else:
+                        pulls.append(outcome)
+                stopping.wait(options['interval'])
+        finally:
+            connection.close()
+
+    def _check_forged(self, address, channel):
+        request = urllib.request.Request(address, data=b'', method='POST', headers={
+            'X-Goog-Channel-ID': str(channel.channel_id), 'X-Goog-Channel-Token': 'guessed',
+            'X-Goog-Resource-State': 'exists',
+        })
+        try:
+            urllib.request.urlopen(request).close()
+            self.stderr.write('a notification with the wrong token was accepted')
+        except urllib.error.HTTPError as e:
+            self.stdout.write(f'a notification with the wrong token was answered {e.code}')
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _resource(key, burst, i):
+    start = timezone.now() + datetime.timedelta(days=burst, hours=i)
+    return {
+        'id': key.hex, 'summary': f'Edited in Google {burst}-{i}', 'location': 'Pune', 'description': '',
+        'start': {'dateTime': start.isoformat()},
+        'end': {'dateTime': (start + datetime.timedelta(hours=2)).isoformat()},
+        'organizer': {'email': 'webhook-simulation@example.invalid', 'displayName': 'Simulation'},
+    }
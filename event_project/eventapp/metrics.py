@@ -0,0 +1,206 @@
+# metrics.py
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+PREFIX = getattr(settings, 'METRICS_PREFIX', 'eventapp')
+
+
+class _Metric:
+    kind = None
+
+    @property
+    def family(self):
+        return self.name
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f'{PREFIX}_{name}'
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def render(self):
+        lines = [f'# HELP {self.family} {self.documentation}', f'# TYPE {self.family} {self.kind}']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.extend(self._samples(dict(zip(self.labelnames, labels)), value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    @property
+    def family(self):
+        return f'{self.name}_total'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self, labels, value):
+        return [f'{self.family}{_labels(labels)} {_number(value)}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                # One count per bucket (not cumulative) plus +Inf, then the sum
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    def _samples(self, labels, row):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), row):
+            cumulative += count
+            le = bound if bound == '+Inf' else _number(bound)
+            lines.append(f'{self.name}_bucket{_labels(dict(labels, le=le))} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(labels)} {_number(row[-1])}')
+        lines.append(f'{self.name}_count{_labels(labels)} {cumulative}')
+        return lines
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = []
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time spent handling a request.',
+                            ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram('http_request_db_queries', 'Database queries per request.',
+                            ('method', 'route'), buckets=QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Time per request spent waiting on the database.',
+                               ('method', 'route'))
+REQUEST_SERIALIZE_SECONDS = Histogram('http_request_serialize_seconds',
+                                      'Time per request spent in serializers turning rows into data.',
+                                      ('method', 'route'))
+CALENDAR_SECONDS = Histogram('calendar_request_duration_seconds', 'Google Calendar API call latency.',
+                             ('operation',))
+CALENDAR_REQUESTS = Counter('calendar_requests', 'Google Calendar API calls by outcome; batched calls count one each.',
+                            ('operation', 'status'))
+
+
+def render():
+    """Every metric in the Prometheus text format.
+
+    Values live in this process only: behind several workers each one reports its
+    own, like prometheus_client's default registry; scrape them per process.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.calendar_calls = 0
+        self.calendar_seconds = 0.0
+        self._serializing = False
+
+
+_current = contextvars.ContextVar('eventapp_request_stats', default=None)
+
+
+@contextlib.contextmanager
+def collecting():
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def count_query(execute, sql, params, many, context):
+    # A connection.execute_wrapper(); only counts while a request is being collected
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def serializing():
+    stats = _current.get()
+    # Nested serializers are already inside their parent's time
+    if stats is None or stats._serializing:
+        yield
+        return
+    stats._serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize_seconds += time.perf_counter() - start
+        stats._serializing = False
+
+
+@contextlib.contextmanager
+def calendar_call(operation):
+    """Time one Calendar API call and count it by its status code."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_calendar_outcome(operation, e)
+        raise
+    else:
+        record_calendar_outcome(operation, None)
+    finally:
+        elapsed = time.perf_counter() - start
+        CALENDAR_SECONDS.observe(elapsed, operation)
+        stats = _current.get()
+        if stats is not None:
+            stats.calendar_calls += 1
+            stats.calendar_seconds += elapsed
+
+
+def record_calendar_outcome(operation, exception):
+    if exception is None:
+        status = '200'
+    else:
+        resp = getattr(exception, 'resp', None)
+        status = str(resp.status) if resp is not None else type(exception).__name__
+    CALENDAR_REQUESTS.inc(operation, status)
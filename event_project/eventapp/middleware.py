@@ -0,0 +1,145 @@
+# middleware.py
+import cProfile
+import hmac
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from . import metrics, routers
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Requests carrying this token in PROFILE_HEADER are answered with their profile instead
+# of their body; None turns the header off
+PROFILE_TOKEN = getattr(settings, 'METRICS_PROFILE_TOKEN', None)
+PROFILE_HEADER = getattr(settings, 'METRICS_PROFILE_HEADER', 'X-Profile')
+# Share of all requests profiled in the background, with the report logged to eventapp.profile
+PROFILE_SAMPLE_RATE = getattr(settings, 'METRICS_PROFILE_SAMPLE_RATE', 0.0)
+# 'cprofile', or 'pyinstrument' when it is installed
+PROFILER = getattr(settings, 'METRICS_PROFILER', 'cprofile')
+SERVER_TIMING = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger('eventapp.profile')
+# Profilers hook the interpreter; only one request is profiled at a time
+_profiling = threading.Lock()
+
+
+class MetricsMiddleware:
+    """Records latency, database queries and serializer time per route for /metrics.
+
+    Outbound Calendar calls are recorded where they are made (see metrics.calendar_call).
+    With SERVER_TIMING the same numbers go back in a Server-Timing header, so browser
+    dev tools show them per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with metrics.collecting() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.count_query))
+            response, report = self._respond(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.route if match is not None else '<unmatched>'
+        method = request.method
+        metrics.REQUEST_SECONDS.observe(elapsed, method, route, str(response.status_code))
+        metrics.REQUEST_QUERIES.observe(stats.queries, method, route)
+        metrics.REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+        metrics.REQUEST_SERIALIZE_SECONDS.observe(stats.serialize_seconds, method, route)
+        if SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'total;dur={elapsed * 1000:.1f}, db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+                f'serialize;dur={stats.serialize_seconds * 1000:.1f}, '
+                f'calendar;dur={stats.calendar_seconds * 1000:.1f};desc="{stats.calendar_calls} calls"'
+            )
+        if report is not None:
+            profiled = HttpResponse(report, content_type='text/plain; charset=utf-8')
+            profiled['X-Profiled-Status'] = str(response.status_code)
+            profiled['Server-Timing'] = response.get('Server-Timing', '')
+            return profiled
+        return response
+
+    def _respond(self, request):
+        # Returns (response, profile report or None)
+        requested = PROFILE_TOKEN and hmac.compare_digest(request.headers.get(PROFILE_HEADER, ''), PROFILE_TOKEN)
+        sampled = not requested and PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE
+        if not (requested or sampled) or not _profiling.acquire(blocking=False):
+            return self.get_response(request), None
+        try:
+            profiler = _Profiler()
+            with profiler:
+                response = self.get_response(request)
+        finally:
+            _profiling.release()
+        report = profiler.report()
+        if requested:
+            return response, report
+        logger.info('%s %s (%s)\n%s', request.method, request.get_full_path(), response.status_code, report)
+        return response, None
+
+
+class ReplicaRoutingMiddleware:
+    """Lets reads by eventapp's views for GET, HEAD and OPTIONS go to a replica (see routers.py).
+
+    A request that writes sets a short-lived cookie, and that client's reads go to the
+    primary until it expires, so a client sees its own changes before replicas do.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.routing() as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=routers.STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (routers.REPLICAS and request.method in SAFE_METHODS
+                and view_func.__module__.startswith('eventapp.')
+                and routers.PIN_COOKIE not in request.COOKIES):
+            routers.allow_replica_reads()
+
+
+class _Profiler:
+    def __init__(self):
+        self.pyinstrument = PROFILER == 'pyinstrument' and pyinstrument is not None
+        self._profiler = pyinstrument.Profiler() if self.pyinstrument else cProfile.Profile()
+
+    def __enter__(self):
+        if self.pyinstrument:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def __exit__(self, *exc_info):
+        if self.pyinstrument:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def report(self, limit=40):
+        if self.pyinstrument:
+            return self._profiler.output_text(unicode=True)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
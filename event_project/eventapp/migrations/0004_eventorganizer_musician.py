@@ -1,43 +0,0 @@
-# Generated by Django 5.0.2 on 2024-03-04 16:15
-
-from django.db import migrations, models
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('eventapp', '0003_event_google_event_id'),
-    ]
-
-    operations = [
-        migrations.CreateModel(
-            name='EventOrganizer',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('name', models.CharField(max_length=100)),
-                ('email', models.EmailField(max_length=254)),
-                ('age', models.PositiveIntegerField()),
-                ('club_address', models.CharField(max_length=200)),
-                ('city', models.CharField(max_length=100)),
-                ('country', models.CharField(max_length=100)),
-                ('profileline', models.CharField(max_length=200)),
-                ('image_address', models.URLField()),
-            ],
-        ),
-        migrations.CreateModel(
-            name='Musician',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('name', models.CharField(max_length=100)),
-                ('email', models.EmailField(max_length=254)),
-                ('age', models.PositiveIntegerField()),
-                ('musician_category', models.CharField(max_length=100)),
-                ('address', models.CharField(max_length=200)),
-                ('city', models.CharField(max_length=100)),
-                ('country', models.CharField(max_length=100)),
-                ('ratings', models.FloatField()),
-                ('profileline', models.CharField(max_length=200)),
-                ('image_address', models.URLField()),
-            ],
-        ),
-    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0004_alter_event_event_organiser_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarOutbox',
+            fields=[
+                ('outbox_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('google_event_id', models.UUIDField(db_index=True)),
+                ('event_id', models.IntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('insert', 'insert'), ('update', 'update'), ('delete', 'delete')], max_length=10)),
+                ('state', models.CharField(choices=[('pending', 'pending'), ('done', 'done'), ('dead', 'dead')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_on', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'available_on'], name='eventapp_ca_state_50b1a7_idx'), models.Index(fields=['state', 'processed_on'], name='eventapp_ca_state_598c1c_idx')],
+            },
+        ),
+    ]
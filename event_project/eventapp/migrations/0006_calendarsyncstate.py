@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0005_calendaroutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calendar_id', models.CharField(max_length=255, unique=True)),
+                ('next_sync_token', models.CharField(blank=True, max_length=1024)),
+                ('last_synced_on', models.DateTimeField(blank=True, null=True)),
+                ('full_syncs', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='external_google_id',
+            field=models.CharField(blank=True, editable=False, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='calendaroutbox',
+            name='external_google_id',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+    ]
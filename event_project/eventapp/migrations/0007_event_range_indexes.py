@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0006_calendarsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='duration',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('event_end_date'), '-', models.F('event_start_date')), output_field=models.DurationField()),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_start_date', 'event_end_date'], name='eventapp_ev_event_s_d1923a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['duration'], name='eventapp_ev_duratio_d960cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_organiser_email', 'event_start_date'], name='eventapp_ev_event_o_a8fcf9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'event_start_date'], name='eventapp_ev_locatio_4d82c7_idx'),
+        ),
+    ]
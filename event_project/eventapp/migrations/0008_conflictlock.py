@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0007_event_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConflictLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40)),
+                ('value', models.CharField(max_length=254)),
+            ],
+            options={
+                'unique_together': {('scope', 'value')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0008_conflictlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='musicians',
+            field=models.ManyToManyField(blank=True, related_name='events', to='eventapp.musician'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0008_event_musicians'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_organiser',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='eventapp.eventorganizer'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='event_organiser_email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_organiser', 'event_start_date', 'event_name'], name='eventapp_ev_event_o_0b04cb_idx'),
+        ),
+    ]
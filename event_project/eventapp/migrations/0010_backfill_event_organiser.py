@@ -0,0 +1,30 @@
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def link_organisers(apps, schema_editor):
+    # One UPDATE per primary key range, each in its own short transaction, so the
+    # table is never locked by a single statement over every row
+    Event = apps.get_model('eventapp', 'Event')
+    EventOrganizer = apps.get_model('eventapp', 'EventOrganizer')
+    organiser = EventOrganizer.objects.filter(email=OuterRef('event_organiser_email')).values('pk')[:1]
+    last_pk = Event.objects.aggregate(last=Max('pk'))['last'] or 0
+    for low in range(0, last_pk, BATCH_SIZE):
+        with transaction.atomic():
+            Event.objects.filter(
+                pk__gt=low, pk__lte=low + BATCH_SIZE, event_organiser__isnull=True,
+            ).update(event_organiser=Subquery(organiser))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('eventapp', '0009_event_organiser'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_organisers, migrations.RunPython.noop),
+    ]
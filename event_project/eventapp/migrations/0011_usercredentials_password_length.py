@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0010_backfill_event_organiser'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usercredentials',
+            name='password',
+            field=models.CharField(max_length=128),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0011_usercredentials_password_length'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='calendaroutbox',
+            name='eventapp_ca_state_50b1a7_idx',
+        ),
+        migrations.AddField(
+            model_name='calendaroutbox',
+            name='priority',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='calendaroutbox',
+            index=models.Index(fields=['state', 'priority', 'available_on'], name='eventapp_ca_state_3c7a34_idx'),
+        ),
+    ]
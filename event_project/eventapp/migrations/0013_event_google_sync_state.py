@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0012_calendaroutbox_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='google_etag',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='google_sync_fields',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='google_sync_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='calendaroutbox',
+            name='state',
+            field=models.CharField(choices=[('pending', 'pending'), ('done', 'done'), ('skipped', 'skipped'), ('dead', 'dead')], default='pending', max_length=10),
+        ),
+    ]
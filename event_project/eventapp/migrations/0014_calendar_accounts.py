@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0013_event_google_sync_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendaroutbox',
+            name='calendar_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='calendar_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='time_zone',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='calendarsyncstate',
+            name='calendar_id',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.CreateModel(
+            name='CalendarAccount',
+            fields=[
+                ('account_id', models.AutoField(primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('token', models.TextField(blank=True, editable=False)),
+                ('calendar_id', models.CharField(default='primary', max_length=255)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('organiser', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calendar_account', to='eventapp.eventorganizer')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='calendaroutbox',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='eventapp.calendaraccount'),
+        ),
+        migrations.AddField(
+            model_name='calendarsyncstate',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='eventapp.calendaraccount'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='calendar_account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='eventapp.calendaraccount'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='calendarsyncstate',
+            unique_together={('account', 'calendar_id')},
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0014_calendar_accounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('occurrence_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='occurrences_from',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='occurrences_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['occurrences_from'], name='eventapp_ev_occurre_944f40_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['occurrences_until'], name='eventapp_ev_occurre_a9641b_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventoccurrence',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='eventapp.event'),
+        ),
+        migrations.AddIndex(
+            model_name='eventoccurrence',
+            index=models.Index(fields=['start', 'end'], name='eventapp_ev_start_b6d944_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventoccurrence',
+            index=models.Index(fields=['end'], name='eventapp_ev_end_18ca87_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0015_event_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarChannel',
+            fields=[
+                ('channel_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('calendar_id', models.CharField(max_length=255)),
+                ('token', models.CharField(editable=False, max_length=64)),
+                ('resource_id', models.CharField(blank=True, max_length=255)),
+                ('expires_on', models.DateTimeField(db_index=True)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='calendarsyncstate',
+            name='notified_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='calendarsyncstate',
+            index=models.Index(fields=['notified_on'], name='eventapp_ca_notifie_fc3cc1_idx'),
+        ),
+        migrations.AddField(
+            model_name='calendarchannel',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='eventapp.calendaraccount'),
+        ),
+    ]
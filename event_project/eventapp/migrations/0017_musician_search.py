@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+# Neither index type can be declared on the model, so each backend gets its own DDL.
+# SQLite: a contentless FTS5 table whose rowid is search.rank_key(ratings, musician_id),
+# so matches come out best rated first and a page stops early. Triggers keep it current.
+# A later migration that makes Django remake eventapp_musician on SQLite drops these
+# triggers with the old table and has to run SQLITE_FORWARD[1:4] again.
+RANK_KEY = '(CAST(round({row}.ratings * 100) AS INTEGER) << 32) + {row}.musician_id'
+FTS_INSERT = ('INSERT INTO eventapp_musician_fts(rowid, name, profileline) '
+              'VALUES (' + RANK_KEY.format(row='new') + ', new.name, new.profileline); ')
+FTS_DELETE = ("INSERT INTO eventapp_musician_fts(eventapp_musician_fts, rowid, name, profileline) "
+              "VALUES ('delete', " + RANK_KEY.format(row='old') + ', old.name, old.profileline); ')
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE eventapp_musician_fts USING fts5(name, profileline, content='', prefix='2 3')",
+    'CREATE TRIGGER eventapp_musician_fts_insert AFTER INSERT ON eventapp_musician BEGIN ' + FTS_INSERT + 'END',
+    'CREATE TRIGGER eventapp_musician_fts_delete AFTER DELETE ON eventapp_musician BEGIN ' + FTS_DELETE + 'END',
+    'CREATE TRIGGER eventapp_musician_fts_update AFTER UPDATE OF name, profileline, ratings ON eventapp_musician '
+    'BEGIN ' + FTS_DELETE + FTS_INSERT + 'END',
+    # Index the rows that already exist
+    'INSERT INTO eventapp_musician_fts(rowid, name, profileline) SELECT '
+    + RANK_KEY.format(row='eventapp_musician') + ', name, profileline FROM eventapp_musician',
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS eventapp_musician_fts_update',
+    'DROP TRIGGER IF EXISTS eventapp_musician_fts_delete',
+    'DROP TRIGGER IF EXISTS eventapp_musician_fts_insert',
+    'DROP TABLE IF EXISTS eventapp_musician_fts',
+]
+# MySQL: an InnoDB FULLTEXT index, which InnoDB maintains itself
+MYSQL_FORWARD = ['ALTER TABLE eventapp_musician ADD FULLTEXT INDEX eventapp_musician_fulltext (name, profileline)']
+MYSQL_BACKWARD = ['ALTER TABLE eventapp_musician DROP INDEX eventapp_musician_fulltext']
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0016_calendar_channels'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='musician',
+            index=models.Index(fields=['country', 'city', 'ratings'], name='eventapp_mu_country_39ded9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='musician',
+            index=models.Index(fields=['country', 'ratings'], name='eventapp_mu_country_9b533c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='musician',
+            index=models.Index(fields=['ratings'], name='eventapp_mu_ratings_870187_idx'),
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'mysql': MYSQL_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'mysql': MYSQL_BACKWARD}),
+        ),
+    ]
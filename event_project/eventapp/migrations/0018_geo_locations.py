@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding columns makes Django remake eventapp_musician on SQLite, which drops 0017's FTS
+# triggers with the old table; put them back and reindex, both ways round.
+search = import_module('eventapp.migrations.0017_musician_search')
+SQLITE_TRIGGERS = [
+    *search.SQLITE_BACKWARD[:3],
+    *search.SQLITE_FORWARD[1:4],
+    "INSERT INTO eventapp_musician_fts(eventapp_musician_fts) VALUES ('delete-all')",
+    search.SQLITE_FORWARD[4],
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0017_musician_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, search._run({'sqlite': SQLITE_TRIGGERS})),
+        migrations.AddField(
+            model_name='event',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventorganizer',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='eventorganizer',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventorganizer',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='musician',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='musician',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='musician',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='eventapp_ev_geohash_79c3a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventorganizer',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='eventapp_ev_geohash_f48d58_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='musician',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='eventapp_mu_geohash_053dbb_idx'),
+        ),
+        migrations.RunPython(search._run({'sqlite': SQLITE_TRIGGERS}), migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventapp', '0018_geo_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MusicianStats',
+            fields=[
+                ('events_total', models.IntegerField(default=0)),
+                ('upcoming_events', models.IntegerField(default=0)),
+                ('next_event_start', models.DateTimeField(blank=True, null=True)),
+                ('events_per_month', models.JSONField(blank=True, default=dict)),
+                ('updated_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('musician', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='eventapp.musician')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrganizerStats',
+            fields=[
+                ('events_total', models.IntegerField(default=0)),
+                ('upcoming_events', models.IntegerField(default=0)),
+                ('next_event_start', models.DateTimeField(blank=True, null=True)),
+                ('events_per_month', models.JSONField(blank=True, default=dict)),
+                ('updated_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('organiser', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='eventapp.eventorganizer')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# mixins.py
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from . import rendering
+
+FAST_SERIALIZATION = getattr(settings, 'FAST_SERIALIZATION', True)
+
+
+class FieldProjectionMixin:
+    """Lets read requests pick columns with ?fields=a,b,c.
+
+    The selection is pushed down to the query with .only(), so unrequested columns
+    (e.g. large description TextFields) are never fetched from the database.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        if self.request.method != 'GET':
+            return None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if not raw:
+            return None
+        if getattr(self, '_requested_fields', None) is not None:
+            return self._requested_fields
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        available = self.get_serializer_class()().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({self.fields_query_param: f"Unknown fields: {', '.join(unknown)}"})
+        self._requested_fields = requested
+        return requested
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields:
+            # Many-to-many fields aren't columns; they stay on prefetch_related()
+            opts = queryset.model._meta
+            columns = [name for name in fields if not opts.get_field(name).many_to_many]
+            queryset = queryset.only(*columns or [opts.pk.name])
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+
+class FastListMixin:
+    """Builds list responses from .values_list() rows instead of model instances.
+
+    The serializer's output is reproduced by a rendering.RowEncoder compiled for it,
+    and rendered with orjson when it is installed; the bytes are the same as the
+    serializer's. Serializers (or rows) the encoder can't reproduce exactly use the
+    ordinary path, as does everything when settings.FAST_SERIALIZATION is off.
+    """
+    renderer_classes = [rendering.ORJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if not FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        try:
+            encoder = rendering.encoder_for(self.get_serializer())
+            # Keyset paginators read their ordering columns off the last row
+            ordering = getattr(self.paginator, 'ordering', ())
+            ordering = [ordering] if isinstance(ordering, str) else ordering
+            rows = encoder.values(self.filter_queryset(self.get_queryset()),
+                                  extra=[name.lstrip('-') for name in ordering])
+            page = self.paginate_queryset(rows)
+            data = encoder.encode(rows if page is None else page)
+        except rendering.Unsupported:
+            return super().list(request, *args, **kwargs)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
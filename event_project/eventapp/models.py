@@ -1,5 +1,6 @@
 # models.py
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 import uuid
@@ -14,10 +15,58 @@ class Event(models.Model):
     created_on = models.DateTimeField(default=timezone.now) 
     event_start_date = models.DateTimeField()
     event_end_date = models.DateTimeField()
-    event_organiser_email = models.EmailField(unique=True)
+    event_organiser_email = models.EmailField()
     event_organiser_name = models.CharField(max_length=100)
+    # Set from event_organiser_email when the organiser has a profile; many events per organiser
+    event_organiser = models.ForeignKey('EventOrganizer', null=True, blank=True, on_delete=models.SET_NULL, related_name='events')
     google_event_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Google's id for an event created in Google rather than by this app (see calendar_pull);
+    # blank for ours, whose Google id is google_event_id's hex
+    external_google_id = models.CharField(max_length=1024, blank=True, editable=False)
+    # Where the event is written in Google: the account (null for the deployment's own token),
+    # the calendar (blank for the account's default) and the time zone (blank for the default)
+    calendar_account = models.ForeignKey('CalendarAccount', null=True, blank=True, on_delete=models.SET_NULL, related_name='events')
+    calendar_id = models.CharField(max_length=255, blank=True)
+    time_zone = models.CharField(max_length=64, blank=True)
+    # What Google was last sent for this event (see calendar_sync.plan_update), so unchanged
+    # events are skipped and changed ones PATCH only the fields that differ
+    google_sync_hash = models.CharField(max_length=40, blank=True, editable=False)
+    google_sync_fields = models.JSONField(default=dict, blank=True, editable=False)
+    google_etag = models.CharField(max_length=100, blank=True, editable=False)
+    # Musicians booked to play this event
+    musicians = models.ManyToManyField('Musician', blank=True, related_name='events')
+    # Computed by the database on every write, however it's made; the index answers
+    # Max(duration), which bounds how early an event overlapping a range can start
+    duration = models.GeneratedField(expression=F('event_end_date') - F('event_start_date'),
+                                     output_field=models.DurationField(), db_persist=True)
+    # An RRULE body such as FREQ=WEEKLY;BYDAY=FR (see recurrence.py); the dates above are the
+    # first occurrence. recurrence_until is when the last one ends, null if the rule never stops.
+    recurrence = models.CharField(max_length=500, blank=True)
+    recurrence_until = models.DateTimeField(null=True, blank=True, editable=False)
+    # The window EventOccurrence holds this event's occurrences for. Set (empty) as soon as
+    # an event recurs, so series outside a queried window are found through these indexes.
+    occurrences_from = models.DateTimeField(null=True, blank=True, editable=False)
+    occurrences_until = models.DateTimeField(null=True, blank=True, editable=False)
+    # Geocoded from `location` against the offline gazetteer on save (see gazetteer.py);
+    # the geohash leads the index proximity queries scan (see geo.nearby)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     
+    class Meta:
+        indexes = [
+            # Range queries: /events/range/ scans start dates, then checks the end date from the index
+            models.Index(fields=['event_start_date', 'event_end_date']),
+            models.Index(fields=['duration']),
+            models.Index(fields=['event_organiser_email', 'event_start_date']),
+            models.Index(fields=['location', 'event_start_date']),
+            # Organiser dashboards: their events by date, covering event_name so the table isn't read
+            models.Index(fields=['event_organiser', 'event_start_date', 'event_name']),
+            models.Index(fields=['occurrences_from']),
+            models.Index(fields=['occurrences_until']),
+            models.Index(fields=['geohash', 'latitude', 'longitude']),
+        ]
+
     def __str__(self):
         return self.event_name
 
@@ -25,6 +74,19 @@ class Event(models.Model):
         if self.event_start_date > self.event_end_date:
             raise ValidationError('Event end date should be after event start date.')
 
+class EventOccurrence(models.Model):
+    # Materialized occurrences of recurring events near now; see recurrence.materialize()
+    occurrence_id = models.BigAutoField(primary_key=True)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrences')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start', 'end']),
+            models.Index(fields=['end']),
+        ]
+
 class Musician(models.Model):
     musician_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
@@ -38,6 +100,20 @@ class Musician(models.Model):
     ratings = models.DecimalField(max_digits=5, decimal_places=2)
     profileline = models.CharField(max_length=200)
     imageAddress = models.URLField()
+    # Geocoded from city (or address) on save; see Event
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # /musicians/search/: filter by place, read best rated first straight off the index.
+            # Full-text search over (name, profileline) is added by migration 0017.
+            models.Index(fields=['country', 'city', 'ratings']),
+            models.Index(fields=['country', 'ratings']),
+            models.Index(fields=['ratings']),
+            models.Index(fields=['geohash', 'latitude', 'longitude']),
+        ]
 
 class EventOrganizer(models.Model):
     eventorganizer_id = models.AutoField(primary_key=True)
@@ -50,13 +126,42 @@ class EventOrganizer(models.Model):
     country = models.CharField(max_length=100)
     profileline = models.CharField(max_length=200)
     imageaddress = models.URLField()
+    # Geocoded from city (or club_address) on save; see Event
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['geohash', 'latitude', 'longitude']),
+        ]
+
+class EventStats(models.Model):
+    # Event counts kept current by stats.py on every event write, so reading them is one row
+    events_total = models.IntegerField(default=0)
+    upcoming_events = models.IntegerField(default=0)
+    # upcoming_events is exact while this is in the future; stats.current() recounts once it passes
+    next_event_start = models.DateTimeField(null=True, blank=True)
+    # {'2026-10': 3}: events by the UTC month they start in
+    events_per_month = models.JSONField(default=dict, blank=True)
+    updated_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+
+class OrganizerStats(EventStats):
+    organiser = models.OneToOneField(EventOrganizer, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+
+class MusicianStats(EventStats):
+    musician = models.OneToOneField(Musician, primary_key=True, on_delete=models.CASCADE, related_name='stats')
 
 class UserCredentials(models.Model):
     UserCredential_id = models.AutoField(primary_key=True)
     createdon = models.DateTimeField(auto_now_add=True)
     category = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
-    password = models.CharField(max_length=100)
+    # Salted hash (see login.py); rows from before hashing hold plain text until next login
+    password = models.CharField(max_length=128)
 
     def validate_email(self):
         if self.category == 'musician':
@@ -73,3 +178,82 @@ class UserCredentials(models.Model):
                 return False, f"{self.email} is not registered as an event organizer. Please complete registration."
         else:
             return False, "Invalid category specified."
+
+class CalendarAccount(models.Model):
+    # A Google account events can be written to; each one brings its own API quota
+    account_id = models.AutoField(primary_key=True)
+    email = models.EmailField(unique=True)
+    # Events this organiser creates go to this account unless they say otherwise
+    organiser = models.OneToOneField(EventOrganizer, null=True, blank=True, on_delete=models.SET_NULL, related_name='calendar_account')
+    # The OAuth token as JSON, encrypted (see calendar_accounts.py); never leaves the server
+    token = models.TextField(blank=True, editable=False)
+    calendar_id = models.CharField(max_length=255, default='primary')
+    created_on = models.DateTimeField(default=timezone.now)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.email
+
+class CalendarOutbox(models.Model):
+    # Calendar writes waiting to be pushed to Google by `manage.py calendar_sync_worker`
+    ACTION_CHOICES = [('insert', 'insert'), ('update', 'update'), ('delete', 'delete')]
+    # skipped: Google already had the event's current state, so no call was made
+    STATE_CHOICES = [('pending', 'pending'), ('done', 'done'), ('skipped', 'skipped'), ('dead', 'dead')]
+
+    outbox_id = models.BigAutoField(primary_key=True)
+    google_event_id = models.UUIDField(db_index=True)
+    event_id = models.IntegerField(null=True, blank=True)
+    # Copied from the event, since deletes are pushed after the event row is gone
+    external_google_id = models.CharField(max_length=1024, blank=True)
+    account = models.ForeignKey(CalendarAccount, null=True, blank=True, on_delete=models.CASCADE)
+    calendar_id = models.CharField(max_length=255, blank=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # ratelimit.INTERACTIVE (0) for API writes, BACKGROUND (1) for bulk work; lower goes first
+    priority = models.SmallIntegerField(default=0)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(default=timezone.now)
+    available_on = models.DateTimeField(default=timezone.now)
+    processed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'priority', 'available_on']),
+            models.Index(fields=['state', 'processed_on']),
+        ]
+
+class CalendarSyncState(models.Model):
+    # Where the last incremental pull from Google left off, per account and calendar
+    account = models.ForeignKey(CalendarAccount, null=True, blank=True, on_delete=models.CASCADE)
+    calendar_id = models.CharField(max_length=255)
+    next_sync_token = models.CharField(max_length=1024, blank=True)
+    last_synced_on = models.DateTimeField(null=True, blank=True)
+    full_syncs = models.IntegerField(default=0)
+    # When a push notification said the calendar changed; cleared once a pull picks it up
+    notified_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [('account', 'calendar_id')]
+        indexes = [models.Index(fields=['notified_on'])]
+
+class CalendarChannel(models.Model):
+    # A Google push-notification channel watching one calendar (see calendar_watch.py)
+    channel_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    account = models.ForeignKey(CalendarAccount, null=True, blank=True, on_delete=models.CASCADE)
+    calendar_id = models.CharField(max_length=255)
+    # Echoed back in X-Goog-Channel-Token, so a guessed channel id can't trigger pulls
+    token = models.CharField(max_length=64, editable=False)
+    # Google's id for the watched resource; stopping the channel needs it
+    resource_id = models.CharField(max_length=255, blank=True)
+    expires_on = models.DateTimeField(db_index=True)
+    created_on = models.DateTimeField(default=timezone.now)
+
+class ConflictLock(models.Model):
+    # One row per organiser email or location that has been booked (see conflicts.lock).
+    # Event writes lock theirs until commit, so two overlapping bookings can't both pass.
+    scope = models.CharField(max_length=40)
+    value = models.CharField(max_length=254)
+
+    class Meta:
+        unique_together = [('scope', 'value')]
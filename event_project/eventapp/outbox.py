@@ -0,0 +1,180 @@
+# outbox.py
+import asyncio
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .calendar_accounts import calendar_for, get_pool
+from .calendar_sync import BatchSyncEngine, DELETE, INSERT, SYNC_FIELDS, UPDATE, google_id
+from .models import CalendarAccount, CalendarOutbox, Event
+from .ratelimit import INTERACTIVE, get_limiter
+
+MAX_ATTEMPTS = getattr(settings, 'CALENDAR_OUTBOX_MAX_ATTEMPTS', 10)
+BACKOFF_BASE = getattr(settings, 'CALENDAR_OUTBOX_BACKOFF_BASE', 2)  # seconds
+BACKOFF_MAX = getattr(settings, 'CALENDAR_OUTBOX_BACKOFF_MAX', 3600)  # seconds
+# How long a worker owns the rows it claimed before another worker may pick them up
+LEASE_SECONDS = getattr(settings, 'CALENDAR_OUTBOX_LEASE_SECONDS', 120)
+
+
+def enqueue(event, action, priority=INTERACTIVE):
+    # Call inside the transaction that saves/deletes the event so both commit together
+    return CalendarOutbox.objects.create(**_row(event, action, priority))
+
+
+def enqueue_many(events, action, priority=INTERACTIVE):
+    return CalendarOutbox.objects.bulk_create([CalendarOutbox(**_row(event, action, priority)) for event in events])
+
+
+def _row(event, action, priority):
+    return {
+        'google_event_id': event.google_event_id, 'external_google_id': event.external_google_id,
+        'event_id': event.pk, 'action': action, 'priority': priority,
+        'account_id': event.calendar_account_id, 'calendar_id': event.calendar_id,
+    }
+
+
+def claim(limit):
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            CalendarOutbox.objects.select_for_update(skip_locked=True)
+            .filter(state='pending', available_on__lte=now)
+            # Interactive writes jump ahead of bulk work waiting in the queue
+            .order_by('priority', 'available_on', 'outbox_id')[:limit]
+        )
+        CalendarOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+            available_on=now + datetime.timedelta(seconds=LEASE_SECONDS),
+        )
+    return rows
+
+
+def process(rows, service=None):
+    """Push one claimed set of outbox rows to Google; returns (done, failed) counts.
+
+    Rows are coalesced per google_event_id so that repeated writes to the same event
+    become a single call carrying the event's current state. Each account's rows go
+    out through its own pooled service and rate limiter; `service` overrides the one
+    for the deployment's own account.
+    """
+    done = failed = 0
+    for account, calendar_id, group in _targets(rows):
+        engine = BatchSyncEngine(
+            service if account is None and service is not None else get_pool().get_service(account),
+            calendar_id=calendar_id, max_retries=0, limiter=get_limiter(account and account.pk),
+            priority=_priority(group),
+        )
+        for action, key, event in _operations(group):
+            if action == INSERT:
+                engine.insert(event)
+            elif action == UPDATE:
+                engine.update(event)
+            else:
+                engine.delete(key, event.external_google_id)
+        counts = _record(group, engine.flush())
+        done, failed = done + counts[0], failed + counts[1]
+    return done, failed
+
+
+async def process_async(rows, client):
+    """process() for an event loop: the calls go out concurrently through an AsyncCalendarClient.
+
+    The accounts' calls run side by side, sharing the client's connections and
+    concurrency limit but each drawing on its own account's quota.
+    """
+    async def one(account, calendar_id, group):
+        target = client.for_account(
+            client.registry if account is None else get_pool().registry(account), calendar_id,
+            client.limiter if account is None else get_limiter(account.pk),
+        )
+        operations = await sync_to_async(_operations)(group)
+        report = await target.run(operations, priority=_priority(group))
+        return await sync_to_async(_record)(group, report)
+
+    targets = await sync_to_async(_targets)(rows)
+    counts = await asyncio.gather(*(one(*target) for target in targets))
+    return sum(done for done, _ in counts), sum(failed for _, failed in counts)
+
+
+def _targets(rows):
+    # [(account, calendar_id, rows)] per distinct destination calendar
+    accounts = CalendarAccount.objects.in_bulk({row.account_id for row in rows} - {None})
+    groups = {}
+    for row in rows:
+        account = accounts.get(row.account_id)
+        groups.setdefault((row.account_id, calendar_for(account, row.calendar_id)), (account, []))[1].append(row)
+    return [(account, calendar_id, group) for (_, calendar_id), (account, group) in groups.items()]
+
+
+def _priority(rows):
+    return min((row.priority for row in rows), default=INTERACTIVE)
+
+
+def _operations(rows):
+    latest = {}
+    inserted = set()
+    for row in sorted(rows, key=lambda row: row.outbox_id):
+        latest[row.google_event_id] = row
+        if row.action == INSERT:
+            inserted.add(row.google_event_id)
+
+    events = Event.objects.in_bulk([row.event_id for row in latest.values() if row.action != DELETE])
+    operations = []
+    for key, row in latest.items():
+        if row.action == DELETE:
+            # The row stands in for the deleted event: it carries both of its ids
+            operations.append((DELETE, key, row))
+            continue
+        event = events.get(row.event_id)
+        if event is None:
+            # Deleted after this write was queued; its own delete row will follow
+            continue
+        operations.append((INSERT if key in inserted else UPDATE, key, event))
+    return operations
+
+
+def _record(rows, report):
+    # What Google now holds, so the next update can be skipped or sent as a small PATCH
+    Event.objects.bulk_update(report.synced_events, SYNC_FIELDS)
+    now = timezone.now()
+    done, failed = [], []
+    for row in rows:
+        key = google_id(row.google_event_id, row.external_google_id)
+        error = report.failed.get(key)
+        if error is None:
+            row.state, row.processed_on = 'skipped' if key in report.skipped else 'done', now
+            done.append(row)
+        else:
+            row.attempts += 1
+            row.last_error = str(error)[:1000]
+            if row.attempts >= MAX_ATTEMPTS:
+                row.state, row.processed_on = 'dead', now
+            else:
+                delay = min(BACKOFF_BASE * 2 ** (row.attempts - 1), BACKOFF_MAX)
+                row.available_on = now + datetime.timedelta(seconds=delay)
+            failed.append(row)
+    CalendarOutbox.objects.bulk_update(
+        rows, ['state', 'attempts', 'last_error', 'available_on', 'processed_on'],
+    )
+    return len(done), len(failed)
+
+
+def metrics(window=60):
+    now = timezone.now()
+    pending = CalendarOutbox.objects.filter(state='pending')
+    oldest = pending.order_by('created_on').values_list('created_on', flat=True).first()
+    recent = CalendarOutbox.objects.filter(processed_on__gte=now - datetime.timedelta(seconds=window))
+    drained = recent.filter(state__in=['done', 'skipped']).count()
+    skipped = recent.filter(state='skipped').count()
+    return {
+        'queue_depth': pending.count(),
+        'dead_letters': CalendarOutbox.objects.filter(state='dead').count(),
+        'oldest_pending_age_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'drained_last_window': drained,
+        'drain_rate_per_second': drained / window,
+        # Writes that needed no Calendar call because Google already had them
+        'calls_avoided_last_window': skipped,
+        'window_seconds': window,
+    }
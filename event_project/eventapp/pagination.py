@@ -0,0 +1,79 @@
+# pagination.py
+from base64 import b64decode, b64encode
+from decimal import Decimal
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    # Walks the primary key index (WHERE pk < cursor ORDER BY pk DESC LIMIT n), so
+    # every page costs the same no matter how deep into the table it is.
+    ordering = '-pk'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class StartDateCursorPagination(KeysetPagination):
+    # Follows the (event_start_date, event_end_date) index used by range queries
+    ordering = ('event_start_date', 'pk')
+
+
+class RatingCursorPagination(BasePagination):
+    """Best rated first, keyset paged on (ratings, pk) for /musicians/search/.
+
+    The view asks for the cursor and page size before building its queryset, because
+    the search needs them inside its full-text query (see search.musicians) rather
+    than on the outside as CursorPagination would apply them.
+    """
+    page_size = KeysetPagination.page_size
+    page_size_query_param = KeysetPagination.page_size_query_param
+    max_page_size = KeysetPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-ratings', '-pk')  # what search.musicians() orders by
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_position(self, request):
+        """(ratings, pk) of the last row of the previous page, or None on the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            ratings, pk = b64decode(encoded.encode('ascii')).decode('ascii').split(':')
+            ratings, pk = Decimal(ratings), int(pk)
+            if not ratings.is_finite():
+                raise ValueError(ratings)
+            return ratings, pk
+        except (TypeError, ValueError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # `queryset` already starts after the cursor and holds at most one row past a page
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        rows = list(queryset[:self.page_size + 1])
+        self.next_position = None
+        if len(rows) > self.page_size:
+            last = rows[self.page_size - 1]
+            self.next_position = (last.ratings, last.pk)
+        return rows[:self.page_size]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        ratings, pk = self.next_position
+        encoded = b64encode(f'{ratings}:{pk}'.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,34 @@
+# ranges.py
+from django.db.models import DateTimeField, ExpressionWrapper, Subquery
+
+from .models import Event
+
+
+def longest_event():
+    # The longest event bounds how far before `start` an overlapping event can begin.
+    # Event.duration is written by the database, so this holds for every process and
+    # every kind of write; reading it is one seek at the end of its index.
+    return Event.objects.order_by('-duration').values('duration')[:1]
+
+
+def earliest_start(start):
+    """How early an event overlapping `start` can begin, as an expression queries work out themselves."""
+    return ExpressionWrapper(start - Subquery(longest_event()), output_field=DateTimeField())
+
+
+def overlapping_events(start, end, location=None, queryset=None):
+    """Events that overlap [start, end] (touching endpoints count).
+
+    Bounding event_start_date on both sides turns the overlap test into a range
+    scan of the (event_start_date, event_end_date) index instead of half the table.
+    The lower bound is worked out inside the same query.
+    """
+    queryset = Event.objects.all() if queryset is None else queryset
+    queryset = queryset.filter(
+        event_start_date__gte=earliest_start(start),
+        event_start_date__lte=end,
+        event_end_date__gte=start,
+    )
+    if location:
+        queryset = queryset.filter(location=location)
+    return queryset
@@ -0,0 +1,183 @@
+# ratelimit.py
+import asyncio
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+# Calendar calls per second the whole deployment may make; None turns limiting off.
+# Google's default per-user quota is 600 queries per minute.
+RATE = getattr(settings, 'GOOGLE_CALENDAR_RATE_LIMIT', 10)
+MIN_RATE = getattr(settings, 'GOOGLE_CALENDAR_MIN_RATE', 1)
+# Background work (bulk imports, resyncs) never takes more than this share of a window
+BACKGROUND_SHARE = getattr(settings, 'GOOGLE_CALENDAR_BACKGROUND_SHARE', 0.8)
+CACHE_ALIAS = getattr(settings, 'GOOGLE_CALENDAR_RATE_LIMIT_CACHE', 'default')
+
+INTERACTIVE = 0
+BACKGROUND = 1
+THROTTLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+
+
+def is_throttled(exception):
+    resp = getattr(exception, 'resp', None)
+    if resp is None:
+        return False
+    if resp.status == 429:
+        return True
+    details = getattr(exception, 'error_details', None) or []
+    reasons = {detail.get('reason') for detail in details if isinstance(detail, dict)}
+    return resp.status == 403 and bool(reasons & THROTTLE_REASONS)
+
+
+class RateLimiter:
+    """Token bucket shared by every worker through the cache, with an AIMD refill rate.
+
+    Tokens are counted per `window` seconds in a cache counter, so workers in other
+    processes draw from the same bucket when the cache is Redis. Throttled responses
+    cut the rate multiplicatively (once per window however many calls saw them);
+    successes win it back additively, at most up to `max_rate`. Background callers
+    leave room for what interactive writes used in the previous window (but never take
+    more than `background_share`), so interactive writes always find tokens.
+    """
+
+    def __init__(self, name='calendar', rate=RATE, max_rate=None, min_rate=MIN_RATE, increase=None,
+                 decrease=0.9, window=1.0, background_share=BACKGROUND_SHARE, cache=None):
+        self.name = name
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.initial_rate = rate
+        # Win back 2% of the ceiling per second of clean responses by default. With the
+        # gentle 0.9 cut this hovers just under the quota (see simulate_calendar_quota);
+        # faster recovery or deeper cuts make the rate saw up and down
+        self.increase = increase if increase is not None else self.max_rate / 50
+        self.decrease = decrease
+        self.window = window
+        self.background_share = background_share
+        self.cache = cache or caches[CACHE_ALIAS]
+
+    @property
+    def rate(self):
+        rate = self.cache.get(self._key('rate'))
+        return self.initial_rate if rate is None else rate
+
+    def try_acquire(self, count=1, priority=INTERACTIVE):
+        """Take `count` tokens now if the current window has them; otherwise return the wait."""
+        now = time.time()
+        slot = math.floor(now / self.window)
+        capacity = self.rate * self.window
+        if priority != INTERACTIVE:
+            recent = self.cache.get(self._key(f'{slot - 1}:interactive'), 0)
+            capacity -= min(capacity, max(capacity * (1 - self.background_share), recent + 1))
+        if not self._take(self._key(slot), count, capacity):
+            return (slot + 1) * self.window - now
+        if priority == INTERACTIVE:
+            # Background callers size their reserve from this in the next window
+            self._take(self._key(f'{slot}:interactive'), count, float('inf'))
+        return 0.0
+
+    def _take(self, key, count, capacity):
+        self.cache.add(key, 0, timeout=int(self.window * 2) + 1)
+        try:
+            used = self.cache.incr(key, count)
+        except ValueError:
+            # The window's counter expired between add() and incr()
+            return False
+        # A request larger than the window still goes through alone in an empty window
+        if used <= max(capacity, count if used == count else 0):
+            return True
+        self.cache.decr(key, count)
+        return False
+
+    def acquire(self, count=1, priority=INTERACTIVE):
+        waited = 0.0
+        for piece in self._pieces(count):
+            while (wait := self.try_acquire(piece, priority)) > 0:
+                time.sleep(wait)
+                waited += wait
+        return waited
+
+    async def acquire_async(self, count=1, priority=INTERACTIVE):
+        waited = 0.0
+        for piece in self._pieces(count):
+            while (wait := self.try_acquire(piece, priority)) > 0:
+                await asyncio.sleep(wait)
+                waited += wait
+        return waited
+
+    def succeeded(self, count=1):
+        rate = self.rate
+        if rate < self.max_rate:
+            # +increase per second's worth of successful calls at the current rate
+            self.cache.set(self._key('rate'), min(self.max_rate, rate + self.increase * count / rate), None)
+
+    def throttled(self):
+        # Many in-flight calls fail together when the quota runs out; cut only once for them
+        if self.cache.add(self._key('cut'), 1, timeout=max(1, int(self.window))):
+            self.cache.set(self._key('rate'), max(self.min_rate, self.rate * self.decrease), None)
+
+    def record(self, exception, count=1):
+        # Feed the outcome of a Calendar call back into the rate
+        if exception is not None and is_throttled(exception):
+            self.throttled()
+        elif exception is None:
+            self.succeeded(count)
+
+    def record_many(self, exceptions):
+        # One rate update for a whole batch of outcomes
+        if any(exception is not None and is_throttled(exception) for exception in exceptions):
+            self.throttled()
+        succeeded = sum(exception is None for exception in exceptions)
+        if succeeded:
+            self.succeeded(succeeded)
+
+    def reset(self):
+        self.cache.delete(self._key('rate'))
+
+    def _pieces(self, count):
+        # Ask for at most one window's worth at a time, or a large batch would never fit
+        size = max(1, int(self.rate * self.window * min(1.0, self.background_share)))
+        while count > 0:
+            yield min(size, count)
+            count -= size
+
+    def _key(self, part):
+        return f'eventapp:ratelimit:{self.name}:{part}'
+
+
+def execute(request, priority=INTERACTIVE, limiter=None, num_retries=0):
+    """request.execute() after taking a token, reporting the outcome back to the limiter."""
+    limiter = limiter or get_limiter()
+    operation = getattr(request, 'methodId', None) or 'calendar'
+    if limiter is None:
+        with metrics.calendar_call(operation):
+            return request.execute(num_retries=num_retries)
+    limiter.acquire(1, priority)
+    try:
+        with metrics.calendar_call(operation):
+            response = request.execute(num_retries=num_retries)
+    except Exception as e:
+        limiter.record(e)
+        raise
+    limiter.record(None)
+    return response
+
+
+_limiters = {}
+
+
+def get_limiter(account_id=None):
+    """The Calendar limiter for one account, or None when GOOGLE_CALENDAR_RATE_LIMIT is None.
+
+    Google's quota is per user, so every CalendarAccount gets a bucket of its own;
+    account_id None is the deployment's own token.
+    """
+    if not RATE:
+        return None
+    limiter = _limiters.get(account_id)
+    if limiter is None:
+        name = 'calendar' if account_id is None else f'calendar-{account_id}'
+        limiter = _limiters.setdefault(account_id, RateLimiter(name))
+    return limiter
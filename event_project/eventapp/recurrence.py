@@ -0,0 +1,387 @@
+# recurrence.py
+import calendar
+import collections
+import datetime
+import re
+import zoneinfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .calendar_sync import TIME_ZONE
+from .models import Event, EventOccurrence
+from .ranges import earliest_start, overlapping_events
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+BYDAY_PATTERN = re.compile(r'^([+-]?[1-9]\d?)?(MO|TU|WE|TH|FR|SA|SU)$')
+PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'WKST'}
+MAX_COUNT = 1000
+# A rule that matches nothing (BYMONTHDAY=30;BYMONTH=2) is given up on after this many empty
+# periods; enough for a daily rule that only matches on 29 February
+MAX_EMPTY_PERIODS = 5000
+# EventOccurrence holds every recurring event's occurrences in [now - KEEP, now + HORIZON]
+HORIZON_DAYS = getattr(settings, 'RECURRENCE_HORIZON_DAYS', 180)
+KEEP_DAYS = getattr(settings, 'RECURRENCE_KEEP_DAYS', 30)
+
+Occurrence = collections.namedtuple('Occurrence', 'event start end')
+
+
+class Rule:
+    """An RFC 5545 RRULE, limited to FREQ, INTERVAL, COUNT, UNTIL, BYDAY, BYMONTHDAY and BYMONTH.
+
+    Occurrences are generated per period (day, week, month or year) in local wall-clock
+    time, and a generator asked for a window starts at the period containing it rather
+    than at the first occurrence.
+    """
+
+    def __init__(self, text):
+        text = text.strip()
+        if text.upper().startswith('RRULE:'):
+            text = text[len('RRULE:'):]
+        parts = {}
+        for part in filter(None, text.upper().split(';')):
+            name, sep, value = part.partition('=')
+            if not sep or not value:
+                raise ValueError(f"'{part}' should look like NAME=VALUE.")
+            parts[name.strip()] = value.strip()
+        unknown = set(parts) - PARTS
+        if unknown:
+            raise ValueError(f"Unsupported rule part(s): {', '.join(sorted(unknown))}.")
+        if parts.get('FREQ') not in FREQUENCIES:
+            raise ValueError('FREQ should be DAILY, WEEKLY, MONTHLY or YEARLY.')
+        if parts.get('WKST', 'MO') != 'MO':
+            raise ValueError('Only WKST=MO is supported.')
+        self.text = ';'.join(f'{name}={value}' for name, value in parts.items())
+        self.freq = parts['FREQ']
+        self.interval = _number(parts, 'INTERVAL', 1, 1000) or 1
+        self.count = _number(parts, 'COUNT', 1, MAX_COUNT)
+        self.until = _until(parts['UNTIL']) if 'UNTIL' in parts else None
+        if self.count and self.until:
+            raise ValueError("COUNT and UNTIL can't be combined.")
+        self.bymonth = sorted({_number({'BYMONTH': value}, 'BYMONTH', 1, 12) for value in _list(parts, 'BYMONTH')})
+        self.bymonthday = sorted({_number({'BYMONTHDAY': value}, 'BYMONTHDAY', -31, 31)
+                                  for value in _list(parts, 'BYMONTHDAY')})
+        if 0 in self.bymonthday:
+            raise ValueError('BYMONTHDAY should be between 1 and 31 or -31 and -1.')
+        if self.bymonthday and self.freq == 'WEEKLY':
+            raise ValueError("BYMONTHDAY can't be used with FREQ=WEEKLY.")
+        self.byday = []
+        for value in _list(parts, 'BYDAY'):
+            match = BYDAY_PATTERN.match(value)
+            if match is None:
+                raise ValueError(f"'{value}' is not a BYDAY value like FR or -1SA.")
+            ordinal = int(match[1]) if match[1] else None
+            if ordinal is not None and (self.freq not in ('MONTHLY', 'YEARLY') or abs(ordinal) > 5):
+                raise ValueError('BYDAY ordinals (like 1FR) need FREQ=MONTHLY or YEARLY and go up to 5.')
+            if ordinal is not None and self.freq == 'YEARLY' and not self.bymonth:
+                raise ValueError('BYDAY ordinals in a YEARLY rule need BYMONTH.')
+            self.byday.append((ordinal, WEEKDAYS.index(match[2])))
+
+    def __str__(self):
+        return self.text
+
+    def between(self, dtstart, after=None, before=None, until=None):
+        """Lazily yield local naive occurrence starts in [after, before), in order.
+
+        `dtstart` is the first occurrence, in the same local time; `until` is UNTIL
+        converted to it. COUNT is honoured however far ahead `after` skips.
+        """
+        index = emitted = 0
+        if after is not None and after > dtstart:
+            index = max(self._period_index(after, dtstart) - 1, 0)
+            if self.count is not None:
+                emitted = self._emitted_before(index, dtstart)
+                if emitted is None:
+                    # Periods hold different numbers of occurrences; count them from the start
+                    index = emitted = 0
+        empty = 0
+        while True:
+            try:
+                period = self._period_start(index, dtstart)
+            except (OverflowError, ValueError):
+                return
+            if (before is not None and period >= before) or (until is not None and period > until):
+                return
+            candidates = [moment for moment in self._candidates(period, dtstart) if moment >= dtstart]
+            empty = 0 if candidates else empty + 1
+            if empty > MAX_EMPTY_PERIODS:
+                return
+            for moment in candidates:
+                if until is not None and moment > until:
+                    return
+                if self.count is not None and emitted >= self.count:
+                    return
+                emitted += 1
+                if before is not None and moment >= before:
+                    return
+                if after is None or moment >= after:
+                    yield moment
+            index += 1
+
+    def _period_start(self, index, dtstart):
+        # Every occurrence in a period is at or after its start, at dtstart's time of day
+        step = index * self.interval
+        if self.freq == 'DAILY':
+            return dtstart + datetime.timedelta(days=step)
+        if self.freq == 'WEEKLY':
+            return dtstart - datetime.timedelta(days=dtstart.weekday()) + datetime.timedelta(weeks=step)
+        if self.freq == 'MONTHLY':
+            months = dtstart.month - 1 + step
+            return dtstart.replace(year=dtstart.year + months // 12, month=months % 12 + 1, day=1)
+        return dtstart.replace(year=dtstart.year + step, month=1, day=1)
+
+    def _period_index(self, moment, dtstart):
+        if self.freq == 'DAILY':
+            periods = (moment.date() - dtstart.date()).days
+        elif self.freq == 'WEEKLY':
+            periods = (moment.date() - dtstart.date() + datetime.timedelta(days=dtstart.weekday())).days // 7
+        elif self.freq == 'MONTHLY':
+            periods = (moment.year - dtstart.year) * 12 + moment.month - dtstart.month
+        else:
+            periods = moment.year - dtstart.year
+        return periods // self.interval
+
+    def _emitted_before(self, index, dtstart):
+        # Only weekly rules and plain daily ones have the same number of occurrences every period
+        if index == 0:
+            return 0
+        if not (self.freq == 'WEEKLY' and not self.bymonth
+                or self.freq == 'DAILY' and not (self.byday or self.bymonthday or self.bymonth)):
+            return None
+        first = [moment for moment in self._candidates(self._period_start(0, dtstart), dtstart) if moment >= dtstart]
+        return len(first) + (index - 1) * len(self._candidates(self._period_start(1, dtstart), dtstart))
+
+    def _candidates(self, period, dtstart):
+        time = dtstart.time()
+        if self.freq == 'DAILY':
+            days = [period.date()] if self._day_matches(period.date()) else []
+        elif self.freq == 'WEEKLY':
+            weekdays = sorted({weekday for _, weekday in self.byday}) or [dtstart.weekday()]
+            days = [period.date() + datetime.timedelta(days=weekday) for weekday in weekdays]
+            days = [day for day in days if not self.bymonth or day.month in self.bymonth]
+        elif self.freq == 'MONTHLY':
+            days = [] if self.bymonth and period.month not in self.bymonth else \
+                self._month_days(period.year, period.month, dtstart)
+        else:
+            months = self.bymonth or (range(1, 13) if self.byday or self.bymonthday else [dtstart.month])
+            days = [day for month in months for day in self._month_days(period.year, month, dtstart)]
+        return [datetime.datetime.combine(day, time) for day in days]
+
+    def _day_matches(self, day):
+        if self.bymonth and day.month not in self.bymonth:
+            return False
+        if self.byday and day.weekday() not in {weekday for _, weekday in self.byday}:
+            return False
+        if self.bymonthday:
+            length = calendar.monthrange(day.year, day.month)[1]
+            return day.day in {value if value > 0 else length + value + 1 for value in self.bymonthday}
+        return True
+
+    def _month_days(self, year, month, dtstart):
+        length = calendar.monthrange(year, month)[1]
+        days = None
+        if self.bymonthday:
+            days = {value if value > 0 else length + value + 1 for value in self.bymonthday}
+        elif not self.byday:
+            days = {dtstart.day}
+        if self.byday:
+            matched = set()
+            for ordinal, weekday in self.byday:
+                first = (weekday - calendar.weekday(year, month, 1)) % 7 + 1
+                weekdays = list(range(first, length + 1, 7))
+                if ordinal is None:
+                    matched.update(weekdays)
+                elif abs(ordinal) <= len(weekdays):
+                    matched.add(weekdays[ordinal - 1 if ordinal > 0 else ordinal])
+            days = matched if days is None else days & matched
+        return [datetime.date(year, month, day) for day in sorted(days) if 1 <= day <= length]
+
+
+def _number(parts, name, low, high):
+    if name not in parts:
+        return None
+    try:
+        value = int(parts[name])
+    except ValueError:
+        raise ValueError(f'{name} should be a number.')
+    if not low <= value <= high:
+        raise ValueError(f'{name} should be between {low} and {high}.')
+    return value
+
+
+def _list(parts, name):
+    return [value.strip() for value in parts.get(name, '').split(',') if value.strip()]
+
+
+def _until(value):
+    # Date-only UNTIL includes that whole local day; a trailing Z means UTC, otherwise local time
+    try:
+        if len(value) == 8:
+            return datetime.datetime.strptime(value, '%Y%m%d').replace(hour=23, minute=59, second=59)
+        parsed = datetime.datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    except ValueError:
+        raise ValueError('UNTIL should look like 20251231 or 20251231T235959Z.')
+    return parsed.replace(tzinfo=datetime.timezone.utc) if value.endswith('Z') else parsed
+
+
+def parse(text):
+    """The canonical text of a recurrence rule; raises ValueError for rules this app can't expand."""
+    return str(Rule(text)) if text else ''
+
+
+def expand(rule, first_start, first_end, time_zone='', start=None, end=None):
+    """Lazily yield (start, end) of the occurrences overlapping [start, end] (touching counts).
+
+    Occurrences keep the first one's local time of day across DST changes, and its length.
+    """
+    rule = rule if isinstance(rule, Rule) else Rule(rule)
+    zone = zoneinfo.ZoneInfo(time_zone or TIME_ZONE)
+    duration = first_end - first_start
+
+    def local(moment):
+        return moment.astimezone(zone).replace(tzinfo=None)
+
+    until = rule.until
+    if until is not None and until.tzinfo is not None:
+        until = local(until)
+    # A day's slack either side covers DST shifts; the exact overlap test is below
+    slack = datetime.timedelta(days=1)
+    after = local(start - duration - slack) if start is not None else None
+    before = local(end + slack) if end is not None else None
+    for moment in rule.between(local(first_start), after, before, until):
+        occurrence_start = moment.replace(tzinfo=zone).astimezone(datetime.timezone.utc)
+        occurrence_end = occurrence_start + duration
+        if end is not None and occurrence_start > end:
+            return
+        if start is None or occurrence_end >= start:
+            yield occurrence_start, occurrence_end
+
+
+def occurrences(event, start=None, end=None):
+    if not event.recurrence:
+        if (start is None or event.event_end_date >= start) and (end is None or event.event_start_date <= end):
+            yield event.event_start_date, event.event_end_date
+        return
+    yield from expand(event.recurrence, event.event_start_date, event.event_end_date, event.time_zone, start, end)
+
+
+def series_end(rule, first_start, first_end, time_zone=''):
+    """When the last occurrence ends, or None for a rule that never stops."""
+    rule = rule if isinstance(rule, Rule) else Rule(rule)
+    if rule.count is None and rule.until is None:
+        return None
+    last_end = first_end
+    for _, last_end in expand(rule, first_start, first_end, time_zone):
+        pass
+    return last_end
+
+
+def unmaterialized(first_start):
+    # The empty window a recurring event gets until materialize() fills it in
+    return {'occurrences_from': first_start, 'occurrences_until': first_start}
+
+
+def hot_window(now=None):
+    now = now or timezone.now()
+    return now - datetime.timedelta(days=KEEP_DAYS), now + datetime.timedelta(days=HORIZON_DAYS)
+
+
+def materialize(event, window=None):
+    """Rebuild one event's EventOccurrence rows for the hot window; none unless it recurs."""
+    start, end = window or hot_window()
+    EventOccurrence.objects.filter(event_id=event.pk).delete()
+    if not event.recurrence:
+        Event.objects.filter(pk=event.pk).update(occurrences_from=None, occurrences_until=None)
+        event.occurrences_from = event.occurrences_until = None
+        return 0
+    rows = [EventOccurrence(event_id=event.pk, start=s, end=e) for s, e in occurrences(event, start, end)]
+    EventOccurrence.objects.bulk_create(rows, batch_size=1000)
+    Event.objects.filter(pk=event.pk).update(occurrences_from=start, occurrences_until=end)
+    event.occurrences_from, event.occurrences_until = start, end
+    return len(rows)
+
+
+def roll_forward(window=None, chunk_size=500):
+    """Move the materialized window of every recurring event to `window`; returns (added, dropped).
+
+    Only the occurrences past each event's old horizon are generated, and rows that
+    ended before the new window are deleted in one statement.
+    """
+    start, end = window or hot_window()
+    dropped = EventOccurrence.objects.filter(end__lt=start).delete()[0]
+    added = 0
+    rolled = []
+    series = Event.objects.exclude(recurrence='').filter(Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start))
+    for event in series.iterator(chunk_size=chunk_size):
+        if (event.occurrences_until is None or event.occurrences_until < start
+                or event.occurrences_from > start or event.occurrences_until > end):
+            # New, or too far from the new window to extend
+            added += materialize(event, (start, end))
+            continue
+        rows = [EventOccurrence(event_id=event.pk, start=s, end=e)
+                for s, e in occurrences(event, event.occurrences_until, end) if s > event.occurrences_until]
+        EventOccurrence.objects.bulk_create(rows, batch_size=1000)
+        added += len(rows)
+        rolled.append(event.pk)
+    for offset in range(0, len(rolled), chunk_size):
+        Event.objects.filter(pk__in=rolled[offset:offset + chunk_size]).update(
+            occurrences_from=start, occurrences_until=end)
+    # Finished series have nothing in the new window, which their (empty) rows now say
+    Event.objects.exclude(recurrence='').filter(recurrence_until__lt=start).update(
+        occurrences_from=start, occurrences_until=end)
+    return added, dropped
+
+
+def occurrences_between(start, end, location=None, events=None):
+    """An Occurrence for every occurrence overlapping [start, end], sorted by start.
+
+    One-off events come from the range index, recurring ones from recurring_between().
+    `events` limits which events are looked at (say, one organiser's).
+    """
+    events = Event.objects.all() if events is None else events
+    if location:
+        events = events.filter(location=location)
+    found = [Occurrence(event, event.event_start_date, event.event_end_date)
+             for event in overlapping_events(start, end, queryset=events).filter(recurrence='')]
+    found += recurring_between(start, end, events=events)
+    found.sort(key=lambda occurrence: (occurrence.start, occurrence.event.pk))
+    return found
+
+
+def recurring_between(start, end, location=None, events=None):
+    """An Occurrence for every occurrence of a recurring event overlapping [start, end].
+
+    They come from EventOccurrence when the window lies inside the event's materialized
+    range, and are otherwise expanded from its rule straight from the window, so the
+    cost follows the occurrences returned rather than the rules or how far they run.
+    """
+    filtered = events is not None
+    events = Event.objects.all() if events is None else events
+    if location:
+        events, filtered = events.filter(location=location), True
+    covered = Q(event__occurrences_from__lte=start, event__occurrences_until__gte=end)
+    rows = EventOccurrence.objects.filter(
+        covered, start__gte=earliest_start(start), start__lte=end, end__gte=start,
+    )
+    if filtered:
+        rows = rows.filter(event__in=events.values('pk'))
+    rows = list(rows.values_list('event_id', 'start', 'end'))
+    # Each series is loaded once, however many of its occurrences fall in the window
+    loaded = Event.objects.in_bulk({event_id for event_id, _, _ in rows})
+    found = [Occurrence(loaded[event_id], s, e) for event_id, s, e in rows]
+
+    series = (events.filter(Q(occurrences_until__lt=end) | Q(occurrences_from__gt=start), recurrence__gt='')
+              .filter(event_start_date__lte=end)
+              .filter(Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start)))
+    for event in series:
+        found += [Occurrence(event, s, e) for s, e in occurrences(event, start, end)]
+    return found
+
+
+def on_event_saved(event):
+    # Only events that recur, or did until this save, have rows to rebuild
+    if event.recurrence or event.occurrences_until is not None:
+        transaction.on_commit(lambda: materialize(event))
@@ -0,0 +1,186 @@
+# rendering.py
+import decimal
+import math
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; ORJSONRenderer then renders like JSONRenderer
+    orjson = None
+
+# Python's json writes floats outside this range with an exponent (1e-05, 1e+16), orjson without
+FLOAT_PLAIN_RANGE = (1e-4, 1e16)
+
+
+class Unsupported(Exception):
+    """The serializer or a row can't take the fast path; use the serializer instead."""
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer's exact bytes, from orjson when the data allows it.
+
+    orjson writes compact, unescaped UTF-8 just like JSONRenderer's defaults for str,
+    int, bool, None, lists and dicts. Everything else it might write differently
+    (datetimes, Decimals, indented output) goes through JSONRenderer. Floats must
+    already be inside FLOAT_PLAIN_RANGE, as RowEncoder checks for its rows.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:  # orjson.JSONEncodeError included
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, escape the two line terminators JavaScript doesn't allow in strings
+        return rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class RowEncoder:
+    """Turns .values_list() rows into what a ModelSerializer would return for the instances.
+
+    Compiled once per serializer class and field selection (see encoder_for): columns
+    whose serializer field returns database values unchanged (strings, integers,
+    foreign key ids) are copied as they are. Datetimes, Decimals, UUIDs and floats get
+    a converter (see _converter) with the same output as the field's to_representation()
+    and any other field uses to_representation() itself. Many-to-many ids come from one
+    query on the through table per page.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.names = []  # output keys, in the serializer's order
+        self.columns = []  # .values_list() columns, one per non-many-to-many key
+        self.converted = []  # (key, serializer field) for columns that aren't copied as they are
+        self.many = []  # (key, through model, this side's column, other side's column)
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if len(field.source_attrs) != 1:
+                raise Unsupported(f'{field.field_name} has source {field.source!r}')
+            source = field.source_attrs[0]
+            self.names.append(field.field_name)
+            if isinstance(field, serializers.ManyRelatedField):
+                if type(field.child_relation) is not serializers.PrimaryKeyRelatedField:
+                    raise Unsupported(f'{field.field_name} is a {type(field.child_relation).__name__}')
+                relation = model._meta.get_field(source)
+                self.many.append((field.field_name, relation.remote_field.through,
+                                  relation.m2m_field_name(), relation.m2m_reverse_field_name()))
+                continue
+            if isinstance(field, (serializers.Serializer, serializers.SerializerMethodField,
+                                  serializers.HiddenField, serializers.RelatedField)) and not (
+                    type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None):
+                raise Unsupported(f'{field.field_name} is a {type(field).__name__}')
+            self.columns.append(source)
+            if type(field) in (serializers.CharField, serializers.EmailField, serializers.URLField,
+                               serializers.IntegerField, serializers.PrimaryKeyRelatedField):
+                continue
+            self.converted.append((field.field_name, field))
+        # zip() fills keys in column order, so many-to-many keys that aren't last need a reorder
+        plain = [name for name in self.names if name not in {key for key, *_ in self.many}]
+        self.reorder = self.names[:len(plain)] != plain
+
+    def values(self, queryset, extra=()):
+        """`queryset` as named rows of the encoder's columns, plus `pk` and any `extra` columns.
+
+        Paginators read their ordering columns off the rows by name, so pass those as `extra`.
+        """
+        columns = list(self.columns)
+        columns += [name for name in ('pk', *extra) if name not in columns]
+        return queryset.prefetch_related(None).values_list(*columns, named=True)
+
+    def encode(self, rows):
+        """The serializer's output for `rows` from values(): a list of dicts."""
+        with metrics.serializing():
+            many = {key: self._many(rows, through, this, other) for key, through, this, other in self.many}
+            # Per page, since the current time zone can change between requests
+            converters = [(name, _converter(field)) for name, field in self.converted]
+            names, encoded = self.names, []
+            for row in rows:
+                item = dict(zip(names, row))
+                for name, convert in converters:
+                    value = item[name]
+                    if value is not None:
+                        item[name] = convert(value)
+                if many:
+                    for name, ids in many.items():
+                        item[name] = ids.get(row.pk, [])
+                    if self.reorder:
+                        item = {name: item[name] for name in names}
+                encoded.append(item)
+            return encoded
+
+    def _many(self, rows, through, this, other):
+        # {pk: [related ids]}. prefetch_related() doesn't order the relation, so the database
+        # reads it off the through table's unique (this, other) index: by related id.
+        ids = {}
+        for pk, related in (through.objects.filter(**{f'{this}__in': [row.pk for row in rows]})
+                            .order_by(this, other).values_list(this, other)):
+            ids.setdefault(pk, []).append(related)
+        return ids
+
+
+def _converter(field):
+    # A function returning field.to_representation(value) for non-null database values, faster
+    kind = type(field)
+    if kind is serializers.FloatField:
+        return _plain_float
+    if kind is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return str
+    if kind is serializers.DateTimeField:
+        return _datetime_converter(field)
+    if (kind is serializers.DecimalField and field.decimal_places is not None and not field.normalize_output
+            and not field.localize and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)):
+        return _decimal_converter(field)
+    return field.to_representation
+
+
+def _datetime_converter(field):
+    # DateTimeField.to_representation() looks the time zone up for every value; do it once
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.utcoffset() is None:
+            return field.to_representation(value)
+        text = value.astimezone(zone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def _decimal_converter(field):
+    # Database Decimals already have the field's decimal places, so quantizing changes nothing
+    exponent = -field.decimal_places
+
+    def convert(value):
+        if isinstance(value, decimal.Decimal) and value.as_tuple().exponent == exponent:
+            return f'{value:f}'
+        return field.to_representation(value)
+    return convert
+
+
+def _plain_float(value):
+    # NaN, infinities and exponent notation would render differently; see ORJSONRenderer
+    if value and not (math.isfinite(value) and FLOAT_PLAIN_RANGE[0] <= abs(value) < FLOAT_PLAIN_RANGE[1]):
+        raise Unsupported(f'{value!r} would render differently')
+    return value
+
+
+_encoders = {}
+
+
+def encoder_for(serializer):
+    """The RowEncoder for a serializer instance's class and fields, compiled on first use."""
+    key = (type(serializer), tuple(serializer.fields))
+    encoder = _encoders.get(key)
+    if encoder is None:
+        encoder = _encoders[key] = RowEncoder(serializer)
+    return encoder
@@ -0,0 +1,109 @@
+# routers.py
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Aliases in DATABASES holding read-only copies of the primary (see settings.py)
+REPLICAS = getattr(settings, 'DATABASE_REPLICAS', [])
+# After a write, that client's reads and reads of the written models stay on the primary
+# this long; keep it above the replicas' usual lag
+STICKY_SECONDS = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+# A replica that can't be reached is left out this long before being tried again
+RETRY_SECONDS = getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+PIN_COOKIE = 'eventapp_primary'
+
+logger = logging.getLogger('eventapp.db')
+
+
+class RequestRouting:
+    def __init__(self):
+        self.replicas = False  # may this request read from a replica at all
+        self.wrote = False
+        self.alias = None  # the replica chosen on the first read
+
+
+_current = contextvars.ContextVar('eventapp_request_routing', default=None)
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def routing():
+    """Route one request's queries; reads stay on the primary until allow_replica_reads()."""
+    state = RequestRouting()
+    token = _current.set(state)
+    try:
+        yield state
+    finally:
+        _current.reset(token)
+
+
+def allow_replica_reads():
+    state = _current.get()
+    if state is not None:
+        state.replicas = True
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary."""
+    state = _current.get()
+    if state is not None:
+        state.replicas = False
+
+
+class ReplicaRouter:
+    """Sends reads to a replica when the request allows it, and everything else to the primary.
+
+    A request reads from one replica throughout, so its queries see one point in time.
+    Once it writes, or inside a transaction on the primary, it reads from the primary so
+    it sees its own changes. Outside requests (workers, management commands) nothing is
+    routed to a replica. Replicas get their schema by replication, so only the primary
+    is migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if (state is None or not state.replicas or state.wrote
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            state.alias = _choose_replica()
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _choose_replica():
+    now = time.monotonic()
+    candidates = [alias for alias in REPLICAS if _down_until.get(alias, 0) <= now]
+    random.shuffle(candidates)
+    for alias in candidates:
+        connection = connections[alias]
+        try:
+            # A persistent connection is checked once per request (CONN_HEALTH_CHECKS)
+            connection.close_if_health_check_failed()
+            connection.ensure_connection()
+            return alias
+        except DatabaseError:
+            logger.warning('Replica %s unavailable; reading from the primary for %ss', alias, RETRY_SECONDS,
+                           exc_info=True)
+            with _down_lock:
+                _down_until[alias] = now + RETRY_SECONDS
+    return DEFAULT_DB_ALIAS
@@ -0,0 +1,97 @@
+# search.py
+import math
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Musician
+
+# SQLite's FTS5 table over (name, profileline); see migration 0017. Its rowid is the rank
+# key below rather than the musician id, so matches come out best rated first.
+FTS_TABLE = 'eventapp_musician_fts'
+ID_BITS = 32
+# Words of ?q= used; the rest are ignored rather than making the match ever slower
+MAX_TERMS = 8
+
+
+def terms(text):
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def parse_rating(value):
+    """A ?min_rating= value as a Decimal; ValueError if it isn't a number."""
+    try:
+        rating = Decimal(value)
+    except InvalidOperation:
+        raise ValueError('Expected a number such as 4.5.') from None
+    if not rating.is_finite():
+        raise ValueError('Expected a number such as 4.5.')
+    return rating
+
+
+def rank_key(ratings, pk):
+    """(ratings, pk) as one integer in the same order; the FTS rowid (see migration 0017)."""
+    return (int(ratings * 100) << ID_BITS) + pk
+
+
+def musicians(text='', country=None, city=None, min_rating=None, after=None, limit=None):
+    """Musicians matching the filters, best rated first, from just after `after` on.
+
+    `after` is the (ratings, pk) of the last musician already sent. Without ?q= the
+    (country, city, ratings), (country, ratings) and (ratings) indexes hand rows over
+    in order, so a page stops after `limit` rows instead of sorting every match.
+    Words of `text` must all appear in the name or profileline; the last may be the
+    start of a word. SQLite walks its rank-keyed FTS table best first and stops at
+    `limit` too; MySQL's FULLTEXT index can only hand over every match to be sorted.
+    """
+    queryset = Musician.objects.all()
+    if country:
+        queryset = queryset.filter(country=country)
+    if city:
+        queryset = queryset.filter(city=city)
+    if min_rating is not None:
+        queryset = queryset.filter(ratings__gte=min_rating)
+    if after is not None:
+        ratings, pk = after
+        queryset = queryset.filter(Q(ratings__lt=ratings) | Q(ratings=ratings, pk__lt=pk))
+    words = terms(text)
+    if words:
+        vendor = connections[queryset.db].vendor
+        if vendor == 'mysql':
+            against = ' '.join(f'+{word}' for word in words) + '*'
+            relevance = RawSQL('MATCH (name, profileline) AGAINST (%s IN BOOLEAN MODE)', [against],
+                               output_field=FloatField())
+            queryset = queryset.alias(relevance=relevance).filter(relevance__gt=0)
+        elif vendor == 'sqlite':
+            queryset = queryset.filter(pk__in=_ranked_matches(words, country, city, min_rating, after, limit))
+        else:
+            for word in words:
+                queryset = queryset.filter(Q(name__icontains=word) | Q(profileline__icontains=word))
+    queryset = queryset.order_by('-ratings', '-pk')
+    return queryset[:limit] if limit is not None else queryset
+
+
+def _ranked_matches(words, country, city, min_rating, after, limit):
+    # The same filters again inside, so LIMIT counts only rows the page can use
+    match = ' '.join(f'"{word}"' for word in words) + '*'
+    sql = (f'SELECT m.musician_id FROM {FTS_TABLE} f JOIN eventapp_musician m '
+           f'ON m.musician_id = (f.rowid & {(1 << ID_BITS) - 1}) WHERE f.{FTS_TABLE} MATCH %s')
+    params = [match]
+    if min_rating is not None:
+        sql += ' AND f.rowid >= %s'
+        params.append(math.ceil(min_rating * 100) << ID_BITS)
+    if after is not None:
+        sql += ' AND f.rowid < %s'
+        params.append(rank_key(*after))
+    for column, value in (('country', country), ('city', city)):
+        if value:
+            sql += f' AND m.{column} = %s'
+            params.append(value)
+    sql += ' ORDER BY f.rowid DESC'
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    return RawSQL(sql, params)
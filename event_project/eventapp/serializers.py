@@ -1,28 +1,160 @@
 # serializers.py
+import zoneinfo
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from rest_framework import serializers
-from .models import Event, Musician, EventOrganizer , UserCredentials
+from .models import CalendarAccount, Event, Musician, EventOrganizer , UserCredentials, OrganizerStats, MusicianStats
+from . import metrics, recurrence
+from .conflicts import detector, locked_conflicts, spans
+
+class TimedSerializerMixin:
+    # Counted as serialize time in /metrics and the Server-Timing header
+    def to_representation(self, instance):
+        with metrics.serializing():
+            return super().to_representation(instance)
+
+class DynamicFieldsModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Takes an optional `fields` argument limiting which fields are serialized
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Event
-        fields = '__all__'
+        # Range query, Calendar sync, occurrence and geo index bookkeeping stays internal
+        exclude = ['duration', 'google_sync_hash', 'google_sync_fields', 'google_etag', 'occurrences_from',
+                   'occurrences_until', 'geohash']
+        # Follows event_organiser_email; see validate()
+        read_only_fields = ['event_organiser']
+
+    def validate(self, attrs):
+        def current(name):
+            return attrs.get(name, getattr(self.instance, name, None))
+
+        start, end = current('event_start_date'), current('event_end_date')
+        if start and end:
+            if start > end:
+                raise serializers.ValidationError('Event end date should be after event start date.')
+            found = detector.conflicts(
+                start, end, exclude=getattr(self.instance, 'pk', None),
+                **{scope: current(scope) for scope in detector.scopes},
+            )
+            if found:
+                raise overlap_error(found)
+        if {'recurrence', 'event_start_date', 'event_end_date', 'time_zone'} & attrs.keys():
+            rule = current('recurrence')
+            attrs['recurrence_until'] = (recurrence.series_end(rule, start, end, current('time_zone') or '')
+                                         if rule and start and end else None)
+            if rule and start:
+                attrs.update(recurrence.unmaterialized(start))
+        if 'event_organiser_email' in attrs:
+            attrs['event_organiser'] = self.get_organiser(attrs['event_organiser_email'])
+        if self.instance is None:
+            if 'calendar_account' not in attrs and attrs.get('event_organiser') is not None:
+                attrs['calendar_account'] = account_of(attrs['event_organiser'])
+        else:
+            # Moving an event between calendars would leave the old copy behind in Google
+            moved = [field for field in ('calendar_account', 'calendar_id')
+                     if field in attrs and attrs[field] != getattr(self.instance, field)]
+            if moved:
+                raise serializers.ValidationError({field: "Can't be changed once the event exists." for field in moved})
+        return attrs
+
+    def validate_recurrence(self, value):
+        try:
+            return recurrence.parse(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_time_zone(self, value):
+        if value:
+            try:
+                zoneinfo.ZoneInfo(value)
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+                raise serializers.ValidationError(f"'{value}' is not an IANA time zone name.")
+        return value
+
+    def get_organiser(self, email):
+        # Bulk callers pass {email: organiser} in the context to avoid a query per row
+        organisers = self.context.get('organisers')
+        if organisers is not None:
+            return organisers.get(email)
+        return EventOrganizer.objects.select_related('calendar_account').filter(email=email).first()
+
+    def save(self, **kwargs):
+        # validate() only asked this process's detector. Recheck with the organiser and
+        # location locked, so two requests booking the same slot can't both be saved.
+        with transaction.atomic(savepoint=False):
+            def current(name):
+                return kwargs.get(name, self.validated_data.get(name, getattr(self.instance, name, None)))
+
+            # Every occurrence of a recurring event, where the detector only knows the first
+            occurrences = spans(current('event_start_date'), current('event_end_date'),
+                                current('recurrence') or '', current('time_zone') or '')
+            found = locked_conflicts(occurrences, exclude=getattr(self.instance, 'pk', None),
+                                     **{scope: current(scope) for scope in detector.scopes})
+            if found:
+                raise overlap_error(found)
+            return super().save(**kwargs)
+
 
-class EventNameSerializer(serializers.ModelSerializer):
+def overlap_error(found):
+    return serializers.ValidationError({
+        scope: [f"Overlaps existing event(s) {', '.join(map(str, ids))}."] for scope, ids in found.items()
+    })
+
+
+def account_of(organiser):
+    try:
+        return organiser.calendar_account
+    except CalendarAccount.DoesNotExist:
+        return None
+
+class EventOccurrenceSerializer(TimedSerializerMixin, serializers.Serializer):
+    # A recurrence.Occurrence: one instance of an event, recurring or not
+    event_id = serializers.IntegerField(source='event.pk')
+    event_name = serializers.CharField(source='event.event_name')
+    location = serializers.CharField(source='event.location')
+    recurrence = serializers.CharField(source='event.recurrence')
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+class EventNameSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = ['event_name']
 
-class MusicianSerializer(serializers.ModelSerializer):
+class MusicianSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Musician
-        fields = '__all__'
+        exclude = ['geohash']
 
-class EventOrganizerSerializer(serializers.ModelSerializer):
+class EventOrganizerSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = EventOrganizer
+        exclude = ['geohash']
+
+class OrganizerStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OrganizerStats
+        fields = '__all__'
+
+class MusicianStatsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = MusicianStats
         fields = '__all__'
 
-class UserCredentialsSerializer(serializers.ModelSerializer):
+class UserCredentialsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserCredentials
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__'
+        extra_kwargs = {'password': {'write_only': True}}
+
+    def validate_password(self, value):
+        # Stored salted and hashed with the first of settings.PASSWORD_HASHERS
+        return make_password(value) 
\ No newline at end of file
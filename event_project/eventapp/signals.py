@@ -0,0 +1,79 @@
+# signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, conflicts, gazetteer, login, recurrence, stats
+from .calendar_accounts import get_pool
+from .models import CalendarAccount, Event, EventOrganizer, Musician
+
+
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=Musician)
+@receiver(pre_save, sender=EventOrganizer)
+def geocode(sender, instance, update_fields=None, **kwargs):
+    # Full saves only: partial ones are bookkeeping that never touches the place fields.
+    # bulk_create/bulk_update skip this; call gazetteer.locate() on those rows first.
+    if update_fields is None:
+        gazetteer.locate(instance)
+
+
+@receiver(pre_save, sender=Event)
+def event_saving(sender, instance, update_fields=None, **kwargs):
+    stats.on_event_saving(instance, update_fields)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created=False, **kwargs):
+    conflicts.on_event_saved(instance)
+    recurrence.on_event_saved(instance)
+    stats.on_event_saved(instance, created)
+    caching.invalidate(Event)
+
+
+@receiver(pre_delete, sender=Event)
+def event_deleting(sender, instance, origin=None, **kwargs):
+    stats.on_event_deleting(instance, origin)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    conflicts.on_event_deleted(instance.pk)
+    stats.on_event_deleted(instance)
+    caching.invalidate(Event)
+
+
+@receiver(m2m_changed, sender=Event.musicians.through)
+def event_musicians_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    stats.on_musicians_changed(instance, action, reverse, pk_set)
+    caching.invalidate(Event)
+
+
+@receiver(post_save, sender=Musician)
+@receiver(post_delete, sender=Musician)
+def musician_changed(sender, instance, **kwargs):
+    login.forget_profile('musician', instance.email)
+    caching.invalidate(Musician)
+
+
+@receiver(post_save, sender=EventOrganizer)
+@receiver(post_delete, sender=EventOrganizer)
+def event_organizer_changed(sender, instance, **kwargs):
+    login.forget_profile('event organizer', instance.email)
+    caching.invalidate(EventOrganizer)
+
+
+def events_bulk_saved(created, updated=()):
+    # bulk_create/bulk_update don't send post_save; call this inside the same transaction.
+    # stats.remember() the updated events before changing them.
+    for event in [*created, *updated]:
+        conflicts.on_event_saved(event)
+        recurrence.on_event_saved(event)
+    stats.events_bulk_saved(created, updated)
+    caching.invalidate(Event)
+
+
+@receiver(post_save, sender=CalendarAccount)
+@receiver(post_delete, sender=CalendarAccount)
+def calendar_account_changed(sender, instance, **kwargs):
+    # Its pooled service may hold a token that was just replaced or revoked
+    get_pool().discard(instance.pk)
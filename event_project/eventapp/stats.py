@@ -0,0 +1,286 @@
+# stats.py
+import contextlib
+import contextvars
+import datetime
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Min, QuerySet
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Event, EventOrganizer, Musician, MusicianStats, OrganizerStats
+
+# Months are counted in UTC so every process, and reconcile_stats, agrees on them
+MONTH_ZONE = datetime.timezone.utc
+FIELDS = ['events_total', 'upcoming_events', 'next_event_start', 'events_per_month', 'updated_on']
+START_FIELD = Event._meta.get_field('event_start_date')
+# What the summaries held for an event before it changed, and who played an event being deleted
+STORED = '_stats_stored'
+PLAYED = '_stats_played'
+
+
+class Summary:
+    """One kind of summary row: whose events it counts and where their start dates are."""
+
+    def __init__(self, model, owners, source, owner, start):
+        self.model = model
+        self.owners = owners  # the organisers or musicians
+        self.source = source  # one row per (owner, event)
+        self.owner = owner  # the owner's id on source
+        self.start = start  # the event's start on source
+
+
+ORGANISERS = Summary(OrganizerStats, EventOrganizer.objects.all(), Event.objects.all(),
+                     'event_organiser_id', 'event_start_date')
+MUSICIANS = Summary(MusicianStats, Musician.objects.all(), Event.musicians.through.objects.all(),
+                    'musician_id', 'event__event_start_date')
+
+
+class Pending:
+    def __init__(self):
+        self.changes = {ORGANISERS: defaultdict(list), MUSICIANS: defaultdict(list)}
+        self.played = {}  # id(queryset being deleted): (queryset, {event pk: [musician ids]})
+
+
+_pending = contextvars.ContextVar('eventapp_stats_pending', default=None)
+
+
+@contextlib.contextmanager
+def deferred():
+    """Collect the summary changes made inside the block and apply them, merged, as it exits.
+
+    Every change goes through one of these; wrap bulk writes and deletes in one (inside
+    their transaction) so each summary row is locked and written once rather than per event.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = Pending()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for summary, changes in pending.changes.items():
+        _apply(summary, changes)
+
+
+def _change(summary, key, start, sign):
+    # An instance keeps what it was given, which may still be an ISO string
+    start = START_FIELD.to_python(start)
+    _pending.get().changes[summary][key].append((start, sign))
+
+
+def remember(event):
+    """Note an event's organiser and start before they're changed in memory and bulk_update()d."""
+    event.__dict__.setdefault(STORED, (event.event_organiser_id, event.event_start_date))
+
+
+def on_event_saving(event, update_fields=None):
+    # Full saves and ones touching what the summaries count; post_save needs what was stored
+    if event._state.adding or event.pk is None or hasattr(event, STORED):
+        return
+    if update_fields is not None and not {'event_organiser', 'event_start_date'} & set(update_fields):
+        return
+    stored = Event.objects.filter(pk=event.pk).values_list('event_organiser_id', 'event_start_date').first()
+    if stored is not None:
+        setattr(event, STORED, stored)
+
+
+def on_event_saved(event, created):
+    with deferred():
+        # A new event can't have musicians until it has been saved
+        _record_events([event], created, musicians=not created)
+
+
+def events_bulk_saved(created, updated=()):
+    """Count bulk_create()d events and move bulk_update()d ones, which must have been remember()ed."""
+    with deferred():
+        _record_events(created, True)
+        _record_events(updated, False)
+
+
+def _record_events(events, created, musicians=True):
+    moved = {}  # event pk: (stored start or None, start) for the event's musicians
+    for event in events:
+        stored = None if created else event.__dict__.pop(STORED, None)
+        current = (event.event_organiser_id, event.event_start_date)
+        if (stored is None and not created) or stored == current:
+            continue
+        if stored is not None and stored[0] is not None:
+            _change(ORGANISERS, stored[0], stored[1], -1)
+        if current[0] is not None:
+            _change(ORGANISERS, current[0], current[1], 1)
+        if stored is None or stored[1] != current[1]:
+            moved[event.pk] = (stored and stored[1], current[1])
+    moved.pop(None, None)
+    if musicians and moved:
+        for event_id, musician_id in MUSICIANS.source.filter(event_id__in=moved).values_list('event_id', 'musician_id'):
+            before, after = moved[event_id]
+            if before is not None:
+                _change(MUSICIANS, musician_id, before, -1)
+            _change(MUSICIANS, musician_id, after, 1)
+
+
+def on_event_deleting(event, origin=None):
+    # The through rows are gone by post_delete. Inside deferred(), a queryset's delete()
+    # looks them up for all its events at once.
+    pending = _pending.get()
+    if pending is None or not isinstance(origin, QuerySet) or origin.model is not Event:
+        played = MUSICIANS.source.filter(event_id=event.pk).values_list('musician_id', flat=True)
+        setattr(event, PLAYED, list(played))
+        return
+    deleting, played = pending.played.get(id(origin), (None, None))
+    if deleting is not origin:
+        played = defaultdict(list)
+        for event_id, musician_id in (MUSICIANS.source.filter(event_id__in=origin.values('pk'))
+                                      .values_list('event_id', 'musician_id')):
+            played[event_id].append(musician_id)
+        pending.played[id(origin)] = (origin, played)
+    setattr(event, PLAYED, played.get(event.pk, []))
+
+
+def on_event_deleted(event):
+    with deferred():
+        if event.event_organiser_id is not None:
+            _change(ORGANISERS, event.event_organiser_id, event.event_start_date, -1)
+        for musician_id in event.__dict__.pop(PLAYED, ()):
+            _change(MUSICIANS, musician_id, event.event_start_date, -1)
+
+
+def on_musicians_changed(instance, action, reverse, pk_set):
+    # instance is the Event, or the Musician when changed through musician.events (reverse)
+    if action == 'pre_clear':
+        if reverse:
+            played = [(instance.pk, start) for start in instance.events.values_list('event_start_date', flat=True)]
+        else:
+            played = [(pk, instance.event_start_date) for pk in instance.musicians.values_list('pk', flat=True)]
+        setattr(instance, PLAYED, played)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        played = instance.__dict__.pop(PLAYED, ())
+    elif reverse:
+        played = [(instance.pk, start) for start in
+                  Event.objects.filter(pk__in=pk_set).values_list('event_start_date', flat=True)]
+    else:
+        played = [(pk, instance.event_start_date) for pk in pk_set]
+    with deferred():
+        for musician_id, start in played:
+            _change(MUSICIANS, musician_id, start, 1 if action == 'post_add' else -1)
+
+
+def _apply(summary, changes):
+    # Rows that exist take the changes as deltas; missing ones are built from the events,
+    # which already include them
+    if not changes:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        rows = summary.model.objects.select_for_update().in_bulk(list(changes))
+        recount = {}
+        for key, row in rows.items():
+            months = row.events_per_month
+            for start, sign in changes[key]:
+                month = _month(start)
+                count = months.get(month, 0) + sign
+                if count > 0:
+                    months[month] = count
+                else:
+                    months.pop(month, None)
+                row.events_total = max(row.events_total + sign, 0)
+                if start > now and _is_current(row, now):
+                    row.upcoming_events = max(row.upcoming_events + sign, 0)
+                    if sign > 0:
+                        row.next_event_start = min(row.next_event_start or start, start)
+                    elif start == row.next_event_start:
+                        recount[key] = row
+            row.events_per_month = dict(sorted(months.items()))
+            row.updated_on = now
+        for key, row in recount.items():
+            row.upcoming_events, row.next_event_start = _upcoming(summary, key, now)
+        _save(summary, rows.values())
+        missing = [key for key in changes if key not in rows]
+        if missing:
+            rebuild(summary, summary.owners.filter(pk__in=missing).values_list('pk', flat=True), now)
+
+
+def _month(start):
+    return f'{start.astimezone(MONTH_ZONE):%Y-%m}'
+
+
+def _is_current(row, now):
+    # Events only pass in start order, so nothing upcoming has started before next_event_start
+    return row.next_event_start is None or row.next_event_start > now
+
+
+def _upcoming(summary, key, now):
+    found = summary.source.filter(**{summary.owner: key, f'{summary.start}__gt': now}).aggregate(
+        count=Count('pk'), first=Min(summary.start))
+    return found['count'], found['first']
+
+
+def rebuild(summary, keys, now=None):
+    """Recount the summary rows of `keys` from their events and save them; returns {key: row}.
+
+    Two grouped queries per call whatever the number of keys, so pass them in chunks.
+    """
+    keys = list(keys)
+    now = now or timezone.now()
+    rows = {key: summary.model(pk=key, updated_on=now) for key in keys}
+    if not rows:
+        return rows
+    source = summary.source.filter(**{f'{summary.owner}__in': keys}).order_by()
+    by_month = (source.annotate(month=TruncMonth(summary.start, tzinfo=MONTH_ZONE))
+                .values_list(summary.owner, 'month').annotate(count=Count('pk')).order_by(summary.owner, 'month'))
+    for key, month, count in by_month:
+        rows[key].events_per_month[f'{month:%Y-%m}'] = count
+        rows[key].events_total += count
+    upcoming = (source.filter(**{f'{summary.start}__gt': now}).values_list(summary.owner)
+                .annotate(count=Count('pk'), first=Min(summary.start)))
+    for key, count, first in upcoming:
+        rows[key].upcoming_events, rows[key].next_event_start = count, first
+    _save(summary, rows.values())
+    return rows
+
+
+def _save(summary, rows):
+    # An upsert: bulk_update()'s CASE WHEN per row costs far more to build for thousands of rows
+    # (MySQL's ON DUPLICATE KEY UPDATE takes no conflict target)
+    unique = [summary.model._meta.pk.name] if connection.features.supports_update_conflicts_with_target else None
+    summary.model.objects.bulk_create(rows, update_conflicts=True, unique_fields=unique, update_fields=FIELDS)
+
+
+def reconcile(summary, keys):
+    """rebuild() `keys` with their rows locked; returns how many had drifted from their events."""
+    with transaction.atomic():
+        before = {row.pk: (row.events_total, row.events_per_month)
+                  for row in summary.model.objects.select_for_update().filter(pk__in=keys)}
+        rows = rebuild(summary, keys)
+    return sum(1 for key, counts in before.items() if counts != (rows[key].events_total, rows[key].events_per_month))
+
+
+def current(summary, key):
+    """The summary row of `key`, up to date; None if there's no such organiser or musician.
+
+    One query unless the row's next event has started since it was written, which
+    recounts the upcoming events, or it was never built.
+    """
+    now = timezone.now()
+    row = summary.model.objects.filter(pk=key).first()
+    if row is not None and _is_current(row, now):
+        return row
+    with transaction.atomic():
+        if row is None:
+            if not summary.owners.filter(pk=key).exists():
+                return None
+            return rebuild(summary, [key], now)[key]
+        row = summary.model.objects.select_for_update().filter(pk=key).first()
+        if row is None:
+            return None
+        row.upcoming_events, row.next_event_start = _upcoming(summary, key, now)
+        row.updated_on = now
+        row.save(update_fields=['upcoming_events', 'next_event_start', 'updated_on'])
+    return row
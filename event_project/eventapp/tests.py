@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from cryptography.fernet import Fernet
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from google.oauth2.credentials import Credentials
+
+from . import (
+    availability, bulk, caching, calendar_accounts, calendar_watch, geo, login, metrics, mixins, outbox, ratelimit,
+    rendering, routers, stats,
+)
+from .benchmarks import generators, queries
+from .benchmarks.scenarios import SCENARIOS, sample_dataset
+from .calendar_async import AsyncCalendarClient
+from .calendar_pull import pull
+from .calendar_service import CalendarServiceRegistry, CredentialStore, _utcnow, get_discovery_document
+from .calendar_sync import BatchSyncEngine, google_id
+from .checks import check_rate_limit_cache, check_response_cache
+from .conflicts import ConflictDetector, detector, lock
+from .fake_calendar import FakeCalendarServer
+from .models import (
+    CalendarAccount, CalendarChannel, CalendarOutbox, CalendarSyncState, ConflictLock, Event, EventOrganizer, Musician,
+    UserCredentials,
+)
+from .pagination import KeysetPagination
+
+
+def event_data(**overrides):
+    start = (timezone.now() + datetime.timedelta(days=30)).replace(microsecond=0)
+    data = {
+        'event_name': 'A', 'location': 'Test hall', 'description': 'Test gig',
+        'event_start_date': start.isoformat(), 'event_end_date': (start + datetime.timedelta(hours=2)).isoformat(),
+        'event_organiser_email': 'organiser@example.invalid', 'event_organiser_name': 'Organiser',
+    }
+    data.update(overrides)
+    return data
+
+
+class EventAppTestCase(TestCase):
+
+    def setUp(self):
+        # The detector outlives each test's rolled-back transaction
+        detector.reset()
+
+
+class FakeCredentials:
+    # Stands in for google.oauth2.credentials.Credentials; module level so it pickles
+    valid = True
+    refresh_token = None
+
+    def __init__(self, expiry):
+        self.expiry = expiry
+        self.refreshed = 0
+
+    def refresh(self, request):
+        self.refreshed += 1
+        self.expiry = _utcnow() + datetime.timedelta(hours=1)
+
+
+class CalendarServiceTests(SimpleTestCase):
+
+    def store(self, expires_in):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'token.pickle')
+        with open(path, 'wb') as token:
+            pickle.dump(FakeCredentials(_utcnow() + expires_in), token)
+        return CredentialStore(token_path=path, refresh_margin=300), path
+
+    def test_token_is_read_once(self):
+        store, path = self.store(datetime.timedelta(hours=1))
+        creds = store.get()
+        os.remove(path)
+        self.assertIs(store.get(), creds)
+        self.assertEqual(creds.refreshed, 0)
+
+    def test_token_about_to_expire_is_refreshed_before_use(self):
+        store, path = self.store(datetime.timedelta(minutes=10))
+        creds = store.get()
+        creds.expiry = _utcnow() + datetime.timedelta(seconds=60)
+        self.assertIs(store.get(), creds)
+        self.assertEqual(creds.refreshed, 1)
+        # and saved, so the next process starts from the fresh token
+        with open(path, 'rb') as token:
+            self.assertGreater(pickle.load(token).expiry, _utcnow() + datetime.timedelta(minutes=30))
+
+    def test_discovery_document_is_parsed_once(self):
+        self.assertIs(get_discovery_document(), get_discovery_document())
+
+    def test_each_thread_reuses_its_own_service(self):
+        registry = CalendarServiceRegistry(root_url='http://127.0.0.1:9/')
+        service = registry.get_service()
+        self.assertIs(registry.get_service(), service)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(registry.get_service()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], service)
+        self.assertTrue(service._baseUrl.startswith('http://127.0.0.1:9/'))
+
+
+class BatchSyncEngineTests(SimpleTestCase):
+    # Batched pushes against the fake Calendar server; nothing here touches the database
+
+    def setUp(self):
+        self.server = FakeCalendarServer().start()
+        self.addCleanup(self.server.stop)
+        service = CalendarServiceRegistry(root_url=self.server.root_url).get_service()
+        self.engine = BatchSyncEngine(service, batch_size=50, backoff=0)
+
+    def events(self, count):
+        start = (timezone.now() + datetime.timedelta(days=30)).replace(microsecond=0)
+        return [Event(event_name=f'Gig {i}', location='Test hall', description='Test gig',
+                      event_start_date=start + datetime.timedelta(days=i),
+                      event_end_date=start + datetime.timedelta(days=i, hours=2),
+                      event_organiser_email='organiser@example.invalid', event_organiser_name='Organiser')
+                for i in range(count)]
+
+    def test_inserts_go_out_in_batches(self):
+        for event in self.events(120):
+            self.engine.insert(event)
+        report = self.engine.flush()
+        self.assertEqual((len(report.succeeded), report.failed, report.batches), (120, {}, 3))
+        self.assertEqual(len(self.server.calendar.events()), 120)
+
+    def test_only_failed_requests_are_retried(self):
+        for event in self.events(3):
+            self.engine.insert(event)
+        self.server.calendar.fail_next(2)
+        report = self.engine.flush()
+        self.assertEqual((len(report.succeeded), report.failed), (3, {}))
+        self.assertEqual((report.batches, report.requests), (2, 5))
+
+    def test_permanent_failures_are_not_retried(self):
+        events = self.events(2)
+        for event in events:
+            self.engine.insert(event)
+        self.server.calendar.fail_next(1, status=400, reason='invalid')
+        report = self.engine.flush()
+        self.assertEqual(list(report.failed), [google_id(events[0].google_event_id)])
+        self.assertEqual(report.requests, 2)
+
+    def test_retries_give_up_after_max_retries(self):
+        self.engine.max_retries = 1
+        self.engine.insert(self.events(1)[0])
+        self.server.calendar.fail_next(5)
+        report = self.engine.flush()
+        self.assertEqual((len(report.failed), report.requests), (1, 2))
+
+    def test_update_and_delete_reach_the_calendar(self):
+        events = self.events(2)
+        for event in events:
+            self.engine.insert(event)
+        self.engine.flush()
+        events[0].event_name = 'Renamed'
+        self.engine.update(events[0])
+        self.engine.delete(events[1].google_event_id)
+        self.assertFalse(self.engine.flush().failed)
+        stored = self.server.calendar.events()
+        self.assertEqual(stored[google_id(events[0].google_event_id)]['summary'], 'Renamed')
+        self.assertEqual(stored[google_id(events[1].google_event_id)]['status'], 'cancelled')
+
+
+class RateLimiterTests(SimpleTestCase):
+    # The clock is pinned inside one window so capacities don't shift under the test
+
+    def setUp(self):
+        clock = mock.patch.object(ratelimit.time, 'time', return_value=1000.25)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        self.limiter = ratelimit.RateLimiter(name=uuid.uuid4().hex, rate=10, min_rate=2, cache=caches['default'])
+
+    def test_a_window_hands_out_the_rate_then_makes_callers_wait(self):
+        self.assertEqual(self.limiter.try_acquire(10), 0.0)
+        self.assertAlmostEqual(self.limiter.try_acquire(1), 0.75)
+        self.clock.return_value = 1001.0
+        self.assertEqual(self.limiter.try_acquire(1), 0.0)
+
+    def test_background_leaves_room_for_interactive_writes(self):
+        self.assertEqual(self.limiter.try_acquire(4), 0.0)
+        self.clock.return_value = 1001.25
+        # 10 - (4 used by interactive writes last window + 1)
+        self.assertEqual(self.limiter.try_acquire(5, ratelimit.BACKGROUND), 0.0)
+        self.assertGreater(self.limiter.try_acquire(1, ratelimit.BACKGROUND), 0)
+        self.assertEqual(self.limiter.try_acquire(5), 0.0)
+
+    def test_background_share_caps_an_idle_window(self):
+        self.assertEqual(self.limiter.try_acquire(8, ratelimit.BACKGROUND), 0.0)
+        self.assertGreater(self.limiter.try_acquire(1, ratelimit.BACKGROUND), 0)
+        self.assertEqual(self.limiter.try_acquire(2), 0.0)
+
+    def test_throttling_cuts_once_per_window_and_successes_win_it_back(self):
+        self.limiter.throttled()
+        self.limiter.throttled()
+        self.assertAlmostEqual(self.limiter.rate, 9.0)
+        # +2% of the ceiling per second's worth of calls at the current rate
+        self.limiter.succeeded(9)
+        self.assertAlmostEqual(self.limiter.rate, 9.2)
+        self.limiter.succeeded(1000)
+        self.assertEqual(self.limiter.rate, 10)
+
+    def test_rate_never_drops_below_the_floor(self):
+        for window in range(30):
+            self.limiter.cache.delete(self.limiter._key('cut'))
+            self.limiter.throttled()
+        self.assertEqual(self.limiter.rate, 2)
+
+    def test_a_local_bucket_is_flagged(self):
+        self.assertEqual([warning.id for warning in check_rate_limit_cache(None)], ['eventapp.W001'])
+        with mock.patch.object(ratelimit, 'RATE', None):
+            self.assertEqual(check_rate_limit_cache(None), [])
+
+    def test_execute_feeds_throttled_responses_back(self):
+        with FakeCalendarServer() as server:
+            service = CalendarServiceRegistry(root_url=server.root_url).get_service()
+            server.calendar.fail_next(1, status=403, reason='rateLimitExceeded')
+            with self.assertRaises(Exception):
+                ratelimit.execute(service.events().list(calendarId='primary'), limiter=self.limiter)
+            self.assertAlmostEqual(self.limiter.rate, 9.0)
+            ratelimit.execute(service.events().list(calendarId='primary'), limiter=self.limiter)
+            self.assertGreater(self.limiter.rate, 9.0)
+
+
+class CalendarAccountTests(EventAppTestCase):
+
+    def credentials(self, token='access-token'):
+        return Credentials(token=token, refresh_token='refresh-token', client_id='client', client_secret='secret',
+                           token_uri='https://oauth2.googleapis.com/token',
+                           expiry=(_utcnow() + datetime.timedelta(hours=1)).replace(tzinfo=None))
+
+    def test_tokens_are_stored_encrypted_and_survive_key_rotation(self):
+        old, new = Fernet.generate_key(), Fernet.generate_key()
+        with mock.patch.object(calendar_accounts, 'TOKEN_KEYS', [old]):
+            account = calendar_accounts.connect('band@example.invalid', self.credentials())
+        self.assertNotIn('access-token', CalendarAccount.objects.get().token)
+        with mock.patch.object(calendar_accounts, 'TOKEN_KEYS', [new, old]):
+            self.assertEqual(calendar_accounts.AccountCredentialStore(account).get().token, 'access-token')
+        with mock.patch.object(calendar_accounts, 'TOKEN_KEYS', [new]):
+            with self.assertRaises(calendar_accounts.AccountNotConnected):
+                calendar_accounts.decrypt_token(account.token)
+
+    def test_pool_evicts_the_least_recently_used_account(self):
+        a, b, c = (calendar_accounts.connect(f'{name}@example.invalid', self.credentials()) for name in 'abc')
+        pool = calendar_accounts.CalendarServicePool(size=2)
+        first_a, first_b = pool.registry(a), pool.registry(b)
+        self.assertIs(pool.registry(a), first_a)
+        pool.registry(c)
+        self.assertEqual(len(pool), 2)
+        self.assertIs(pool.registry(a), first_a)
+        self.assertIsNot(pool.registry(b), first_b)
+
+    def test_reconnecting_drops_the_pooled_service(self):
+        account = calendar_accounts.connect('band@example.invalid', self.credentials())
+        registry = calendar_accounts.get_pool().registry(account)
+        self.assertEqual(registry.credential_store.get().token, 'access-token')
+        account = calendar_accounts.connect('band@example.invalid', self.credentials('new-token'))
+        self.assertEqual(calendar_accounts.get_pool().registry(account).credential_store.get().token, 'new-token')
+
+    def test_events_go_to_their_organisers_account_and_stay_there(self):
+        organiser = EventOrganizer.objects.create(name='Organiser', email='organiser@example.invalid', age=30,
+                                                  club_address='1 High St', city='Pune', country='India')
+        account = calendar_accounts.connect('band@example.invalid', self.credentials(), organiser=organiser)
+        response = self.client.post('/events/api/', event_data(), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        event = Event.objects.get()
+        self.assertEqual(event.calendar_account, account)
+        response = self.client.patch(f'/events/api/{event.pk}/', {'calendar_id': 'other'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('calendar_id', response.json())
+
+
+class CalendarOutboxTests(EventAppTestCase):
+    # Event writes queue their Calendar write in the same transaction; process() pushes them
+
+    def setUp(self):
+        self.server = FakeCalendarServer().start()
+        self.addCleanup(self.server.stop)
+        self.service = CalendarServiceRegistry(root_url=self.server.root_url).get_service()
+
+    def create(self, name='A'):
+        response = self.client.post('/events/api/', event_data(event_name=name), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Event.objects.get(event_name=name)
+
+    def test_writes_are_queued_with_the_event(self):
+        event = self.create()
+        data = event_data(event_name='B')
+        self.assertEqual(self.client.put(f'/events/api/{event.pk}/', data, content_type='application/json').status_code,
+                         200)
+        self.assertEqual(self.client.delete(f'/events/api/{event.pk}/').status_code, 204)
+        self.assertEqual(list(CalendarOutbox.objects.order_by('outbox_id').values_list('action', 'event_id')),
+                         [('insert', event.pk), ('update', event.pk), ('delete', event.pk)])
+        self.assertEqual(self.server.calendar.request_count, 0)
+
+    def test_writes_to_one_event_are_pushed_as_one_call(self):
+        event = self.create()
+        event.event_name = 'B'
+        event.save()
+        outbox.enqueue(event, 'update')
+        self.assertEqual(outbox.process(outbox.claim(100), self.service), (2, 0))
+        self.assertEqual(self.server.calendar.request_count, 1)
+        self.assertEqual(self.server.calendar.events()[google_id(event.google_event_id)]['summary'], 'B')
+        self.assertEqual(outbox.claim(100), [])
+
+    def test_unchanged_updates_are_skipped_and_changes_sent_as_patches(self):
+        event = self.create()
+        outbox.process(outbox.claim(100), self.service)
+        calls = self.server.calendar.request_count
+        outbox.enqueue(event, 'update')
+        self.assertEqual(outbox.process(outbox.claim(100), self.service), (1, 0))
+        self.assertEqual(CalendarOutbox.objects.latest('outbox_id').state, 'skipped')
+        self.assertEqual(self.server.calendar.request_count, calls)
+
+        # Edited in Google meanwhile: the If-Match PATCH gets a 412 and is resent as a PUT
+        key = google_id(event.google_event_id)
+        self.service.events().patch(calendarId='primary', eventId=key, body={'summary': 'Google'}).execute()
+        event.refresh_from_db()
+        event.location = 'Other hall'
+        event.save()
+        outbox.enqueue(event, 'update')
+        self.assertEqual(outbox.process(outbox.claim(100), self.service), (1, 0))
+        stored = self.server.calendar.events()[key]
+        self.assertEqual((stored['summary'], stored['location']), ('A', 'Other hall'))
+        event.refresh_from_db()
+        self.assertEqual(event.google_etag, stored['etag'])
+
+    def test_claimed_rows_are_leased(self):
+        self.create()
+        self.assertEqual(len(outbox.claim(100)), 1)
+        self.assertEqual(outbox.claim(100), [])
+
+    def test_failed_push_is_retried_later_then_dead_lettered(self):
+        self.create()
+        self.server.calendar.fail_next(outbox.MAX_ATTEMPTS, status=400, reason='invalid')
+        rows = outbox.claim(100)
+        self.assertEqual(outbox.process(rows, self.service), (0, 1))
+        row = CalendarOutbox.objects.get()
+        self.assertEqual((row.state, row.attempts), ('pending', 1))
+        self.assertGreater(row.available_on, timezone.now())
+        for _ in range(outbox.MAX_ATTEMPTS - 1):
+            outbox.process(rows, self.service)
+        self.assertEqual(CalendarOutbox.objects.get().state, 'dead')
+        self.assertEqual(self.client.get('/calendar/outbox/metrics/').json()['dead_letters'], 1)
+
+    def test_rows_drain_through_the_async_client(self):
+        event = self.create()
+        # Made in Google, so it's deleted under the id Google gave it
+        self.service.events().insert(calendarId='primary', body={'id': 'madeingoogle0', 'summary': 'G'}).execute()
+        CalendarOutbox.objects.create(google_event_id=uuid.uuid4(), external_google_id='madeingoogle0', action='delete')
+
+        async def drain(rows):
+            registry = CalendarServiceRegistry(root_url=self.server.root_url)
+            async with AsyncCalendarClient(registry, concurrency=2, max_retries=0, use_httpx=False) as client:
+                return await outbox.process_async(rows, client)
+
+        self.assertEqual(async_to_sync(drain)(outbox.claim(100)), (2, 0))
+        calendar = self.server.calendar.events()
+        self.assertEqual(calendar[google_id(event.google_event_id)]['summary'], 'A')
+        self.assertEqual(calendar['madeingoogle0']['status'], 'cancelled')
+        self.assertFalse(CalendarOutbox.objects.filter(state='pending').exists())
+
+    def test_flush_needs_the_shared_secret_and_a_bounded_limit(self):
+        with self.settings(CALENDAR_OUTBOX_FLUSH_TOKEN=None):
+            self.assertEqual(self.client.post('/calendar/outbox/flush/', HTTP_X_FLUSH_TOKEN='').status_code, 403)
+        with self.settings(CALENDAR_OUTBOX_FLUSH_TOKEN='s3cret'):
+            self.assertEqual(self.client.post('/calendar/outbox/flush/', HTTP_X_FLUSH_TOKEN='guess').status_code, 403)
+            for limit in ('abc', '0', '1000000'):
+                with self.subTest(limit=limit):
+                    response = self.client.post(f'/calendar/outbox/flush/?limit={limit}', HTTP_X_FLUSH_TOKEN='s3cret')
+                    self.assertEqual(response.status_code, 400)
+
+    def test_metrics_window_is_validated(self):
+        self.assertEqual(self.client.get('/calendar/outbox/metrics/', {'window': 300}).json()['window_seconds'], 300)
+        for window in ('abc', '0', '-5', '10000000'):
+            with self.subTest(window=window):
+                response = self.client.get('/calendar/outbox/metrics/', {'window': window})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('window', response.json())
+
+
+class CalendarPullTests(EventAppTestCase):
+    # Pushes go out through the outbox and come back through incremental pulls, against the fake server
+
+    def setUp(self):
+        self.server = FakeCalendarServer().start()
+        self.addCleanup(self.server.stop)
+        self.service = CalendarServiceRegistry(root_url=self.server.root_url).get_service()
+        # The first pull only takes the sync token
+        pull(self.service)
+
+    def create(self, **overrides):
+        response = self.client.post('/events/api/', event_data(**overrides), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Event.objects.get(event_name=overrides.get('event_name', 'A'))
+
+    def edit(self, event, name):
+        data = event_data(event_name=name, event_start_date=event.event_start_date.isoformat(),
+                          event_end_date=event.event_end_date.isoformat())
+        response = self.client.put(f'/events/api/{event.pk}/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def push(self):
+        return outbox.process(outbox.claim(100), self.service)
+
+    def google(self, event):
+        return self.server.calendar.events()[google_id(event.google_event_id, event.external_google_id)]
+
+    def create_in_google(self, summary):
+        start = (timezone.now() + datetime.timedelta(days=60)).replace(microsecond=0)
+        return self.service.events().insert(calendarId='primary', body={
+            'summary': summary, 'location': 'Test field',
+            'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': (start + datetime.timedelta(hours=3)).isoformat()},
+        }).execute()
+
+    def test_echo_of_a_push_is_skipped(self):
+        self.create()
+        self.push()
+        report = pull(self.service)
+        self.assertEqual((report.updated, report.skipped), (0, 1))
+
+    def test_pending_local_edit_survives_a_pull(self):
+        event = self.create()
+        self.edit(event, 'B')
+        self.push()
+        self.edit(event, 'C')  # its outbox row stays pending through the pull
+        pull(self.service)
+        self.assertEqual(Event.objects.get(pk=event.pk).event_name, 'C')
+        self.push()
+        self.assertEqual(self.google(event)['summary'], 'C')
+
+    def test_edit_made_in_google_is_applied(self):
+        event = self.create()
+        self.push()
+        self.service.events().patch(calendarId='primary', eventId=google_id(event.google_event_id),
+                                    body={'summary': 'Renamed in Google'}).execute()
+        report = pull(self.service)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(Event.objects.get(pk=event.pk).event_name, 'Renamed in Google')
+
+    def test_cancelled_in_google_is_deleted(self):
+        event = self.create()
+        self.push()
+        self.service.events().delete(calendarId='primary', eventId=google_id(event.google_event_id)).execute()
+        self.assertEqual(pull(self.service).deleted, 1)
+        self.assertFalse(Event.objects.filter(pk=event.pk).exists())
+
+    def test_event_created_in_google_is_created_and_pushed_back_to_it(self):
+        item = self.create_in_google('Made in Google')
+        self.assertEqual(pull(self.service).created, 1)
+        event = Event.objects.get(event_name='Made in Google')
+        self.assertEqual(event.external_google_id, item['id'])
+        # Pulled again, it's the same event
+        self.service.events().patch(calendarId='primary', eventId=item['id'], body={'summary': 'Renamed'}).execute()
+        self.assertEqual((pull(self.service).updated, Event.objects.get(pk=event.pk).event_name), (1, 'Renamed'))
+        self.edit(Event.objects.get(pk=event.pk), 'Edited here')
+        self.push()
+        self.assertEqual(self.google(event)['summary'], 'Edited here')
+        self.assertEqual(len(self.server.calendar.events()), 1)
+        self.assertEqual(self.client.delete(f'/events/api/{event.pk}/').status_code, 204)
+        self.push()
+        self.assertEqual(self.server.calendar.events()[item['id']]['status'], 'cancelled')
+
+    def test_resync_after_expired_token_deletes_what_google_no_longer_has(self):
+        kept = self.create(event_name='Kept')
+        gone = self.create(event_name='Gone', location='Other hall', event_organiser_email='gone@example.invalid')
+        self.push()
+        pull(self.service)
+        self.server.calendar.expire_sync_tokens()
+        self.service.events().delete(calendarId='primary', eventId=google_id(gone.google_event_id)).execute()
+        unpushed = self.create(event_name='Not pushed yet', location='New hall', event_organiser_email='new@example.invalid')
+        report = pull(self.service)
+        self.assertTrue(report.full_sync)
+        self.assertEqual(report.deleted, 1)
+        self.assertEqual(set(Event.objects.values_list('pk', flat=True)), {kept.pk, unpushed.pk})
+
+    def test_calendars_are_resynced_and_matched_on_their_own(self):
+        kept = self.create()
+        self.push()
+        pull(self.service, calendar_id='team')
+        for calendar_id in ('primary', 'team'):
+            self.service.events().insert(calendarId=calendar_id, body={
+                'id': 'samegoogleid0', 'summary': f'Made in {calendar_id}',
+                'start': {'dateTime': '2031-01-01T10:00:00Z'}, 'end': {'dateTime': '2031-01-01T11:00:00Z'},
+            }).execute()
+        pull(self.service)
+        report = pull(self.service, calendar_id='team', full=True)
+        self.assertEqual((report.full_sync, report.created, report.deleted), (True, 1, 0))
+        self.assertTrue(Event.objects.filter(pk=kept.pk).exists())
+        made = Event.objects.filter(external_google_id='samegoogleid0').values_list('calendar_id', 'event_name')
+        self.assertEqual(sorted(made), [('', 'Made in primary'), ('team', 'Made in team')])
+
+    def test_first_full_listing_deletes_nothing(self):
+        CalendarSyncState.objects.all().delete()
+        Event.objects.create(**event_data(event_name='Never in Google'))
+        report = pull(self.service)
+        self.assertEqual((report.full_sync, report.deleted), (True, 0))
+        self.assertTrue(Event.objects.filter(event_name='Never in Google').exists())
+
+    def test_long_event_pulled_from_google_is_found_by_range(self):
+        start = (timezone.now() + datetime.timedelta(days=60)).replace(microsecond=0)
+        window = {'start': (start + datetime.timedelta(days=5)).isoformat(),
+                  'end': (start + datetime.timedelta(days=6)).isoformat()}
+        self.assertEqual(self.client.get('/events/range/', window).json()['results'], [])
+        self.service.events().insert(calendarId='primary', body={
+            'summary': 'Festival', 'location': 'Test field',
+            'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': (start + datetime.timedelta(days=9)).isoformat()},
+        }).execute()
+        self.assertEqual(pull(self.service).created, 1)
+        results = self.client.get('/events/range/', window).json()['results']
+        self.assertEqual([event['event_name'] for event in results], ['Festival'])
+
+
+class CalendarWatchTests(EventAppTestCase):
+    # Nothing listens at the channel's address; notifications are posted to the webhook here
+    ADDRESS = 'http://127.0.0.1:9/calendar/webhook/'
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeCalendarServer().start()
+        self.addCleanup(self.server.stop)
+        self.service = CalendarServiceRegistry(root_url=self.server.root_url).get_service()
+        pull(self.service)
+        self.channel = calendar_watch.watch(self.service, None, 'primary', address=self.ADDRESS)
+
+    def notify(self, channel_id=None, token=None, state='exists'):
+        return self.client.post('/calendar/webhook/', headers={
+            'X-Goog-Channel-ID': str(channel_id or self.channel.channel_id),
+            'X-Goog-Channel-Token': token or self.channel.token, 'X-Goog-Resource-State': state,
+        })
+
+    def test_forged_notifications_are_refused(self):
+        self.assertEqual(self.notify(token='guessed').status_code, 403)
+        self.assertEqual(self.notify(channel_id=uuid.uuid4()).status_code, 404)
+        self.assertIsNone(CalendarSyncState.objects.get(calendar_id='primary').notified_on)
+
+    def test_burst_of_notifications_is_pulled_once(self):
+        self.server.calendar.change('primary', {
+            'id': uuid.uuid4().hex, 'summary': 'Made in Google', 'location': 'Test hall',
+            'start': {'dateTime': '2034-01-05T20:00:00+00:00'}, 'end': {'dateTime': '2034-01-05T22:00:00+00:00'},
+        })
+        self.assertEqual(self.notify(state='sync').status_code, 204)
+        self.assertIsNone(CalendarSyncState.objects.get(calendar_id='primary').notified_on)
+        for _ in range(3):
+            self.assertEqual(self.notify().status_code, 204)
+        later = timezone.now() + datetime.timedelta(seconds=calendar_watch.COALESCE_SECONDS + 1)
+        pulled = list(calendar_watch.pull_due(lambda account: self.service, now=later))
+        self.assertEqual([report.created for _, report in pulled], [1])
+        self.assertEqual(list(calendar_watch.pull_due(lambda account: self.service, now=later)), [])
+        self.assertTrue(Event.objects.filter(event_name='Made in Google').exists())
+
+    def test_expiring_channel_is_replaced(self):
+        self.channel.expires_on = timezone.now() + datetime.timedelta(minutes=5)
+        self.channel.save()
+        opened, stopped = calendar_watch.renew(self.ADDRESS, lambda account: self.service)
+        self.assertEqual((opened, stopped), (1, 1))
+        replacement = CalendarChannel.objects.get()
+        self.assertNotEqual(replacement.channel_id, self.channel.channel_id)
+        self.assertEqual(self.notify(channel_id=replacement.channel_id, token=replacement.token).status_code, 204)
+
+
+class ListPaginationTests(EventAppTestCase):
+    # Keyset pages (newest first) and ?fields= projection on the list endpoints
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() + datetime.timedelta(days=30)
+        Event.objects.bulk_create([
+            Event(event_name=f'Gig {i}', location='Test hall', description='Long description',
+                  event_start_date=start, event_end_date=start + datetime.timedelta(hours=2),
+                  event_organiser_email=f'organiser{i}@example.invalid', event_organiser_name='Organiser')
+            for i in range(5)
+        ])
+
+    def names(self, page):
+        return [event['event_name'] for event in page['results']]
+
+    def test_pages_walk_every_event_once_newest_first(self):
+        page = self.client.get('/events/api/', {'page_size': 2}).json()
+        self.assertEqual(self.names(page), ['Gig 4', 'Gig 3'])
+        # A row added meanwhile sorts before the cursor, so it doesn't shift later pages
+        Event.objects.create(**event_data(event_name='Added later'))
+        seen = self.names(page)
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            seen += self.names(page)
+        self.assertEqual(seen, [f'Gig {i}' for i in range(4, -1, -1)])
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.client.get('/events/api/', {'page_size': 3}).json()['results']), 3)
+        with mock.patch.object(KeysetPagination, 'max_page_size', 2):
+            self.assertEqual(len(self.client.get('/events/api/', {'page_size': 100}).json()['results']), 2)
+
+    def test_tampered_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/events/api/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_fields_select_only_the_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/events/api/', {'fields': ' event_name, location ,'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'event_name', 'location'})
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/events/api/', {'fields': 'event_name,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['fields'])
+
+    def test_empty_fields_return_everything(self):
+        event = self.client.get('/events/api/', {'fields': ''}).json()['results'][0]
+        self.assertIn('description', event)
+
+    def test_fields_are_ignored_by_writes(self):
+        response = self.client.post('/events/api/?fields=event_name', event_data(location='Other hall'),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+
+class EventRangeTests(EventAppTestCase):
+    # /events/range/ returns events overlapping [start, end], touching endpoints included
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.origin = (timezone.now() + datetime.timedelta(days=30)).replace(microsecond=0)
+        for name, hours, length, location in [('Before', -3, 2, 'Test hall'), ('Touching', -2, 2, 'Test hall'),
+                                              ('Inside', 1, 1, 'Other hall'), ('After', 5, 1, 'Test hall')]:
+            start = cls.origin + datetime.timedelta(hours=hours)
+            Event.objects.create(**event_data(
+                event_name=name, location=location, event_organiser_email=f'{name.lower()}@example.invalid',
+                event_start_date=start, event_end_date=start + datetime.timedelta(hours=length)))
+
+    def names(self, **params):
+        params.setdefault('start', self.origin.isoformat())
+        params.setdefault('end', (self.origin + datetime.timedelta(hours=3)).isoformat())
+        response = self.client.get('/events/range/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [event['event_name'] for event in response.json()['results']]
+
+    def test_overlapping_events_in_start_order(self):
+        self.assertEqual(self.names(), ['Touching', 'Inside'])
+
+    def test_location_filter(self):
+        self.assertEqual(self.names(location='Test hall'), ['Touching'])
+
+    def test_event_longer_than_any_before_it_is_found(self):
+        # Written without the ORM's save(): the database still works out its duration
+        start = self.origin - datetime.timedelta(days=20)
+        Event.objects.bulk_create([Event(**event_data(
+            event_name='Residency', event_organiser_email='residency@example.invalid',
+            event_start_date=start, event_end_date=start + datetime.timedelta(days=21)))])
+        self.assertEqual(self.names(), ['Residency', 'Touching', 'Inside'])
+
+    def test_duration_is_not_serialized(self):
+        response = self.client.get('/events/range/', {'start': self.origin.isoformat(), 'end': self.origin.isoformat()})
+        self.assertNotIn('duration', response.json()['results'][0])
+
+    def test_bad_datetimes_are_rejected(self):
+        for params in [{'start': 'yesterday'}, {'end': ''},
+                       {'end': (self.origin - datetime.timedelta(hours=1)).isoformat()}]:
+            with self.subTest(params=params):
+                params = dict({'start': self.origin.isoformat(), 'end': self.origin.isoformat()}, **params)
+                self.assertEqual(self.client.get('/events/range/', params).status_code, 400)
+
+
+class ConflictTests(EventAppTestCase):
+    # Saves recheck the database, since the detector only hears of other processes' writes late
+
+    def setUp(self):
+        super().setUp()
+        start = (timezone.now() + datetime.timedelta(days=30)).replace(microsecond=0)
+        self.start, self.end = start, start + datetime.timedelta(hours=2)
+        detector.conflicts(self.start, self.end)
+        # As if written by another worker: no signals reach this process's detector
+        self.other = Event.objects.bulk_create([Event(
+            event_name='Other worker', location='Test hall', description='Test gig', event_start_date=self.start,
+            event_end_date=self.end, event_organiser_email='other@example.invalid', event_organiser_name='Other',
+        )])[0]
+
+    def test_detector_misses_the_other_worker(self):
+        self.assertEqual(detector.conflicts(self.start, self.end, location='Test hall'), {})
+
+    def test_create_overlapping_another_workers_event_is_rejected(self):
+        response = self.client.post('/events/api/', event_data(), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('location', response.json())
+        self.assertFalse(Event.objects.filter(event_name='A').exists())
+
+    def test_back_to_back_events_are_accepted(self):
+        data = event_data(event_start_date=self.end.isoformat(),
+                          event_end_date=(self.end + datetime.timedelta(hours=1)).isoformat())
+        response = self.client.post('/events/api/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_bulk_rows_overlapping_another_workers_event_are_reported(self):
+        later = self.end + datetime.timedelta(days=1)
+        rows = [event_data(event_name='Clash'),
+                event_data(event_name='Fine', event_organiser_email='fine@example.invalid',
+                           event_start_date=later.isoformat(),
+                           event_end_date=(later + datetime.timedelta(hours=1)).isoformat())]
+        response = self.client.post('/events/bulk/?type=ndjson', '\n'.join(map(json.dumps, rows)),
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['created'], response.json()['error_count']), (1, 1))
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertEqual(list(Event.objects.exclude(pk=self.other.pk).values_list('event_name', flat=True)), ['Fine'])
+
+    def test_other_workers_changes_are_read_back_one_by_one(self):
+        other_worker = ConflictDetector()
+        other_worker.event_saved(self.other)
+        with CaptureQueriesContext(connection) as queries:
+            found = detector.conflicts(self.start, self.end, location='Test hall')
+        self.assertEqual(found, {'location': [self.other.pk]})
+        # Only the changed event is read, not the table
+        self.assertEqual(len(queries), 1)
+        self.assertIn('IN', queries[0]['sql'])
+        Event.objects.filter(pk=self.other.pk).delete()
+        other_worker.event_deleted(self.other.pk)
+        self.assertEqual(detector.conflicts(self.start, self.end, location='Test hall'), {})
+
+    def test_lock_rows_are_inserted_only_once(self):
+        keys = [('location', 'Test hall'), ('event_organiser_email', 'other@example.invalid'), ('location', '')]
+        with transaction.atomic():
+            lock(keys)
+        self.assertEqual(ConflictLock.objects.count(), 2)
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            lock(keys + [('location', 'New hall')])
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('New hall', str(ConflictLock.objects.values_list('value', flat=True)[::1]))
+
+
+class RecurringEventTests(EventAppTestCase):
+    # A weekly gig from Thursday 5 January 2034; the second occurrence is on the 12th
+    DAY = {'start': '2034-01-12T00:00:00+00:00', 'end': '2034-01-13T00:00:00+00:00'}
+
+    def setUp(self):
+        super().setUp()
+        response = self.client.post('/events/api/', event_data(
+            event_name='Weekly', recurrence='FREQ=WEEKLY', time_zone='UTC',
+            event_start_date='2034-01-05T20:00:00+00:00', event_end_date='2034-01-05T22:00:00+00:00',
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.weekly = Event.objects.get(event_name='Weekly')
+
+    def names(self, url):
+        return [event['event_name'] for event in self.client.get(url, self.DAY).json()['results']]
+
+    def test_later_occurrence_is_listed(self):
+        occurrences = self.client.get('/events/occurrences/', self.DAY).json()
+        self.assertEqual([(item['event_name'], parse_datetime(item['start'])) for item in occurrences],
+                         [('Weekly', parse_datetime('2034-01-12T20:00:00+00:00'))])
+
+    def test_later_occurrence_is_busy(self):
+        musician = Musician.objects.create(
+            name='Player', email='player@example.invalid', age=30, category='Band', address='1 Road', city='Pune',
+            country='India', ratings=4, profileline='Plays', imageAddress='https://example.invalid/p.png')
+        self.weekly.musicians.add(musician)
+        response = self.client.get('/availability/', {
+            'emails': 'organiser@example.invalid,player@example.invalid', 'slot': '1h',
+            'from': self.DAY['start'], 'to': self.DAY['end']})
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = [(parse_datetime('2034-01-12T00:00:00+00:00'), parse_datetime('2034-01-12T20:00:00+00:00')),
+                    (parse_datetime('2034-01-12T22:00:00+00:00'), parse_datetime('2034-01-13T00:00:00+00:00'))]
+        for runs in [*response.json()['free'].values(), response.json()['common_free']]:
+            self.assertEqual([(parse_datetime(run['start']), parse_datetime(run['end'])) for run in runs], expected)
+
+    def test_one_off_on_a_later_occurrence_is_rejected(self):
+        response = self.client.post('/events/api/', event_data(
+            event_name='On top', location='Elsewhere',
+            event_start_date='2034-01-12T21:00:00+00:00', event_end_date='2034-01-12T23:00:00+00:00',
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'event_organiser_email': [f'Overlaps existing event(s) {self.weekly.pk}.']})
+
+    def test_recurring_event_over_a_later_one_off_is_rejected(self):
+        response = self.client.post('/events/api/', event_data(
+            event_name='Gala', event_organiser_email='other@example.invalid',
+            event_start_date='2034-02-03T20:00:00+00:00', event_end_date='2034-02-03T22:00:00+00:00',
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        gala = Event.objects.get(event_name='Gala')
+        # Fridays from the 20th: the third one is the gala's
+        response = self.client.post('/events/api/', event_data(
+            event_name='Fridays', event_organiser_email='third@example.invalid', recurrence='FREQ=WEEKLY',
+            time_zone='UTC', event_start_date='2034-01-20T20:30:00+00:00', event_end_date='2034-01-20T21:30:00+00:00',
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'location': [f'Overlaps existing event(s) {gala.pk}.']})
+
+    def test_range_includes_recurring_events_by_occurrence(self):
+        response = self.client.post('/events/api/', event_data(
+            event_name='One-off', location='Elsewhere', event_organiser_email='other@example.invalid',
+            event_start_date='2034-01-12T10:00:00+00:00', event_end_date='2034-01-12T11:00:00+00:00',
+        ), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.names('/events/range/'), ['Weekly', 'One-off'])
+
+
+class EndpointQueryTests(EventAppTestCase):
+    # The N+1 guard: a page of 100 rows runs the same queries as a page of 10
+
+    @classmethod
+    def setUpTestData(cls):
+        generators.seed(200)
+
+    def setUp(self):
+        super().setUp()
+        self.dataset = sample_dataset(50)
+
+    def get(self, url, queries, **params):
+        # Nothing cached, so every request reaches the database
+        for alias in caches:
+            caches[alias].clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_scenarios_stay_within_their_budgets(self):
+        results, problems = queries.check(SCENARIOS.values(), self.dataset)
+        self.assertEqual(problems, [], results)
+
+    def test_lists_run_the_same_queries_at_any_page_size(self):
+        start = timezone.now().isoformat()
+        end = (timezone.now() + datetime.timedelta(days=365)).isoformat()
+        for url, expected, params in [
+            ('/events/api/', 2, {}),
+            ('/events/range/', 4, {'start': start, 'end': end}),
+            ('/events/occurrences/', 3, {'start': start, 'end': end}),
+            ('/musicians/api/', 1, {}),
+            ('/eventorganizers/api/', 1, {}),
+            ('/musicians/search/', 1, {'country': 'India'}),
+        ]:
+            for size in (10, 100):
+                with self.subTest(url=url, page_size=size):
+                    self.get(url, expected, page_size=size, **params)
+
+    def test_details_run_a_fixed_number_of_queries(self):
+        organiser = EventOrganizer.objects.get(email=self.dataset.organiser_emails[0])
+        musician = Musician.objects.filter(events__isnull=False).first()
+        for url, expected, params in [
+            (f'/events/api/{self.dataset.event_ids[0]}/', 2, {}),
+            (f'/musicians/api/{musician.pk}/', 1, {}),
+            (f'/eventorganizers/api/{organiser.pk}/', 1, {}),
+            ('/events/filter-by-email/', 1, {'email': organiser.email}),
+            (f'/organizers/{organiser.pk}/stats/', 1, {}),
+            (f'/musicians/{musician.pk}/stats/', 1, {}),
+        ]:
+            with self.subTest(url=url):
+                self.get(url, expected, **params)
+
+
+class MusicianSearchTests(EventAppTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, (name, city, ratings, profileline) in enumerate([
+            ('Asha Drums', 'Pune', '4.90', 'Jazz drummer'),
+            ('Ravi Keys', 'Pune', '4.20', 'Jazz and soul pianist'),
+            ('Meera Strings', 'Mumbai', '4.90', 'Violinist'),
+            ('Dev Bass', 'Mumbai', '3.10', 'Funk bassist, some jazz'),
+            ('Tom Horn', 'Leeds', '5.00', 'Jazz trumpeter'),
+        ]):
+            Musician.objects.create(
+                name=name, email=f'musician{i}@example.invalid', age=30, category='Band', address='1 Road', city=city,
+                country='UK' if city == 'Leeds' else 'India', ratings=ratings, profileline=profileline,
+                imageAddress='https://example.invalid/p.png')
+
+    def names(self, **params):
+        response = self.client.get('/musicians/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_filters_come_back_best_rated_first(self):
+        self.assertEqual(self.names(country='India'), ['Meera Strings', 'Asha Drums', 'Ravi Keys', 'Dev Bass'])
+        self.assertEqual(self.names(country='India', city='Mumbai'), ['Meera Strings', 'Dev Bass'])
+        self.assertEqual(self.names(min_rating='4.5'), ['Tom Horn', 'Meera Strings', 'Asha Drums'])
+
+    def test_words_match_name_or_profileline_and_the_last_may_be_a_prefix(self):
+        self.assertEqual(self.names(q='jazz'), ['Tom Horn', 'Asha Drums', 'Ravi Keys', 'Dev Bass'])
+        self.assertEqual(self.names(q='jazz pian'), ['Ravi Keys'])
+        self.assertEqual(self.names(q='JAZZ', country='India', min_rating='4'), ['Asha Drums', 'Ravi Keys'])
+        self.assertEqual(self.names(q='drums'), ['Asha Drums'])
+        self.assertEqual(self.names(q='cello'), [])
+
+    def test_pages_follow_the_cursor_without_repeats(self):
+        for params in ({}, {'q': 'jazz'}):
+            with self.subTest(**params):
+                seen, url, query = [], '/musicians/search/', dict(params, page_size=2)
+                while url:
+                    body = self.client.get(url, query).json()
+                    seen += [row['name'] for row in body['results']]
+                    url, query = body['next'], None
+                self.assertEqual(seen, self.names(**params))
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/musicians/search/', {'min_rating': 'high'}).status_code, 400)
+        self.assertEqual(self.client.get('/musicians/search/', {'cursor': 'nonsense'}).status_code, 404)
+
+
+class NearbyTests(EventAppTestCase):
+    # Mumbai to Navi Mumbai is about 16 km, to Pune about 120 km and to Delhi about 1150 km
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, city in enumerate(['Delhi', 'Pune', 'Navi Mumbai', 'Mumbai']):
+            Musician.objects.create(
+                name=city, email=f'musician{i}@example.invalid', age=30, category='Band', address='1 Road', city=city,
+                country='India', ratings=4, profileline='Plays', imageAddress='https://example.invalid/p.png')
+
+    def nearby(self, url='/musicians/nearby/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['name'], row['distance_km']) for row in response.json()['results']]
+
+    def test_geohashes_and_boxes(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744), 'u4pruydqq')
+        # Across the antimeridian west comes out east of east
+        south, north, west, east = geo.bounding_box(-17.7, 179.9, 50)
+        self.assertLess(east, west)
+        ranges = geo.covering(south, north, west, east)
+        for longitude in (179.9, -179.9):
+            point = geo.encode(-17.7, longitude)
+            self.assertTrue(any(low <= point and (high is None or point < high) for low, high in ranges), longitude)
+
+    def test_rows_come_back_nearest_first_within_the_radius(self):
+        for radius, expected in [(5, ['Mumbai']), (50, ['Mumbai', 'Navi Mumbai']),
+                                 (200, ['Mumbai', 'Navi Mumbai', 'Pune']), (500, ['Mumbai', 'Navi Mumbai', 'Pune'])]:
+            with self.subTest(radius_km=radius):
+                found = self.nearby(near='Bombay', radius_km=radius)
+                self.assertEqual([name for name, _ in found], expected)
+                self.assertEqual(found[0][1], 0)
+                self.assertTrue(all(distance <= radius for _, distance in found))
+        pune = dict(self.nearby(lat='19.0760', lon='72.8777', radius_km=200))['Pune']
+        self.assertAlmostEqual(pune, 120, delta=5)
+        self.assertEqual(self.nearby(near='Pune', radius_km=500, limit=2), [('Pune', 0), ('Navi Mumbai', mock.ANY)])
+
+    def test_distances_match_without_numpy(self):
+        with_numpy = self.nearby(near='Delhi', radius_km=500)
+        caches['default'].clear()
+        with mock.patch.object(geo, 'np', None):
+            self.assertEqual(self.nearby(near='Delhi', radius_km=500), with_numpy)
+
+    def test_events_are_found_around_another_events_venue(self):
+        venue = Event.objects.create(**event_data(location='Pune'))
+        Event.objects.create(**event_data(event_name='B', location='Mumbai'))
+        self.assertEqual([name for name, _ in self.nearby('/musicians/nearby/', event=venue.pk, radius_km=150)],
+                         ['Pune', 'Navi Mumbai', 'Mumbai'])
+        self.assertEqual([row['event_name'] for row in self.client.get(
+            '/events/nearby/', {'event': venue.pk, 'radius_km': 150}).json()['results']], ['A', 'B'])
+
+    def test_bad_parameters_are_rejected(self):
+        for params in [{}, {'lat': '91', 'lon': '0'}, {'near': 'Atlantis'}, {'near': 'Pune', 'radius_km': '501'},
+                       {'near': 'Pune', 'limit': '0'}, {'event': '999999'}]:
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/musicians/nearby/', params).status_code, 400)
+
+
+@mock.patch.object(routers, '_choose_replica', return_value='replica')
+class ReplicaRouterTests(SimpleTestCase):
+    router = routers.ReplicaRouter()
+
+    def test_reads_stay_on_the_primary_unless_allowed(self, choose):
+        self.assertEqual(self.router.db_for_read(Event), DEFAULT_DB_ALIAS)
+        with routers.routing():
+            self.assertEqual(self.router.db_for_read(Event), DEFAULT_DB_ALIAS)
+        choose.assert_not_called()
+
+    def test_request_reads_from_one_replica(self, choose):
+        with routers.routing():
+            routers.allow_replica_reads()
+            self.assertEqual([self.router.db_for_read(Event), self.router.db_for_read(Musician)], ['replica'] * 2)
+        choose.assert_called_once()
+
+    def test_reads_after_a_write_go_to_the_primary(self, choose):
+        with routers.routing() as state:
+            routers.allow_replica_reads()
+            self.assertEqual(self.router.db_for_write(Event), DEFAULT_DB_ALIAS)
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.router.db_for_read(Event), DEFAULT_DB_ALIAS)
+
+    def test_reads_inside_a_transaction_go_to_the_primary(self, choose):
+        with routers.routing(), mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            routers.allow_replica_reads()
+            self.assertEqual(self.router.db_for_read(Event), DEFAULT_DB_ALIAS)
+
+
+@mock.patch.object(routers, 'REPLICAS', ['replica'])
+class ReplicaRoutingMiddlewareTests(EventAppTestCase):
+
+    def test_write_pins_the_client_to_the_primary(self):
+        response = self.client.post('/events/api/', event_data(), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], routers.STICKY_SECONDS)
+
+    def test_reads_may_use_a_replica_until_pinned(self):
+        with mock.patch.object(routers, 'allow_replica_reads') as allow:
+            self.client.get('/events/api/')
+            allow.assert_called_once()
+            self.assertNotIn(routers.PIN_COOKIE, self.client.cookies)
+            self.client.cookies[routers.PIN_COOKIE] = '1'
+            allow.reset_mock()
+            self.client.get('/events/api/')
+            allow.assert_not_called()
+
+
+class ReplicaFailoverTests(SimpleTestCase):
+
+    def setUp(self):
+        routers._down_until.clear()
+        self.addCleanup(routers._down_until.clear)
+
+    @mock.patch.object(routers, 'REPLICAS', ['replica'])
+    def test_an_unreachable_replica_is_left_out_for_a_while(self):
+        replica = mock.Mock(**{'ensure_connection.side_effect': DatabaseError('down')})
+        with mock.patch.object(routers, 'connections', {'replica': replica}), \
+                self.assertLogs('eventapp.db', 'WARNING'):
+            self.assertEqual(routers._choose_replica(), DEFAULT_DB_ALIAS)
+            self.assertEqual(routers._choose_replica(), DEFAULT_DB_ALIAS)
+        replica.ensure_connection.assert_called_once()
+        with mock.patch.object(routers, 'connections', {'replica': mock.Mock()}), \
+                mock.patch.object(routers.time, 'monotonic', return_value=routers.time.monotonic() + 31):
+            self.assertEqual(routers._choose_replica(), 'replica')
+
+
+class FastListTests(EventAppTestCase):
+    # The values_list() path must send the serializers' exact bytes
+
+    @classmethod
+    def setUpTestData(cls):
+        generators.seed(120)
+        # Rows the seed doesn't make: no place the gazetteer knows, several musicians, odd text
+        event = Event.objects.create(**event_data(event_name='Caf\u00e9 \u2028 "night"', location='Nowhere in particular'))
+        event.musicians.set(Musician.objects.order_by('-pk')[:3])
+
+    def assertSameBytes(self, url, **params):
+        responses = []
+        for fast in (True, False):
+            with mock.patch.object(mixins, 'FAST_SERIALIZATION', fast), \
+                    mock.patch.object(rendering, 'encoder_for', wraps=rendering.encoder_for) as encoder_for:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(encoder_for.called, fast)
+            responses.append(response)
+        fast, ordinary = responses
+        self.assertEqual(fast.content, ordinary.content)
+        self.assertEqual(fast['Content-Type'], ordinary['Content-Type'])
+        return fast.json()
+
+    def test_lists_match_the_serializers(self):
+        start = (timezone.now() - datetime.timedelta(days=800)).isoformat()
+        end = (timezone.now() + datetime.timedelta(days=800)).isoformat()
+        email = EventOrganizer.objects.filter(events__isnull=False).first().email
+        for url, params in [
+            ('/events/api/', {'page_size': 100}),
+            ('/events/range/', {'start': start, 'end': end, 'page_size': 100}),
+            ('/musicians/api/', {'page_size': 100}),
+            ('/musicians/search/', {'country': 'India'}),
+            ('/eventorganizers/api/', {}),
+            ('/events/filter-by-email/', {'email': email}),
+        ]:
+            with self.subTest(url=url):
+                body = self.assertSameBytes(url, **params)
+                rows = body['results'] if isinstance(body, dict) else body
+                self.assertTrue(rows)
+                next_url = body.get('next') if isinstance(body, dict) else None
+                if next_url:
+                    self.assertSameBytes(next_url)
+
+    def test_projections_and_unusual_rows_match(self):
+        body = self.assertSameBytes('/events/api/', fields='event_id,event_name,musicians,latitude', page_size=200)
+        self.assertIn('Caf\u00e9 \u2028 "night"', [row['event_name'] for row in body['results']])
+        self.assertEqual(set(body['results'][0]), {'event_id', 'event_name', 'musicians', 'latitude'})
+
+    def test_rows_the_encoder_cant_reproduce_take_the_ordinary_path(self):
+        Musician.objects.filter(pk=Musician.objects.order_by('pk').first().pk).update(latitude=1e-7)
+        self.assertSameBytes('/musicians/api/', page_size=100)
+
+
+class EventStatsTests(EventAppTestCase):
+    # Every write moves the summaries by deltas; recounting them from the events must agree
+
+    def setUp(self):
+        super().setUp()
+        self.organiser = EventOrganizer.objects.create(
+            name='Organiser', email='organiser@example.invalid', age=40, club_address='1 Road', city='City',
+            country='Country')
+        self.other = EventOrganizer.objects.create(
+            name='Other', email='other@example.invalid', age=40, club_address='2 Road', city='City', country='Country')
+        self.musicians = [Musician.objects.create(
+            name=f'Player {i}', email=f'player{i}@example.invalid', age=30, category='Band', address='1 Road',
+            city='City', country='Country', ratings=4, profileline='Plays', imageAddress='https://example.invalid/p.png')
+            for i in range(2)]
+
+    def at(self, days, **overrides):
+        start = (timezone.now() + datetime.timedelta(days=days)).replace(microsecond=0)
+        return event_data(event_start_date=start.isoformat(),
+                          event_end_date=(start + datetime.timedelta(hours=1)).isoformat(),
+                          location=f'Hall {days}', **overrides)
+
+    def create(self, days, **overrides):
+        response = self.client.post('/events/api/', self.at(days, event_name=f'Gig {days}', **overrides),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Event.objects.get(event_name=f'Gig {days}')
+
+    def snapshot(self):
+        # A recount also writes the empty rows of owners without events; those count as missing
+        return {summary.model.__name__: {
+            row.pk: (row.events_total, row.upcoming_events, row.next_event_start, row.events_per_month)
+            for row in summary.model.objects.exclude(events_total=0)
+        } for summary in (stats.ORGANISERS, stats.MUSICIANS)}
+
+    def assertMatchesRecount(self):
+        kept = self.snapshot()
+        for summary in (stats.ORGANISERS, stats.MUSICIANS):
+            self.assertEqual(stats.reconcile(summary, list(summary.owners.values_list('pk', flat=True))), 0)
+        self.assertEqual(kept, self.snapshot())
+
+    def test_deltas_match_a_recount_after_every_kind_of_write(self):
+        past, soon, later = self.create(-40), self.create(10), self.create(70)
+        self.assertMatchesRecount()
+        soon.musicians.set(self.musicians)
+        self.musicians[0].events.add(later)
+        self.assertMatchesRecount()
+        # Moved to another month, then handed to another organiser
+        response = self.client.put(f'/events/api/{soon.pk}/', self.at(100, event_name='Gig 10'),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertMatchesRecount()
+        response = self.client.patch(f'/events/api/{later.pk}/', {'event_organiser_email': self.other.email},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertMatchesRecount()
+        report = bulk.import_events(iter([
+            self.at(130, event_name='Bulk new', google_event_id=str(uuid.uuid4())),
+            self.at(-70, event_name='Bulk moved', google_event_id=soon.google_event_id),
+        ]))
+        self.assertEqual((report.created, report.updated, report.error_count), (1, 1, 0))
+        self.assertMatchesRecount()
+        self.musicians[1].events.clear()
+        self.assertEqual(self.client.delete(f'/events/api/{past.pk}/').status_code, 204)
+        with stats.deferred():
+            Event.objects.filter(pk=later.pk).delete()
+        self.assertMatchesRecount()
+
+        organiser = self.client.get(f'/organizers/{self.organiser.pk}/stats/').json()
+        self.assertEqual((organiser['events_total'], organiser['upcoming_events']), (2, 1))
+        self.assertEqual(sum(organiser['events_per_month'].values()), 2)
+        self.assertEqual(self.client.get(f'/musicians/{self.musicians[0].pk}/stats/').json()['events_total'], 1)
+        self.assertEqual(self.client.get('/musicians/999999/stats/').status_code, 404)
+
+    def test_reconcile_catches_writes_that_skip_signals(self):
+        event = self.create(10)
+        Event.objects.filter(pk=event.pk).update(event_organiser=self.other)
+        # Only rows that existed can have drifted; the other organiser's is built afresh
+        self.assertEqual(stats.reconcile(stats.ORGANISERS, [self.organiser.pk, self.other.pk]), 1)
+        self.assertEqual(self.organiser.stats.events_total, 0)
+        self.assertEqual(self.other.stats.events_total, 1)
+
+
+class AvailabilityTests(EventAppTestCase):
+    # Free time per person and in common, from events they organise or play
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = (timezone.now() + datetime.timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+        drummer = Musician.objects.create(
+            name='Drummer', email='drummer@example.invalid', age=30, category='Drums', address='1 Road', city='City',
+            country='Country', ratings=4, profileline='Drums', imageAddress='https://example.invalid/drummer.png')
+        organised = Event.objects.create(**event_data(event_start_date=cls.at(10), event_end_date=cls.at(12)))
+        played = Event.objects.create(**event_data(
+            event_name='B', location='Other hall', event_organiser_email='other@example.invalid',
+            event_start_date=cls.at(11, 30), event_end_date=cls.at(13)))
+        played.musicians.add(drummer)
+        cls.emails = 'organiser@example.invalid,drummer@example.invalid'
+
+    @classmethod
+    def at(cls, hour, minute=0):
+        return cls.day + datetime.timedelta(hours=hour, minutes=minute)
+
+    def get(self, **params):
+        params = dict({'emails': self.emails, 'from': self.at(9).isoformat(), 'to': self.at(15).isoformat(),
+                       'slot': '1h'}, **params)
+        return self.client.get('/availability/', params)
+
+    def runs(self, runs):
+        return [(parse_datetime(run['start']), parse_datetime(run['end'])) for run in runs]
+
+    def test_free_slots_per_person_and_in_common(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200, response.content)
+        free = response.json()
+        self.assertEqual(self.runs(free['free']['organiser@example.invalid']),
+                         [(self.at(9), self.at(10)), (self.at(12), self.at(15))])
+        # Busy from 11:30, so the whole 11:00 slot is taken
+        self.assertEqual(self.runs(free['free']['drummer@example.invalid']),
+                         [(self.at(9), self.at(11)), (self.at(13), self.at(15))])
+        self.assertEqual(self.runs(free['common_free']), [(self.at(9), self.at(10)), (self.at(13), self.at(15))])
+
+    @unittest.skipIf(availability.np is None, 'numpy is not installed')
+    def test_bitmap_and_sweep_line_agree(self):
+        busy = availability.local_busy(self.emails.split(','), self.at(0), self.at(24))
+        slot = datetime.timedelta(minutes=25)
+        self.assertEqual(availability.free_slots(busy, self.at(0), self.at(24), slot, vectorized=True),
+                         availability.free_slots(busy, self.at(0), self.at(24), slot, vectorized=False))
+
+    def test_bad_requests_are_rejected(self):
+        too_many = ','.join(f'person{i}@example.invalid' for i in range(availability.MAX_PEOPLE + 1))
+        for params in [{'emails': ''}, {'emails': too_many}, {'slot': '2m'}, {'to': self.at(8).isoformat()},
+                       {'to': (self.at(9) + availability.MAX_WINDOW + datetime.timedelta(days=1)).isoformat()}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+    def test_google_busy_time_is_merged(self):
+        service = mock.Mock()
+        service.freebusy().query().execute.return_value = {'calendars': {'organiser@example.invalid': {'busy': [
+            {'start': self.at(14).isoformat(), 'end': self.at(15).isoformat()}]}}}
+        with mock.patch('eventapp.views.create_google_service', return_value=service):
+            free = self.get(google='1').json()
+        self.assertEqual(self.runs(free['free']['organiser@example.invalid']),
+                         [(self.at(9), self.at(10)), (self.at(12), self.at(14))])
+        service.freebusy().query().execute.assert_called_once_with(num_retries=availability.MAX_RETRIES)
+
+
+class BulkTests(EventAppTestCase):
+    # Uploads are written chunk by chunk, so a bad row is reported rather than failing the rest
+
+    def later(self, days, **overrides):
+        start = (timezone.now() + datetime.timedelta(days=days)).replace(microsecond=0)
+        return event_data(event_start_date=start.isoformat(),
+                          event_end_date=(start + datetime.timedelta(hours=1)).isoformat(), **overrides)
+
+    def test_unparseable_rows_are_reported_and_the_rest_imported(self):
+        rows = [json.dumps(event_data(event_name='First')).encode(), b'{not json',
+                json.dumps(self.later(31, event_name='Third', event_organiser_email='third@example.invalid')).encode()]
+        report = bulk.import_events(bulk.parse_ndjson(rows), chunk_size=1)
+        self.assertEqual((report.created, report.error_count), (2, 1))
+        self.assertEqual(report.errors[0]['row'], 2)
+        self.assertEqual(CalendarOutbox.objects.count(), 2)
+
+    def test_repeated_ids_are_reported_across_chunks(self):
+        key = str(uuid.uuid4())
+        rows = [self.later(31, event_name='First', google_event_id=key, event_organiser_email='first@example.invalid'),
+                self.later(32, event_name='Repeat in the same chunk', google_event_id=key,
+                           event_organiser_email='second@example.invalid'),
+                self.later(33, event_name='Other', event_organiser_email='other@example.invalid'),
+                self.later(34, event_name='Repeat in a later chunk', google_event_id=key,
+                           event_organiser_email='fourth@example.invalid')]
+        report = bulk.import_events(iter(rows), chunk_size=3)
+        self.assertEqual((report.created, [error['row'] for error in report.errors]), (2, [2, 4]))
+        self.assertEqual(report.errors[0]['errors'], {'google_event_id': ['Repeats an earlier row of this upload.']})
+        self.assertEqual(Event.objects.get(google_event_id=key).event_name, 'First')
+
+    def test_unknown_ics_time_zone_is_reported_against_its_row(self):
+        upload = (b'BEGIN:VCALENDAR\r\n'
+                  b'BEGIN:VEVENT\r\nSUMMARY:Mars\r\nDTSTART;TZID=Mars/Olympus:20340112T200000\r\nEND:VEVENT\r\n'
+                  b'BEGIN:VEVENT\r\nSUMMARY:Earth\r\nLOCATION:Test hall\r\nDESCRIPTION:Test gig\r\n'
+                  b'DTSTART;TZID=Europe/Paris:20340112T200000\r\nDTEND;TZID=Europe/Paris:20340112T220000\r\n'
+                  b'ORGANIZER;CN=Organiser:mailto:organiser@example.invalid\r\nEND:VEVENT\r\n'
+                  b'END:VCALENDAR\r\n')
+        response = self.client.post('/events/bulk/?type=ics', upload, content_type='text/calendar')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['errors'], [
+            {'row': 1, 'errors': {'DTSTART': ["'Mars/Olympus' is not an IANA time zone name."]}}])
+        self.assertEqual(list(Event.objects.values_list('event_name', flat=True)), ['Earth'])
+
+    def test_ics_export_imports_back_unchanged(self):
+        name = 'The "Quoted"; Band: live'
+        description = 'Bring C:\\new folder\\; doors at 8,\nno re-entry'
+        response = self.client.post('/events/api/', event_data(event_organiser_name=name, description=description),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.get('/events/bulk/', {'type': 'ics'})
+        lines = b''.join(response.streaming_content).splitlines(True)
+        self.assertIn(b'ORGANIZER;CN="The ^\'Quoted^\'; Band: live":mailto:organiser@example.invalid\r\n', lines)
+        [event] = bulk.parse_ics(lines)
+        self.assertEqual((event['event_organiser_name'], event['description']), (name, description))
+
+
+class OrganiserEventsTests(EventAppTestCase):
+    # Events follow their organiser by foreign key, resolved from the email
+
+    def post(self, days, name):
+        start = (timezone.now() + datetime.timedelta(days=days)).replace(microsecond=0)
+        response = self.client.post('/events/api/', event_data(
+            event_name=name, event_start_date=start.isoformat(),
+            event_end_date=(start + datetime.timedelta(hours=2)).isoformat()), content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Event.objects.get(event_name=name)
+
+    def names(self):
+        response = self.client.get('/events/filter-by-email/', {'email': 'organiser@example.invalid'})
+        return [event['event_name'] for event in response.json()]
+
+    def test_events_before_and_after_the_profile_are_listed_and_linked(self):
+        early = self.post(40, 'Before the profile')
+        self.assertIsNone(early.event_organiser)
+        self.assertEqual(self.names(), ['Before the profile'])
+        UserCredentials.objects.create(email='organiser@example.invalid', category='event organizer',
+                                       password='unused')
+        response = self.client.post('/eventorganizers/api/', {
+            'name': 'Organiser', 'email': 'organiser@example.invalid', 'age': 40, 'club_address': '1 Road',
+            'city': 'City', 'country': 'Country', 'profileline': 'Promoter', 'imageaddress': 'https://example.invalid/o.png',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        organiser = EventOrganizer.objects.get(email='organiser@example.invalid')
+        self.assertEqual(Event.objects.get(pk=early.pk).event_organiser, organiser)
+        self.assertEqual(self.post(30, 'After the profile').event_organiser, organiser)
+        self.assertEqual(self.names(), ['After the profile', 'Before the profile'])
+
+    def test_unlinked_events_of_other_organisers_are_not_listed(self):
+        self.post(30, 'Mine')
+        Event.objects.create(**event_data(event_name='Theirs', location='Other hall',
+                                          event_organiser_email='other@example.invalid'))
+        self.assertEqual(self.names(), ['Mine'])
+
+
+class LoginTests(EventAppTestCase):
+    # Hashed passwords, upgraded on login, and the profile read per login or from a shared cache
+
+    def setUp(self):
+        super().setUp()
+        # A test-sized work factor; stored hashes follow it like they follow the setting
+        patcher = mock.patch.object(login.PBKDF2PasswordHasher, 'iterations', 1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.musician = Musician.objects.create(
+            name='Drummer', email='drummer@example.invalid', age=30, category='Drums', address='1 Road', city='City',
+            country='Country', ratings=4, profileline='Drums', imageAddress='https://example.invalid/drummer.png')
+
+    def sign_in(self, password='secret'):
+        return self.client.post('/login/', {'email': 'drummer@example.invalid', 'password': password},
+                                content_type='application/json')
+
+    def credentials(self, password):
+        return UserCredentials.objects.create(email='drummer@example.invalid', category='musician', password=password)
+
+    def test_registration_stores_a_hash_and_never_returns_it(self):
+        response = self.client.post('/user-credentials/create/', {
+            'email': 'drummer@example.invalid', 'category': 'musician', 'password': 'secret'},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertNotIn('password', response.json()['user_credentials'])
+        stored = UserCredentials.objects.get().password
+        self.assertTrue(stored.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(self.sign_in().json()['details']['name'], 'Drummer')
+
+    def test_plain_text_password_is_hashed_on_first_login(self):
+        credentials = self.credentials('secret')
+        self.assertEqual(self.sign_in('wrong').status_code, 401)
+        self.assertEqual(UserCredentials.objects.get(pk=credentials.pk).password, 'secret')
+        self.assertEqual(self.sign_in().status_code, 200)
+        stored = UserCredentials.objects.get(pk=credentials.pk).password
+        self.assertTrue(login.is_hashed(stored))
+        self.assertTrue(hashers.check_password('secret', stored))
+        self.assertEqual(self.sign_in().status_code, 200)
+
+    def test_hash_at_another_work_factor_is_upgraded(self):
+        old = hashers.PBKDF2PasswordHasher().encode('secret', hashers.PBKDF2PasswordHasher().salt(), iterations=500)
+        credentials = self.credentials(old)
+        self.assertEqual(self.sign_in().status_code, 200)
+        self.assertTrue(UserCredentials.objects.get(pk=credentials.pk).password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_unknown_email_still_pays_for_a_hash(self):
+        with mock.patch.object(login.hashers, 'make_password', wraps=hashers.make_password) as make_password:
+            response = self.client.post('/login/', {'email': 'nobody@example.invalid', 'password': 'secret'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        make_password.assert_called_once_with('secret')
+
+    def test_profile_is_read_per_login_without_a_shared_cache(self):
+        self.credentials(hashers.make_password('secret'))
+        self.sign_in()
+        Musician.objects.filter(pk=self.musician.pk).update(name='Renamed elsewhere')
+        self.assertEqual(self.sign_in().json()['details']['name'], 'Renamed elsewhere')
+
+    @mock.patch.object(login, 'PROFILE_CACHE_ALIAS', 'default')
+    def test_shared_cache_serves_profiles_until_they_change(self):
+        self.credentials(hashers.make_password('secret'))
+        self.sign_in()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.sign_in().json()['details']['name'], 'Drummer')
+        self.assertEqual(len(queries), 1)
+        self.musician.name = 'Renamed'
+        self.musician.save()
+        self.assertEqual(self.sign_in().json()['details']['name'], 'Renamed')
+
+
+class ResponseCacheTests(EventAppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+
+    def test_local_memory_cache_is_refused(self):
+        with override_settings(RESPONSE_CACHE_ALIAS='default', LOGIN_PROFILE_CACHE_ALIAS='default'):
+            self.assertEqual([error.id for error in check_response_cache(None)], ['eventapp.E001', 'eventapp.E002'])
+        with override_settings(RESPONSE_CACHE_ALIAS=None, LOGIN_PROFILE_CACHE_ALIAS=None):
+            self.assertEqual(check_response_cache(None), [])
+
+    def test_uncached_responses_follow_every_write(self):
+        self.assertEqual(self.client.post('/events/api/', event_data(), content_type='application/json').status_code, 201)
+        response = self.client.get('/events/api/')
+        self.assertNotIn('ETag', response)
+        Event.objects.update(event_name='Changed without signals')
+        self.assertEqual(self.client.get('/events/api/').json()['results'][0]['event_name'], 'Changed without signals')
+
+    @mock.patch.object(caching, 'CACHE_ALIAS', 'default')
+    def test_cached_responses_are_revalidated_after_a_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/events/api/', event_data(), content_type='application/json')
+        etag = self.client.get('/events/api/')['ETag']
+        self.assertEqual(self.client.get('/events/api/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        event = Event.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/events/api/{event.pk}/', {'event_name': 'B'}, content_type='application/json')
+        response = self.client.get('/events/api/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['event_name'], 'B')
+
+
+class MetricsTests(EventAppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for metric in metrics.REGISTRY:
+            metric.reset()
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.post('/events/api/', event_data(), content_type='application/json')
+        response = self.client.get('/events/api/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", ')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('# TYPE eventapp_http_request_duration_seconds histogram', body)
+        self.assertIn('eventapp_http_request_duration_seconds_count{method="GET",route="events/api/",status="200"} 1', body)
+        self.assertIn('eventapp_http_request_duration_seconds_count{method="POST",route="events/api/",status="201"} 1', body)
+        self.assertRegex(body, r'eventapp_http_request_db_queries_sum\{method="GET",route="events/api/"\} [1-9]')
+        self.assertIn('eventapp_http_request_duration_seconds_bucket{method="GET",route="events/api/",status="200",le="+Inf"} 1',
+                      body)
+
+    def test_calendar_calls_are_counted_by_status(self):
+        class NotFound(Exception):
+            resp = mock.Mock(status=404)
+
+        with metrics.calendar_call('insert'):
+            pass
+        with self.assertRaises(NotFound), metrics.calendar_call('insert'):
+            raise NotFound()
+        with self.assertRaises(TimeoutError), metrics.calendar_call('get'):
+            raise TimeoutError()
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('eventapp_calendar_requests_total{operation="insert",status="200"} 1', body)
+        self.assertIn('eventapp_calendar_requests_total{operation="insert",status="404"} 1', body)
+        self.assertIn('eventapp_calendar_requests_total{operation="get",status="TimeoutError"} 1', body)
+        self.assertIn('eventapp_calendar_request_duration_seconds_count{operation="insert"} 2', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('kind',), buckets=(1, 5))
+        metrics.REGISTRY.remove(histogram)
+        for value in (0.5, 3, 3, 9):
+            histogram.observe(value, 'a"b')
+        self.assertEqual(histogram.render()[2:], [
+            'eventapp_test_seconds_bucket{kind="a\\"b",le="1"} 1',
+            'eventapp_test_seconds_bucket{kind="a\\"b",le="5"} 3',
+            'eventapp_test_seconds_bucket{kind="a\\"b",le="+Inf"} 4',
+            'eventapp_test_seconds_sum{kind="a\\"b"} 15.5',
+            'eventapp_test_seconds_count{kind="a\\"b"} 4',
+        ])
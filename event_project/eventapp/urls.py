@@ -1,14 +1,28 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 from .views import (
     EventListCreateAPIView,
+    EventRangeAPIView,
+    EventOccurrencesAPIView,
+    EventNearbyAPIView,
+    EventBulkAPIView,
     EventRetrieveUpdateDestroyAPIView,
     MusicianListCreateAPIView,
+    MusicianSearchAPIView,
+    MusicianNearbyAPIView,
     MusicianRetrieveUpdateDestroyAPIView,
+    MusicianStatsAPIView,
     EventOrganizerListCreateAPIView,
     EventOrganizerRetrieveUpdateDestroyAPIView,
+    OrganizerStatsAPIView,
     UserCredentialsCreateView,
     UserLoginAPIView,
     EventFilterByEmailAPIView,
+    AvailabilityAPIView,
+    CalendarOutboxMetricsAPIView,
+    CalendarOutboxFlushView,
+    CalendarWebhookView,
+    MetricsView,
 )
 
 urlpatterns = [
@@ -18,14 +32,24 @@ urlpatterns = [
     path('events/delete/<int:pk>/', EventRetrieveUpdateDestroyAPIView.as_view(), name='event_delete'),
     path('events/api/', EventListCreateAPIView.as_view(), name='api_event_list_create'), #it creates the event
     path('events/api/<int:pk>/', EventRetrieveUpdateDestroyAPIView.as_view(), name='api_event_detail'),
+    path('events/range/', EventRangeAPIView.as_view(), name='event_range'),
+    path('events/occurrences/', EventOccurrencesAPIView.as_view(), name='event_occurrences'),
+    path('events/nearby/', EventNearbyAPIView.as_view(), name='event_nearby'),
+    path('events/bulk/', EventBulkAPIView.as_view(), name='event_bulk'),
 
 
     # CRUD operations for musicians using class-based views
     path('musicians/', MusicianListCreateAPIView.as_view(), name='musician_list'),
+    # Filter by place and rating, full-text over name/profileline, best rated first
+    path('musicians/search/', MusicianSearchAPIView.as_view(), name='musician_search'),
+    # Nearest first within ?radius_km= of ?lat=&lon=, an ?event= venue or a ?near= place
+    path('musicians/nearby/', MusicianNearbyAPIView.as_view(), name='musician_nearby'),
     path('musicians/update/<int:pk>/', MusicianRetrieveUpdateDestroyAPIView.as_view(), name='musician_update'),
     path('musicians/delete/<int:pk>/', MusicianRetrieveUpdateDestroyAPIView.as_view(), name='musician_delete'),
     path('musicians/api/', MusicianListCreateAPIView.as_view(), name='musician_list_create'),
     path('musicians/api/<int:pk>/', MusicianRetrieveUpdateDestroyAPIView.as_view(), name='musician_retrieve_update_destroy'),
+    # Events played in total, upcoming, the next one and per month (see stats.py)
+    path('musicians/<int:pk>/stats/', MusicianStatsAPIView.as_view(), name='musician_stats'),
 
     # CRUD operations for event organizers using class-based views
     path('eventorganizers/', EventOrganizerListCreateAPIView.as_view(), name='event_organizer_list'),
@@ -33,6 +57,8 @@ urlpatterns = [
     path('eventorganizers/delete/<int:pk>/', EventOrganizerRetrieveUpdateDestroyAPIView.as_view(), name='event_organizer_delete'),
     path('eventorganizers/api/', EventOrganizerListCreateAPIView.as_view(), name='event_organizer_list_create'),
     path('eventorganizers/api/<int:pk>/', EventOrganizerRetrieveUpdateDestroyAPIView.as_view(), name='event_organizer_retrieve_update_destroy'),
+    # Events organised in total, upcoming, the next one and per month (see stats.py)
+    path('organizers/<int:pk>/stats/', OrganizerStatsAPIView.as_view(), name='organizer_stats'),
 
     # CRUD operations for User Credentials using class-based views
     path('user-credentials/create/', UserCredentialsCreateView.as_view(), name='user_credentials_create'),
@@ -40,4 +66,17 @@ urlpatterns = [
 
     # API endpoint for filtering events by email
     path('events/filter-by-email/', EventFilterByEmailAPIView.as_view(), name='event_filter_by_email'),
+
+    # Free/busy for musicians and organisers
+    path('availability/', AvailabilityAPIView.as_view(), name='availability'),
+
+    # Google Calendar sync queue depth and drain rate
+    path('calendar/outbox/metrics/', CalendarOutboxMetricsAPIView.as_view(), name='calendar_outbox_metrics'),
+    # Push pending outbox rows now, concurrently (async view)
+    path('calendar/outbox/flush/', csrf_exempt(CalendarOutboxFlushView.as_view()), name='calendar_outbox_flush'),
+    # Push notifications from Google Calendar channels (see manage.py calendar_watch)
+    path('calendar/webhook/', csrf_exempt(CalendarWebhookView.as_view()), name='calendar_webhook'),
+
+    # Request latency, query counts and Calendar call latency in the Prometheus text format
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
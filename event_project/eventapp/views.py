@@ -1,100 +1,281 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
-from .serializers import EventSerializer, MusicianSerializer, EventOrganizerSerializer, UserCredentialsSerializer, EventNameSerializer
+from .serializers import EventSerializer, MusicianSerializer, EventOrganizerSerializer, UserCredentialsSerializer, EventNameSerializer, EventOccurrenceSerializer, OrganizerStatsSerializer, MusicianStatsSerializer
 from .models import Event, Musician, EventOrganizer, UserCredentials
 from rest_framework.views import APIView
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-import pickle
-import os.path
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from . import availability, bulk, calendar_watch, gazetteer, geo, login, metrics, outbox, ratelimit, recurrence, search, stats
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from .calendar_accounts import calendar_for
+from .calendar_async import AsyncCalendarClient
+from .caching import CachedResponseMixin
+from .mixins import FastListMixin, FieldProjectionMixin
+from .pagination import KeysetPagination, RatingCursorPagination, StartDateCursorPagination
+from .ranges import overlapping_events
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .calendar_service import get_calendar_service
+from .calendar_sync import (
+    CALENDAR_ID, DELETE, INSERT, SYNC_FIELDS, UPDATE, event_body, google_id, is_conflict, plan_update, remember_push,
+)
+from googleapiclient.errors import HttpError
+import hmac
 import uuid
 
-# Event Views
-SCOPES = ['https://www.googleapis.com/auth/calendar']
+def query_datetime(request, name):
+    value = request.query_params.get(name)
+    parsed = parse_datetime(value) if value else None
+    if parsed is None:
+        raise ValidationError({name: 'Expected an ISO 8601 datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def query_window(request, start_name, end_name):
+    start, end = query_datetime(request, start_name), query_datetime(request, end_name)
+    if start > end:
+        raise ValidationError({end_name: f'{end_name} should be after {start_name}.'})
+    return start, end
 
-def authenticate():
-    creds = None
-    if os.path.exists('token.pickle'):
+def query_float(request, name, low, high, default=None):
+    value = request.query_params.get(name)
+    if value is None and default is not None:
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not low <= number <= high:
+        raise ValidationError({name: f'Expected a number from {low} to {high}.'})
+    return number
+
+def query_origin(request):
+    # ?lat=&lon=, ?event=<id> for that event's venue, or ?near=<place name>
+    params = request.query_params
+    if 'event' in params:
         try:
-            with open('token.pickle', 'rb') as token:
-                creds = pickle.load(token)
-        except Exception as e:
-            print(f"Error loading credentials: {e}")
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                print(f"Error refreshing token: {e}")
-        else:
-            try:
-                flow = InstalledAppFlow.from_client_secrets_file('eventapp/credentials.json', SCOPES)
-                creds = flow.run_local_server(port=0)
-            except Exception as e:
-                print(f"Error running local server: {e}")
-            else:
-                with open('token.pickle', 'wb') as token:
-                    pickle.dump(creds, token)
-    return creds
+            event = Event.objects.only('latitude', 'longitude').get(pk=int(params['event']))
+        except (ValueError, Event.DoesNotExist):
+            raise ValidationError({'event': 'No such event.'})
+        if event.latitude is None:
+            raise ValidationError({'event': "The event's location isn't a place the gazetteer knows."})
+        return event.latitude, event.longitude
+    if 'near' in params:
+        found = gazetteer.get_gazetteer().geocode(params['near'])
+        if found is None:
+            raise ValidationError({'near': 'Not a place the gazetteer knows.'})
+        return found
+    if 'lat' not in params and 'lon' not in params:
+        raise ValidationError({'lat': 'Pass ?lat= and ?lon=, ?near=<place> or ?event=<id>.'})
+    return query_float(request, 'lat', -90, 90), query_float(request, 'lon', -180, 180)
+
+class NearbyListMixin:
+    # ?lat=&lon= (or ?event=, ?near=), ?radius_km= (default 50) and ?limit=; nearest first
+    def list(self, request, *args, **kwargs):
+        latitude, longitude = query_origin(request)
+        radius = query_float(request, 'radius_km', 0, geo.MAX_RADIUS_KM, default=geo.DEFAULT_RADIUS_KM)
+        limit = int(query_float(request, 'limit', 1, geo.MAX_RESULTS, default=geo.DEFAULT_RESULTS))
+        found = geo.nearby(self.get_queryset(), latitude, longitude, radius, limit)
+        results = self.get_serializer([row for row, _ in found], many=True).data
+        for result, (_, distance) in zip(results, found):
+            result['distance_km'] = round(distance, 3)
+        return Response({
+            'origin': {'latitude': latitude, 'longitude': longitude},
+            'radius_km': radius,
+            'results': results,
+        }, status=status.HTTP_200_OK)
 
+# Event Views
 def create_google_service():
-    creds = authenticate()
-    return build('calendar', 'v3', credentials=creds)
+    # Reuses the process-wide credentials and this thread's cached service
+    return get_calendar_service()
 
 def generate_unique_google_event_id():
     return str(uuid.uuid4())
 
 def create_event(service, event):
-    event_data = {
-        'summary': event.event_name,
-        'location': event.location,
-        'description': event.description,
-        'start': {'dateTime': event.event_start_date.isoformat(), 'timeZone': 'Asia/Kolkata'},
-        'end': {'dateTime': event.event_end_date.isoformat(), 'timeZone': 'Asia/Kolkata'},
-    }
-    created_event = service.events().insert(calendarId='primary', body=event_data).execute()
+    event_data = dict(event_body(event), id=google_id(event.google_event_id))
+    calendar_id = calendar_for(event.calendar_account, event.calendar_id)
+    created_event = ratelimit.execute(service.events().insert(calendarId=calendar_id, body=event_data))
     event_id = created_event['id']
     return event_id
 
 def update_event(service, event_id, event):
-    event_data = {
-        'summary': event.event_name,
-        'location': event.location,
-        'description': event.description,
-        'start': {'dateTime': event.event_start_date.isoformat(), 'timeZone': 'Asia/Kolkata'},
-        'end': {'dateTime': event.event_end_date.isoformat(), 'timeZone': 'Asia/Kolkata'},
-    }
-    service.events().update(calendarId='primary', eventId=event_id, body=event_data).execute()
-
-def delete_event(service, event_id):
-    service.events().delete(calendarId='primary', eventId=event_id).execute()
-
-class EventListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Event.objects.all()
+    body, hashes, patch = plan_update(event)
+    if body is None:
+        return
+    events = service.events()
+    calendar_id = calendar_for(event.calendar_account, event.calendar_id)
+    method = events.patch if patch else events.update
+    request = method(calendarId=calendar_id, eventId=event_id, body=body)
+    if event.google_etag:
+        request.headers['If-Match'] = event.google_etag
+    try:
+        response = ratelimit.execute(request)
+    except HttpError as e:
+        if not is_conflict(e):
+            raise
+        response = ratelimit.execute(events.update(calendarId=calendar_id, eventId=event_id, body=event_body(event)))
+    remember_push(event, hashes, response)
+    # Bookkeeping only: skip the save signals and their cache invalidation
+    Event.objects.filter(pk=event.pk).update(**{field: getattr(event, field) for field in SYNC_FIELDS})
+
+def delete_event(service, event_id, calendar_id=CALENDAR_ID):
+    ratelimit.execute(service.events().delete(calendarId=calendar_id, eventId=event_id))
+
+class EventListCreateAPIView(CachedResponseMixin, FieldProjectionMixin, FastListMixin, generics.ListCreateAPIView):
+    cache_models = (Event, Musician, EventOrganizer)
+    queryset = Event.objects.prefetch_related('musicians')
     serializer_class = EventSerializer
+    pagination_class = KeysetPagination
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # The Google write is queued with the row and pushed by calendar_sync_worker
+            with transaction.atomic():
+                event = serializer.save()
+                outbox.enqueue(event, INSERT)
             return Response({"message": "Event created successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class EventRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Event.objects.all()
+class EventRangeAPIView(CachedResponseMixin, FieldProjectionMixin, FastListMixin, generics.ListAPIView):
+    cache_models = (Event, Musician, EventOrganizer)
     serializer_class = EventSerializer
+    pagination_class = StartDateCursorPagination
+
+    def get_queryset(self):
+        start, end = query_window(self.request, 'start', 'end')
+        location = self.request.query_params.get('location')
+        # Recurring events are in the range when any of their occurrences is, not just the first
+        series = {occurrence.event.pk for occurrence in recurrence.recurring_between(start, end, location=location)}
+        one_offs = overlapping_events(start, end, location=location).filter(recurrence='')
+        return (one_offs | Event.objects.filter(pk__in=series)).prefetch_related('musicians')
+
+class EventOccurrencesAPIView(CachedResponseMixin, generics.ListAPIView):
+    # Every occurrence in ?start=&end=, recurring events expanded; at most a year at a time
+    cache_models = (Event,)
+    serializer_class = EventOccurrenceSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        start, end = query_window(self.request, 'start', 'end')
+        if end - start > availability.MAX_WINDOW:
+            raise ValidationError({'end': 'The window can be at most 366 days.'})
+        return recurrence.occurrences_between(start, end, location=self.request.query_params.get('location'))
+
+class EventNearbyAPIView(NearbyListMixin, CachedResponseMixin, generics.ListAPIView):
+    cache_models = (Event, Musician, EventOrganizer)
+    queryset = Event.objects.prefetch_related('musicians')
+    serializer_class = EventSerializer
+
+class EventBulkAPIView(APIView):
+    # POST streams an NDJSON/CSV/ICS upload into the table; GET streams the table out.
+    # ?type= picks the format (DRF reserves ?format= for renderers).
+    def post(self, request, *args, **kwargs):
+        kind = request.query_params.get('type') or bulk.detect_format(request.content_type)
+        if kind not in bulk.PARSERS:
+            return Response({"error": "Send application/x-ndjson, text/csv or text/calendar"},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        # Rows that can't be parsed are reported with the rest; earlier chunks are already saved
+        report = bulk.import_events(bulk.PARSERS[kind](request.stream or []))
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+    def get(self, request, *args, **kwargs):
+        kind = request.query_params.get('type', 'ndjson')
+        if kind not in bulk.EXPORTERS:
+            raise ValidationError({'type': 'Expected ndjson, csv or ics.'})
+        response = StreamingHttpResponse(
+            bulk.EXPORTERS[kind](bulk.export_rows(Event.objects.all())),
+            content_type=bulk.CONTENT_TYPES[kind],
+        )
+        response['Content-Disposition'] = f'attachment; filename="events.{kind}"'
+        return response
+
+class EventRetrieveUpdateDestroyAPIView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_models = (Event, Musician, EventOrganizer)
+    queryset = Event.objects.prefetch_related('musicians')
+    serializer_class = EventSerializer
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            event = serializer.save()
+            outbox.enqueue(event, UPDATE)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            outbox.enqueue(instance, DELETE)
+            instance.delete()
 
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response({"message": "Event deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
+
+class CalendarOutboxFlushView(View):
+    # A plain async Django view (DRF views are sync-only): under ASGI one request can
+    # keep hundreds of Calendar calls in flight without holding a thread per call
+    MAX_LIMIT = 1000
+
+    async def post(self, request, *args, **kwargs):
+        # Callers prove they're the operator with the shared secret; unset, the view is off
+        token = settings.CALENDAR_OUTBOX_FLUSH_TOKEN
+        given = request.headers.get('X-Flush-Token', '')
+        if not token or not hmac.compare_digest(given.encode(), token.encode()):
+            return JsonResponse({'error': 'A valid X-Flush-Token header is required'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            limit = int(request.GET.get('limit', 500))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.MAX_LIMIT:
+            return JsonResponse({'error': f'limit should be an integer from 1 to {self.MAX_LIMIT}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        rows = await sync_to_async(outbox.claim)(limit)
+        async with AsyncCalendarClient(max_retries=0, limiter=ratelimit.get_limiter()) as client:
+            done, failed = await outbox.process_async(rows, client)
+        return JsonResponse({'claimed': len(rows), 'synced': done, 'failed': failed}, status=status.HTTP_200_OK)
+
+class CalendarWebhookView(View):
+    # Google's push notifications: an empty POST described by X-Goog-* headers. Only
+    # marks the calendar for calendar_watch to pull, so it answers in a query or two
+    def post(self, request, *args, **kwargs):
+        try:
+            calendar_watch.notify(request.headers.get('X-Goog-Channel-ID'),
+                                  request.headers.get('X-Goog-Channel-Token'),
+                                  request.headers.get('X-Goog-Resource-State'))
+        except calendar_watch.InvalidNotification as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+class MetricsView(View):
+    # Prometheus scrape endpoint; see metrics.py and middleware.MetricsMiddleware
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+class CalendarOutboxMetricsAPIView(APIView):
+    # Up to a day: processed rows are kept, so a longer window only scans more of them
+    MAX_WINDOW = 24 * 3600
+
+    def get(self, request, *args, **kwargs):
+        try:
+            window = int(request.query_params.get('window', 60))
+        except ValueError:
+            window = 0
+        if not 1 <= window <= self.MAX_WINDOW:
+            raise ValidationError({'window': f'Expected a number of seconds from 1 to {self.MAX_WINDOW}.'})
+        return Response(outbox.metrics(window=window), status=status.HTTP_200_OK)
     
 # Musician views
-class MusicianListCreateAPIView(generics.ListCreateAPIView):
+class MusicianListCreateAPIView(CachedResponseMixin, FieldProjectionMixin, FastListMixin, generics.ListCreateAPIView):
+    cache_models = (Musician,)
     queryset = Musician.objects.all()
     serializer_class = MusicianSerializer
+    pagination_class = KeysetPagination
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -111,15 +292,42 @@ class MusicianListCreateAPIView(generics.ListCreateAPIView):
                 return Response({"error": "Email not found in User Credentials"}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class MusicianRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class MusicianSearchAPIView(CachedResponseMixin, FieldProjectionMixin, FastListMixin, generics.ListAPIView):
+    # ?q= words in name or profileline, ?country=, ?city=, ?min_rating=; best rated first
+    cache_models = (Musician,)
+    serializer_class = MusicianSerializer
+    pagination_class = RatingCursorPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        min_rating = params.get('min_rating')
+        if min_rating:
+            try:
+                min_rating = search.parse_rating(min_rating)
+            except ValueError as e:
+                raise ValidationError({'min_rating': str(e)})
+        return search.musicians(params.get('q', ''), country=params.get('country'), city=params.get('city'),
+                                min_rating=min_rating or None, after=self.paginator.get_position(self.request),
+                                limit=self.paginator.get_page_size(self.request) + 1)
+
+class MusicianNearbyAPIView(NearbyListMixin, CachedResponseMixin, generics.ListAPIView):
+    # e.g. ?event=<id>&radius_km=50: musicians within 50 km of that event's venue
+    cache_models = (Musician, Event)
+    queryset = Musician.objects.all()
+    serializer_class = MusicianSerializer
+
+class MusicianRetrieveUpdateDestroyAPIView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_models = (Musician,)
     queryset = Musician.objects.all()
     serializer_class = MusicianSerializer
 
 
 # Event Organizer Views
-class EventOrganizerListCreateAPIView(generics.ListCreateAPIView):
+class EventOrganizerListCreateAPIView(CachedResponseMixin, FieldProjectionMixin, FastListMixin, generics.ListCreateAPIView):
+    cache_models = (EventOrganizer,)
     queryset = EventOrganizer.objects.all()
     serializer_class = EventOrganizerSerializer
+    pagination_class = KeysetPagination
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -128,7 +336,10 @@ class EventOrganizerListCreateAPIView(generics.ListCreateAPIView):
             try:
                 user_credential = UserCredentials.objects.get(email=email)
                 if user_credential.category == 'event organizer':
-                    serializer.save()
+                    with transaction.atomic():
+                        organizer = serializer.save()
+                        # Claim events created under this email before the profile existed
+                        Event.objects.filter(event_organiser_email=email, event_organiser__isnull=True).update(event_organiser=organizer)
                     return Response({"message": "Event Organizer created successfully"}, status=status.HTTP_201_CREATED)
                 else:
                     return Response({"error": "Incorrect category"}, status=status.HTTP_400_BAD_REQUEST)
@@ -136,10 +347,26 @@ class EventOrganizerListCreateAPIView(generics.ListCreateAPIView):
                 return Response({"error": "Email not found in User Credentials"}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class EventOrganizerRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class EventOrganizerRetrieveUpdateDestroyAPIView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
+    cache_models = (EventOrganizer,)
     queryset = EventOrganizer.objects.all()
     serializer_class = EventOrganizerSerializer
 
+class OrganizerStatsAPIView(generics.RetrieveAPIView):
+    # Event counts from one summary row (see stats.py), however many events the organiser has had
+    serializer_class = OrganizerStatsSerializer
+    summary = stats.ORGANISERS
+
+    def get_object(self):
+        row = stats.current(self.summary, self.kwargs['pk'])
+        if row is None:
+            raise Http404
+        return row
+
+class MusicianStatsAPIView(OrganizerStatsAPIView):
+    serializer_class = MusicianStatsSerializer
+    summary = stats.MUSICIANS
+
 
 # User Credentials Views
 class UserCredentialsCreateView(generics.CreateAPIView):
@@ -162,45 +389,77 @@ class UserCredentialsCreateView(generics.CreateAPIView):
 
 #Login Views
 class UserLoginAPIView(APIView):
+    # Not-found messages per category, kept from the original two-query version
+    PROFILE_NOT_FOUND = {'musician': 'Musician not found', 'event organizer': 'Event Organizer not found'}
+
     def post(self, request, *args, **kwargs):
         email = request.data.get('email')
         password = request.data.get('password')
 
-        try:
-            user_credentials = UserCredentials.objects.get(email=email)
-            if user_credentials.password == password:
-                # Password matches, authentication successful
-                if user_credentials.category == 'musician':
-                    try:
-                        musician = Musician.objects.get(email=email)
-                        serializer = MusicianSerializer(musician)
-                        return Response({
-                            'memberType': 'musician',
-                            'details': serializer.data
-                        }, status=status.HTTP_200_OK)
-                    except Musician.DoesNotExist:
-                        return Response({'error': 'Musician not found'}, status=status.HTTP_404_NOT_FOUND)
-                elif user_credentials.category == 'event organizer':
-                    try:
-                        event_organizer = EventOrganizer.objects.get(email=email)
-                        serializer = EventOrganizerSerializer(event_organizer)
-                        return Response({
-                            'memberType': 'event organizer',
-                            'details': serializer.data
-                        }, status=status.HTTP_200_OK)
-                    except EventOrganizer.DoesNotExist:
-                        return Response({'error': 'Event Organizer not found'}, status=status.HTTP_404_NOT_FOUND)
-            else:
-                # Password doesn't match
-                return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-        except UserCredentials.DoesNotExist:
+        user_credentials = UserCredentials.objects.filter(email=email).first()
+        if user_credentials is None:
             # User not found
+            login.burn_hash(password)
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not login.verify_password(user_credentials, password):
+            # Password doesn't match
+            return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Password matches, authentication successful; the profile usually comes from the cache
+        category = user_credentials.category
+        if category not in login.PROFILES:
+            return Response({'error': 'Invalid category specified.'}, status=status.HTTP_400_BAD_REQUEST)
+        details = login.get_profile(category, email)
+        if details is None:
+            return Response({'error': self.PROFILE_NOT_FOUND[category]}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'memberType': category,
+            'details': details
+        }, status=status.HTTP_200_OK)
+
+# Availability Views
+class AvailabilityAPIView(APIView):
+    def get(self, request, *args, **kwargs):
+        emails = [email.strip() for email in request.query_params.get('emails', '').split(',') if email.strip()]
+        if not emails:
+            raise ValidationError({'emails': 'Provide a comma separated list of emails.'})
+        if len(emails) > availability.MAX_PEOPLE:
+            raise ValidationError({'emails': f'At most {availability.MAX_PEOPLE} emails per request.'})
+        start, end = query_window(request, 'from', 'to')
+        if end - start > availability.MAX_WINDOW:
+            raise ValidationError({'to': 'The window can be at most 366 days.'})
+        try:
+            slot = availability.parse_slot(request.query_params.get('slot', '30m'))
+        except ValueError as e:
+            raise ValidationError({'slot': str(e)})
+
+        busy = availability.local_busy(emails, start, end)
+        if request.query_params.get('google') in ('1', 'true'):
+            for email, intervals in availability.google_busy(create_google_service(), emails, start, end).items():
+                busy.setdefault(email, []).extend(intervals)
+        per_person, common = availability.free_slots(busy, start, end, slot)
+
+        def as_json(runs):
+            return [{'start': run_start, 'end': run_end} for run_start, run_end in runs]
+
+        return Response({
+            'from': start,
+            'to': end,
+            'slot_minutes': slot.total_seconds() / 60,
+            'free': {email: as_json(runs) for email, runs in per_person.items()},
+            'common_free': as_json(common),
+        }, status=status.HTTP_200_OK)
 
 # Filter By email Views
-class EventFilterByEmailAPIView(generics.ListAPIView):
+class EventFilterByEmailAPIView(FastListMixin, generics.ListAPIView):
     serializer_class = EventNameSerializer
 
     def get_queryset(self):
         email = self.request.query_params.get('email')
-        return Event.objects.filter(event_organiser_email=email)
+        # One query through the organiser foreign key: the unique email index finds the
+        # organiser, then (event_organiser, event_start_date, event_name) covers the rest.
+        # Events filed before the organiser had a profile are still unlinked; the
+        # (event_organiser_email, event_start_date) index finds those.
+        return (Event.objects.filter(Q(event_organiser__email=email)
+                                     | Q(event_organiser__isnull=True, event_organiser_email=email))
+                .order_by('event_start_date').only('event_name'))